@@ -8,3 +8,14 @@ admin.site.register(api_models.Category)
 admin.site.register(api_models.Comment)
 admin.site.register(api_models.Notification)
 admin.site.register(api_models.Bookmark)
+admin.site.register(api_models.AuthorStats)
+admin.site.register(api_models.AuthorDailyStats)
+admin.site.register(api_models.NotificationEvent)
+admin.site.register(api_models.ImageJob)
+admin.site.register(api_models.UploadSession)
+admin.site.register(api_models.MediaBlob)
+admin.site.register(api_models.PostRanking)
+admin.site.register(api_models.RelatedPost)
+admin.site.register(api_models.RelatedPostJob)
+admin.site.register(api_models.Tag)
+admin.site.register(api_models.PostTag)
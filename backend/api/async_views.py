@@ -0,0 +1,148 @@
+"""
+Async twins of the public read endpoints, for ASGI deployments.
+
+DRF views are synchronous, so under ASGI Django runs each one in a worker
+thread. These are plain Django async views: queries go through the async
+ORM (``aget``/``aiterator``) and serialization runs on the event loop
+against rows that are already fully loaded, so the DRF serializers never
+touch the database. Responses, caching and cursors match the DRF views.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from api import models as api_models
+from api import notification_stream
+from api import response_cache
+from api import serializer as api_serializers
+from api.pagination import DateCursorPagination
+from api.view_counter import view_counter
+
+
+async def authenticate(request):
+    """Resolve a JWT bearer token the way DRF would; anonymous requests stay on the loop."""
+    if 'HTTP_AUTHORIZATION' not in request.META:
+        return AnonymousUser()
+    result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    return result[0] if result else AnonymousUser()
+
+
+class AsyncReadView(View):
+    """
+    Base class: subclasses implement ``render(request, user, **kwargs)``
+    returning ``(status, data)``. Anonymous responses go through the
+    response cache under ``cache_tags``.
+    """
+    cache_tags = ()
+    replica_reads = True
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            user = await authenticate(request)
+        except AuthenticationFailed as error:
+            return response_cache.json_response({'detail': error.detail}, status=error.status_code)
+
+        if user.is_authenticated:
+            code, data = await self.render(request, user, **kwargs)
+            return response_cache.json_response(data, status=code)
+        return await response_cache.acached_response(
+            request,
+            self.cache_tags,
+            lambda: self.render(request, user, **kwargs),
+            lambda data: self.cache_hit(request, data),
+        )
+
+    async def render(self, request, user, **kwargs):
+        raise NotImplementedError
+
+    async def cache_hit(self, request, data):
+        pass
+
+
+class PostListView(AsyncReadView):
+    cache_tags = ('posts',)
+
+    def get_queryset(self):
+        return api_models.Post.objects.filter(status='Active')
+
+    async def render(self, request, user, **kwargs):
+        paginator = DateCursorPagination()
+        # The paginator reads the cursor from DRF's query_params; wrapping
+        # doesn't authenticate, that only happens on access to .user.
+        posts = await paginator.apaginate_queryset(self.get_queryset().with_related().with_like_state(user), Request(request))
+        data = api_serializers.PostListSerializer(posts, many=True, context={'request': request}).data
+        return status.HTTP_200_OK, paginator.get_paginated_data(data)
+
+
+class CategoryListView(AsyncReadView):
+    cache_tags = ('categories',)
+
+    async def render(self, request, user):
+        categories = [category async for category in api_models.Category.objects.all()]
+        return status.HTTP_200_OK, api_serializers.CategorySerializer(categories, many=True, context={'request': request}).data
+
+
+class PostCategoryListView(PostListView):
+    cache_tags = ('posts', 'categories')
+
+    async def render(self, request, user, category_slug):
+        category = await api_models.Category.objects.filter(slug=category_slug).afirst()
+        if category is None:
+            return status.HTTP_404_NOT_FOUND, {'detail': "Not found."}
+        self.category = category
+        return await super().render(request, user)
+
+    def get_queryset(self):
+        return api_models.Post.objects.filter(category=self.category, status='Active')
+
+
+class PostDetailView(AsyncReadView):
+    cache_tags = ('posts',)
+
+    async def render(self, request, user, slug):
+        posts = api_models.Post.objects.with_related().with_tags().with_related_posts().with_like_state(user)
+        try:
+            post = await posts.aget(slug=slug, status='Active')
+        except api_models.Post.DoesNotExist:
+            return status.HTTP_404_NOT_FOUND, {'detail': "Not found."}
+        await view_counter.aincrement(post.id)
+        post.views += 1
+        return status.HTTP_200_OK, api_serializers.PostDetailSerializer(post, context={'request': request}).data
+
+    async def cache_hit(self, request, data):
+        await view_counter.aincrement(data['id'])
+
+
+class NotificationStreamView(View):
+    """
+    Server-Sent Events stream of an author's new and updated notifications,
+    replacing polling of the notification list. Browsers reconnect on their
+    own and send ``Last-Event-ID``; clients that can't set headers may pass
+    ``?last_event_id=`` instead.
+
+    Needs an ASGI server (``backend.asgi``, e.g. under uvicorn or daphne).
+    Under WSGI Django would drain the endless stream synchronously and hold
+    a worker per client, so it answers 501 and clients keep polling.
+    """
+
+    async def get(self, request, user_id):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse(
+                {'message': 'The notification stream needs the ASGI server'},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        response = StreamingHttpResponse(
+            notification_stream.stream(user_id, last_event_id),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
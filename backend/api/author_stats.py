@@ -0,0 +1,119 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+FIELDS = ('views', 'posts', 'likes', 'bookmarks')
+
+# Longest daily history the dashboard returns.
+MAX_DAYS = 366
+
+
+def _bump(model, lookup, deltas):
+    """Add ``deltas`` to the row matching ``lookup``, creating it if missing."""
+    changes = {name: F(name) + delta for name, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Created concurrently between the UPDATE and the INSERT.
+        model.objects.filter(**lookup).update(**changes)
+
+
+def record_activity(user_id, day=None, **deltas):
+    """
+    Count activity such as ``likes=1`` on an author's posts, both in their
+    running totals and in the bucket for ``day`` (today by default).
+    """
+    from api.models import AuthorDailyStats, AuthorStats
+
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with transaction.atomic():
+        _bump(AuthorStats, {'user_id': user_id}, deltas)
+        _bump(AuthorDailyStats, {'user_id': user_id, 'day': day or timezone.localdate()}, deltas)
+
+
+def adjust_totals(user_id, **deltas):
+    """Change an author's running totals without touching the daily buckets."""
+    from api.models import AuthorStats
+
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if deltas:
+        _bump(AuthorStats, {'user_id': user_id}, deltas)
+
+
+def discount_totals(user_id, **deltas):
+    """
+    ``adjust_totals`` for delete handlers: only changes an existing row, since
+    the author may be the one being deleted and must not get a new one.
+    """
+    from api.models import AuthorStats
+
+    changes = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if changes:
+        AuthorStats.objects.filter(user_id=user_id).update(**changes)
+
+
+def record_views(counts):
+    """Roll flushed ``{post_id: n}`` view counts up to the posts' authors."""
+    from api.models import Post
+
+    by_author = defaultdict(int)
+    for post_id, user_id in Post.objects.filter(id__in=list(counts)).values_list('id', 'user_id'):
+        by_author[user_id] += counts[post_id]
+    for user_id, views in by_author.items():
+        record_activity(user_id, views=views)
+
+
+def rebuild():
+    """
+    Recompute every author's totals, unread notification count and daily
+    buckets from the source tables. Likes and views carry no timestamp, so
+    the rebuilt daily buckets only hold posts and bookmarks; the totals are
+    exact.
+    """
+    from api.models import AuthorDailyStats, AuthorStats, Bookmark, Notification, Post
+
+    unread = dict(
+        Notification.objects.filter(read=False).order_by().values('user_id').annotate(n=Count('id')).values_list('user_id', 'n')
+    )
+    totals = Post.objects.order_by().values('user_id').annotate(
+        total_views=Sum('views'),
+        total_posts=Count('id'),
+        total_likes=Sum('like_count'),
+        total_bookmarks=Sum('bookmark_count'),
+    )
+
+    daily = defaultdict(lambda: defaultdict(int))
+    posts = Post.objects.order_by().annotate(day=TruncDate('date')).values('user_id', 'day').annotate(n=Count('id'))
+    for row in posts:
+        daily[row['user_id'], row['day']]['posts'] = row['n']
+    bookmarks = Bookmark.objects.order_by().annotate(day=TruncDate('date')).values('post__user_id', 'day').annotate(n=Count('id'))
+    for row in bookmarks:
+        daily[row['post__user_id'], row['day']]['bookmarks'] = row['n']
+
+    with transaction.atomic():
+        AuthorStats.objects.all().delete()
+        AuthorDailyStats.objects.all().delete()
+        AuthorStats.objects.bulk_create(
+            AuthorStats(
+                user_id=row['user_id'],
+                views=row['total_views'],
+                posts=row['total_posts'],
+                likes=row['total_likes'],
+                bookmarks=row['total_bookmarks'],
+                unread_notifications=unread.get(row['user_id'], 0),
+            )
+            for row in totals
+        )
+        AuthorDailyStats.objects.bulk_create(
+            (AuthorDailyStats(user_id=user_id, day=day, **values) for (user_id, day), values in daily.items()),
+            batch_size=1000,
+        )
+    return AuthorStats.objects.count()
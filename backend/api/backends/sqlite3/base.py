@@ -0,0 +1,188 @@
+"""
+SQLite backend for serving traffic from one database file with several
+worker processes. Select it with ``DATABASE_SQLITE_TUNING=1`` (see
+backend/database.py) or ``ENGINE: 'api.backends.sqlite3'``.
+
+Every new connection gets the PRAGMAs in ``settings.SQLITE_TUNING``: WAL,
+so readers never block the writer; ``synchronous=NORMAL``; a memory map
+and page cache; and a busy timeout so a contended write waits instead of
+failing with "database is locked".
+
+SQLite allows a single writer at a time, so writes are also queued up
+outside it: transactions start with ``BEGIN IMMEDIATE`` and, like writes
+in autocommit mode, first take a lock shared by the threads of a process
+and, through ``flock`` on ``<database>-writer.lock``, by all processes.
+Writers then wait their turn in order rather than poll SQLite's busy
+handler, and a read transaction can no longer deadlock when upgrading to
+a write.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+try:
+    import fcntl
+except ImportError:  # Windows: threads of one process are still serialized.
+    fcntl = None
+
+DEFAULTS = {
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    # Bytes of the database file to memory-map.
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    # Page cache per connection; negative values are KiB.
+    'CACHE_SIZE': -64000,
+    # Milliseconds a statement waits for a lock held by another connection.
+    'BUSY_TIMEOUT': 5000,
+    'SERIALIZE_WRITES': True,
+}
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+
+
+def get_setting(name):
+    return getattr(settings, 'SQLITE_TUNING', {}).get(name, DEFAULTS[name])
+
+
+class WriteLock:
+    """Exclusive across the threads of a process and, with fcntl, across processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = None
+
+    def _reset_after_fork(self):
+        if self._pid != os.getpid():
+            # Neither a lock nor an open file description may be shared with the parent.
+            self._pid = os.getpid()
+            self._thread_lock = threading.Lock()
+            self._file = None
+
+    def acquire(self):
+        self._reset_after_fork()
+        self._thread_lock.acquire()
+        if fcntl is None:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, 'a+b')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+
+_write_locks = {}
+_write_locks_lock = threading.Lock()
+
+
+def write_lock(database):
+    path = f"{os.path.abspath(database)}-writer.lock"
+    with _write_locks_lock:
+        if path not in _write_locks:
+            _write_locks[path] = WriteLock(path)
+        return _write_locks[path]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.holds_write_lock = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params['timeout'] = get_setting('BUSY_TIMEOUT') / 1000
+        if self.transaction_mode is None:
+            self.transaction_mode = 'IMMEDIATE'
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if not self.is_in_memory_db():
+            conn.execute(f"PRAGMA journal_mode = {get_setting('JOURNAL_MODE')}")
+            conn.execute(f"PRAGMA mmap_size = {int(get_setting('MMAP_SIZE'))}")
+        conn.execute(f"PRAGMA synchronous = {get_setting('SYNCHRONOUS')}")
+        conn.execute(f"PRAGMA cache_size = {int(get_setting('CACHE_SIZE'))}")
+        conn.execute(f"PRAGMA busy_timeout = {int(get_setting('BUSY_TIMEOUT'))}")
+        return conn
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=lambda conn: SQLiteCursorWrapper(conn, self))
+
+    def serializes_writes(self):
+        return get_setting('SERIALIZE_WRITES') and not self.is_in_memory_db()
+
+    def acquire_write_lock(self):
+        if self.serializes_writes() and not self.holds_write_lock:
+            write_lock(self.settings_dict['NAME']).acquire()
+            self.holds_write_lock = True
+
+    def release_write_lock(self):
+        if self.holds_write_lock:
+            self.holds_write_lock = False
+            write_lock(self.settings_dict['NAME']).release()
+
+    @contextmanager
+    def writing(self, query):
+        """Hold the write lock around a write statement outside a transaction."""
+        if (
+            self.holds_write_lock
+            or self.connection.in_transaction
+            or not query.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+            or not self.serializes_writes()
+        ):
+            yield
+            return
+        self.acquire_write_lock()
+        try:
+            yield
+        finally:
+            self.release_write_lock()
+
+    def _start_transaction_under_autocommit(self):
+        self.acquire_write_lock()
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self.release_write_lock()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.release_write_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.release_write_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self.release_write_lock()
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    def __init__(self, conn, wrapper):
+        super().__init__(conn)
+        self.wrapper = wrapper
+
+    def execute(self, query, params=None):
+        with self.wrapper.writing(query):
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        with self.wrapper.writing(query):
+            return super().executemany(query, param_list)
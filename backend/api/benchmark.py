@@ -0,0 +1,419 @@
+"""
+Synthetic data and a scripted request mix for `manage.py benchmark`.
+
+``seed`` bulk-loads users, posts, tags, likes, comments, bookmarks and
+notifications, then rebuilds every derived table the way the maintenance
+commands would. ``run`` replays a weighted mix covering the endpoints in
+api/urls.py through the test client and records latency and query count
+per request; ``summarize`` turns that into p50/p95/p99, throughput and
+queries per request, and ``compare`` diffs two summaries.
+"""
+import io
+import math
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils.text import slugify
+from PIL import Image
+
+from api import author_stats, feed, related, search
+from api.counters import recount_counters
+
+SCALES = {
+    'small': {'users': 100, 'posts': 1000, 'likes': 5, 'comments': 2, 'bookmarks': 1},
+    'medium': {'users': 1000, 'posts': 10000, 'likes': 10, 'comments': 3, 'bookmarks': 2},
+    'large': {'users': 10000, 'posts': 100000, 'likes': 20, 'comments': 5, 'bookmarks': 3},
+}
+
+PASSWORD = 'benchmark-password'
+
+WORDS = (
+    "django python async cache index query latency database feed search image upload notification "
+    "author comment bookmark like category travel food music science design startup health sport"
+).split()
+
+BATCH_SIZE = 2000
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def seed(users, posts, likes, comments, bookmarks, seed=0, stdout=None):
+    """
+    Insert a synthetic dataset: ``likes``, ``comments`` and ``bookmarks``
+    are per post (capped by the number of users). Returns the id ranges
+    the workload draws from.
+    """
+    from api.models import Bookmark, Category, Comment, CustomUser, Notification, Post, PostTag, Profile, Tag
+
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+
+    def log(message):
+        if stdout:
+            stdout.write(message)
+
+    CustomUser.objects.bulk_create(
+        (
+            CustomUser(email=f"bench{i}@example.com", username=f"bench{i}", full_name=f"Bench {i}", password=password)
+            for i in range(users)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(CustomUser.objects.filter(email__startswith='bench').order_by('id').values_list('id', flat=True))
+    Profile.objects.bulk_create(
+        (Profile(user_id=user_id, full_name=f"Bench {i}", author=True) for i, user_id in enumerate(user_ids)),
+        batch_size=BATCH_SIZE,
+    )
+    profile_ids = dict(Profile.objects.values_list('user_id', 'id'))
+    categories = Category.objects.bulk_create(
+        Category(title=f"Category {i}", slug=f"category-{i}") for i in range(min(10, max(posts // 10, 1)))
+    )
+    log(f"Seeded {users} users and {len(categories)} categories.")
+
+    def make_posts():
+        for i in range(posts):
+            user_id = rng.choice(user_ids)
+            title = _sentence(rng, 5).capitalize()
+            yield Post(
+                user_id=user_id,
+                profile_id=profile_ids[user_id],
+                category=rng.choice(categories),
+                title=title,
+                description=' '.join(_sentence(rng, 12) + '.' for _ in range(4)),
+                status='Active' if rng.random() < 0.9 else 'Draft',
+                views=rng.randrange(1000),
+                slug=f"{slugify(title)[:200]}-{i}",
+            )
+
+    Post.objects.bulk_create(make_posts(), batch_size=BATCH_SIZE)
+    post_authors = dict(Post.objects.values_list('id', 'user_id'))
+    post_ids = list(post_authors)
+    log(f"Seeded {posts} posts.")
+
+    tags = Tag.objects.bulk_create(Tag(name=word, slug=word) for word in WORDS)
+    PostTag.objects.bulk_create(
+        (PostTag(post_id=post_id, tag=tag) for post_id in post_ids for tag in rng.sample(tags, 3)),
+        batch_size=BATCH_SIZE,
+    )
+    log(f"Seeded {len(tags)} tags.")
+
+    Like = Post.likes.through
+
+    def pick(count):
+        return rng.sample(user_ids, min(count, len(user_ids)))
+
+    likes_rows, bookmark_rows, comment_rows, notifications = [], [], [], []
+    for post_id in post_ids:
+        likes_rows += [Like(post_id=post_id, customuser_id=user_id) for user_id in pick(likes)]
+        bookmark_rows += [Bookmark(post_id=post_id, user_id=user_id) for user_id in pick(bookmarks)]
+        comment_rows += [
+            Comment(post_id=post_id, name=f"Reader {n}", email=f"reader{n}@example.com", comment=_sentence(rng, 10))
+            for n in range(comments)
+        ]
+        if likes:
+            notifications.append(Notification(user_id=post_authors[post_id], post_id=post_id, type='Like', count=likes))
+    Like.objects.bulk_create(likes_rows, batch_size=BATCH_SIZE)
+    Bookmark.objects.bulk_create(bookmark_rows, batch_size=BATCH_SIZE)
+    Comment.objects.bulk_create(comment_rows, batch_size=BATCH_SIZE)
+    Notification.objects.bulk_create(notifications, batch_size=BATCH_SIZE)
+    log(f"Seeded {len(likes_rows)} likes, {len(comment_rows)} comments and {len(bookmark_rows)} bookmarks.")
+
+    # bulk_create skips the signals that keep these current.
+    recount_counters()
+    author_stats.rebuild()
+    backend = search.get_backend()
+    if backend:
+        backend.rebuild()
+    feed.rank_posts()
+    related.rebuild()
+
+    return {
+        'user_ids': user_ids,
+        'post_ids': [post_id for post_id, status in Post.objects.values_list('id', 'status') if status == 'Active'],
+        'post_slugs': list(Post.objects.filter(status='Active').values_list('slug', flat=True)),
+        'post_authors': post_authors,
+        'category_ids': [category.id for category in categories],
+        'category_slugs': [category.slug for category in categories],
+        'tag_slugs': [tag.slug for tag in tags],
+        'comment_ids': list(Comment.objects.values_list('id', flat=True)[:1000]),
+    }
+
+
+class Workload:
+    """
+    The request mix. Each ``op_<name>`` method issues one request; ``MIX``
+    gives their relative weights. Reads dominate, as in production. The
+    notification event stream is left out: it never completes.
+    """
+
+    MIX = {
+        'post_list': 20,
+        'post_detail': 20,
+        'category_posts': 8,
+        'category_list': 5,
+        'tag_posts': 4,
+        'tag_cloud': 2,
+        'feed': 8,
+        'search': 6,
+        'viewer_state': 5,
+        'async_post_list': 3,
+        'async_post_detail': 3,
+        'async_category_posts': 1,
+        'async_category_list': 1,
+        'profile': 3,
+        'like': 4,
+        'bookmark': 3,
+        'comment': 2,
+        'batch': 1,
+        'dashboard_stats': 3,
+        'dashboard_posts': 2,
+        'dashboard_comments': 2,
+        'dashboard_notifications': 2,
+        'unread_count': 3,
+        'mark_seen': 1,
+        'reply_comment': 1,
+        'cache_stats': 1,
+        'upload_and_create_post': 1,
+        'update_post': 1,
+        'register': 1,
+        'token': 1,
+        'token_refresh': 1,
+    }
+
+    def __init__(self, data, seed=0):
+        self.data = data
+        self.rng = random.Random(seed)
+        self.client = Client()
+        self.registered = 0
+        self.refresh_token = None
+
+    def choose(self):
+        names = list(self.MIX)
+        return self.rng.choices(names, weights=[self.MIX[name] for name in names])[0]
+
+    def user(self):
+        return self.rng.choice(self.data['user_ids'])
+
+    def post(self):
+        return self.rng.choice(self.data['post_ids'])
+
+    def slug(self):
+        return self.rng.choice(self.data['post_slugs'])
+
+    def category(self):
+        return self.rng.choice(self.data['category_slugs'])
+
+    def op_post_list(self):
+        return self.client.get("/api/v1/post/list/")
+
+    def op_post_detail(self):
+        return self.client.get(f"/api/v1/post/detail/{self.slug()}/")
+
+    def op_category_posts(self):
+        return self.client.get(f"/api/v1/post/category/posts/{self.category()}/")
+
+    def op_category_list(self):
+        return self.client.get("/api/v1/post/category/list/")
+
+    def op_tag_posts(self):
+        return self.client.get(f"/api/v1/post/tag/{self.rng.choice(self.data['tag_slugs'])}/")
+
+    def op_tag_cloud(self):
+        return self.client.get("/api/v1/post/tag-cloud/")
+
+    def op_async_post_list(self):
+        return self.client.get("/api/v1/async/post/list/")
+
+    def op_async_post_detail(self):
+        return self.client.get(f"/api/v1/async/post/detail/{self.slug()}/")
+
+    def op_async_category_posts(self):
+        return self.client.get(f"/api/v1/async/post/category/posts/{self.category()}/")
+
+    def op_async_category_list(self):
+        return self.client.get("/api/v1/async/post/category/list/")
+
+    def op_feed(self):
+        return self.client.get("/api/v1/post/feed/")
+
+    def op_search(self):
+        return self.client.get("/api/v1/post/search/", {'q': self.rng.choice(WORDS)})
+
+    def op_viewer_state(self):
+        ids = ','.join(str(self.post()) for _ in range(10))
+        return self.client.get("/api/v1/post/viewer-state/", {'user_id': self.user(), 'ids': ids})
+
+    def op_profile(self):
+        return self.client.get(f"/api/v1/user/profile/{self.user()}/")
+
+    def op_like(self):
+        return self.client.post("/api/v1/post/like/", {'user_id': self.user(), 'post_id': self.post()})
+
+    def op_bookmark(self):
+        return self.client.post("/api/v1/post/bookmark/", {'user_id': self.user(), 'post_id': self.post()})
+
+    def op_comment(self):
+        return self.client.post("/api/v1/post/comment/", {
+            'post_id': self.post(), 'name': "Bench", 'email': "bench@example.com", 'comment': _sentence(self.rng, 10),
+        })
+
+    def op_batch(self):
+        operations = [{'op': self.rng.choice(['like', 'bookmark']), 'post_id': self.post()} for _ in range(10)]
+        return self.client.post(
+            "/api/v1/post/interactions/batch/",
+            {'user_id': self.user(), 'operations': operations},
+            content_type='application/json',
+        )
+
+    def op_dashboard_stats(self):
+        return self.client.get(f"/api/v1/author/dashboard/stats/{self.user()}/")
+
+    def op_dashboard_posts(self):
+        return self.client.get(f"/api/v1/author/dashboard/post-list/{self.user()}/")
+
+    def op_dashboard_comments(self):
+        return self.client.get(f"/api/v1/author/dashboard/comment-list/{self.user()}/")
+
+    def op_dashboard_notifications(self):
+        return self.client.get(f"/api/v1/author/dashboard/notification-list/{self.user()}/")
+
+    def op_unread_count(self):
+        return self.client.get(f"/api/v1/author/dashboard/notification-unread-count/{self.user()}/")
+
+    def op_mark_seen(self):
+        return self.client.post("/api/v1/author/dashboard/notification-mark-seen/", {'user_id': self.user()})
+
+    def op_reply_comment(self):
+        return self.client.post("/api/v1/author/dashboard/reply-comment/", {
+            'comment_id': self.rng.choice(self.data['comment_ids']), 'reply': _sentence(self.rng, 6),
+        })
+
+    def op_cache_stats(self):
+        return self.client.get("/api/v1/post/cache/stats/")
+
+    def op_upload_and_create_post(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), tuple(self.rng.randrange(256) for _ in range(3))).save(buffer, format='PNG')
+        image = buffer.getvalue()
+        user_id = self.user()
+
+        start = self.client.post("/api/v1/author/dashboard/upload/", {'user_id': user_id, 'filename': "cover.png", 'size': len(image)})
+        upload_id = start.json()['upload_id']
+        self.client.put(
+            f"/api/v1/author/dashboard/upload/{upload_id}/",
+            image,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f"bytes 0-{len(image) - 1}/{len(image)}",
+        )
+        return self.client.post("/api/v1/author/dashboard/create-post/", {
+            'user_id': user_id, 'title': _sentence(self.rng, 5), 'content': _sentence(self.rng, 40),
+            'category': self.rng.choice(self.data['category_ids']), 'upload_id': upload_id,
+        })
+
+    def op_update_post(self):
+        post_id = self.post()
+        author_id = self.data['post_authors'][post_id]
+        return self.client.put(f"/api/v1/author/dashboard/update-post/{author_id}/{post_id}/", {
+            'title': _sentence(self.rng, 5), 'content': _sentence(self.rng, 40), 'category': self.rng.choice(self.data['category_ids']),
+            'image': "undefined", 'post_status': 'Active',
+        }, content_type='application/json')
+
+    def op_register(self):
+        self.registered += 1
+        return self.client.post("/api/v1/user/register/", {
+            'full_name': "New Reader", 'email': f"reader{self.registered}@example.com",
+            'password': PASSWORD, 'password2': PASSWORD,
+        })
+
+    def op_token(self):
+        response = self.client.post("/api/v1/user/token/", {'email': "bench0@example.com", 'password': PASSWORD})
+        self.refresh_token = response.json().get('refresh', self.refresh_token)
+        return response
+
+    def op_token_refresh(self):
+        if self.refresh_token is None:
+            return self.op_token()
+        response = self.client.post("/api/v1/user/token/refresh/", {'refresh': self.refresh_token})
+        self.refresh_token = response.json().get('refresh', self.refresh_token)
+        return response
+
+
+def run(workload, requests, warmup=0):
+    """Issue ``requests`` requests from ``workload``; returns per-request samples and the elapsed time."""
+    for _ in range(warmup):
+        getattr(workload, 'op_' + workload.choose())()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(requests):
+        name = workload.choose()
+        with CaptureQueriesContext(connection) as queries:
+            began = time.perf_counter()
+            response = getattr(workload, 'op_' + name)()
+            latency = time.perf_counter() - began
+        samples.append({'name': name, 'latency': latency, 'queries': len(queries), 'status': response.status_code})
+    return samples, time.perf_counter() - started
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted ``values``."""
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def _stats(samples, elapsed=None):
+    latencies = sorted(sample['latency'] * 1000 for sample in samples)
+    queries = [sample['queries'] for sample in samples]
+    stats = {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample['status'] >= 400),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'queries_mean': round(statistics.fmean(queries), 2),
+        'queries_max': max(queries),
+    }
+    if elapsed:
+        stats['throughput_rps'] = round(len(samples) / elapsed, 1)
+    return stats
+
+
+def summarize(samples, elapsed):
+    by_name = defaultdict(list)
+    for sample in samples:
+        by_name[sample['name']].append(sample)
+    return {
+        'total': _stats(samples, elapsed),
+        'endpoints': {name: _stats(by_name[name]) for name in sorted(by_name)},
+    }
+
+
+def compare(base, head, threshold, min_samples=30):
+    """
+    Rows of ``(endpoint, base stats, head stats, regressed)`` for two
+    summaries. An endpoint regresses when it issues more queries per
+    request, or when its p95 grows by more than ``threshold`` percent;
+    latency is only judged with ``min_samples`` requests on both sides,
+    as a p95 over a handful of requests is mostly noise.
+    """
+    rows = []
+    for name in ['total', *sorted(set(base['endpoints']) | set(head['endpoints']))]:
+        old = base['total'] if name == 'total' else base['endpoints'].get(name)
+        new = head['total'] if name == 'total' else head['endpoints'].get(name)
+        regressed = False
+        if old and new:
+            enough = min(old['requests'], new['requests']) >= min_samples
+            regressed = (
+                new['queries_mean'] > old['queries_mean'] + 0.5
+                or enough and new['p95_ms'] > old['p95_ms'] * (1 + threshold / 100)
+            )
+        rows.append((name, old, new, regressed))
+    return rows
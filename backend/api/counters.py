@@ -0,0 +1,49 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def adjust_post_counters(post_id, **deltas):
+    """Add ``deltas`` such as ``like_count=1`` to a post's counters in one UPDATE."""
+    from api.models import Post
+
+    Post.objects.filter(id=post_id).update(**{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def adjust_category_post_count(category_id, delta):
+    from api.models import Category
+
+    if category_id is not None:
+        Category.objects.filter(id=category_id).update(post_count=F('post_count') + delta)
+
+
+def _count(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def recount_post_counters(post_ids=None):
+    """
+    Recompute the like, comment and bookmark counts of ``post_ids`` (or of
+    every post) from the source tables in one UPDATE.
+    """
+    from api.models import Bookmark, Comment, Post
+
+    posts = Post.objects.all() if post_ids is None else Post.objects.filter(id__in=post_ids)
+    return posts.update(
+        like_count=_count(Post.likes.through.objects, 'post_id'),
+        comment_count=_count(Comment.objects, 'post_id'),
+        bookmark_count=_count(Bookmark.objects, 'post_id'),
+    )
+
+
+def recount_counters():
+    """
+    Recompute every denormalized counter from the source tables. Returns the
+    number of posts, categories and tags touched.
+    """
+    from api.models import Category, Post, PostTag, Tag
+
+    posts = recount_post_counters()
+    categories = Category.objects.update(post_count=_count(Post.objects, 'category_id'))
+    tags = Tag.objects.update(post_count=_count(PostTag.objects, 'tag_id'))
+    return posts, categories, tags
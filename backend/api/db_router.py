@@ -0,0 +1,133 @@
+"""
+Read replica routing.
+
+Writes always go to the primary. Reads go to a replica only while serving
+a safe request to a view that opts in with ``replica_reads = True`` (the
+public post and category reads), and only until the request writes
+anything. A client that wrote recently is pinned to the primary for
+``STICKY_SECONDS`` so it reads its own writes despite replication lag.
+Clients are identified by the user in their access token, or else by
+address; pins live in the cache, which must be shared between workers.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+DEFAULTS = {
+    'REPLICAS': [],
+    # Seconds a client reads from the primary after writing.
+    'STICKY_SECONDS': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def get_setting(name):
+    return getattr(settings, 'DATABASE_ROUTING', {}).get(name, DEFAULTS[name])
+
+
+class RoutingState:
+    __slots__ = ('replica_reads', 'wrote')
+
+    def __init__(self):
+        self.replica_reads = False
+        self.wrote = False
+
+
+# Shared with threads running sync_to_async code for the same request.
+_current = ContextVar('api_db_routing', default=None)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        replicas = get_setting('REPLICAS')
+        if replicas and state is not None and state.replica_reads and not state.wrote:
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_setting('REPLICAS')}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication.
+        if db in get_setting('REPLICAS'):
+            return False
+        return None
+
+
+def client_key(request):
+    """The user id in the request's access token, or else the client address."""
+    header = request.headers.get('Authorization', '').split()
+    if len(header) == 2 and header[0] in jwt_settings.AUTH_HEADER_TYPES:
+        try:
+            return f"user:{AccessToken(header[1])[jwt_settings.USER_ID_CLAIM]}"
+        except (TokenError, KeyError):
+            pass
+    return f"addr:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _pin_key(request):
+    return f"db-routing:pin:{client_key(request)}"
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, state)
+        return response
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _current.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, state)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _current.get()
+        if state is None or not get_setting('REPLICAS') or request.method not in SAFE_METHODS:
+            return None
+        view_class = getattr(view_func, 'view_class', view_func)
+        if getattr(view_class, 'replica_reads', False):
+            state.replica_reads = not caches[get_setting('CACHE_ALIAS')].get(_pin_key(request))
+        return None
+
+    def finish(self, request, state):
+        if state.wrote and get_setting('REPLICAS'):
+            caches[get_setting('CACHE_ALIAS')].set(_pin_key(request), True, get_setting('STICKY_SECONDS'))
@@ -0,0 +1,78 @@
+"""
+The ranked home feed. A periodic job (`manage.py rank_feed`) scores every
+active post on its views, likes and comments, decayed by age, and writes
+the top ``SIZE`` into ``PostRanking`` as consecutive ranks. Serving the
+feed is then a range scan of the unique rank index.
+"""
+import heapq
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from api import response_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # How many posts the feed holds.
+    'SIZE': 1000,
+    'VIEW_WEIGHT': 1,
+    'LIKE_WEIGHT': 4,
+    'COMMENT_WEIGHT': 8,
+    # How quickly scores fall with age; higher favours newer posts.
+    'GRAVITY': 1.5,
+    # Seconds between runs of `manage.py rank_feed`.
+    'INTERVAL': 300,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'FEED', {}).get(name, DEFAULTS[name])
+
+
+def score(views, likes, comments, age_hours):
+    """Engagement points over a power of age, so older posts need ever more engagement to stay up."""
+    points = (
+        views * get_setting('VIEW_WEIGHT')
+        + likes * get_setting('LIKE_WEIGHT')
+        + comments * get_setting('COMMENT_WEIGHT')
+    )
+    return (points + 1) / (max(age_hours, 0) + 2) ** get_setting('GRAVITY')
+
+
+def rank_posts(now=None):
+    """Rewrite the feed from current counters; return how many posts it holds."""
+    from api.models import Post, PostRanking
+
+    now = now or timezone.now()
+    rows = Post.objects.filter(status='Active').values_list('id', 'views', 'like_count', 'comment_count', 'date')
+    scored = (
+        (score(views, likes, comments, (now - date).total_seconds() / 3600), id)
+        for id, views, likes, comments, date in rows.iterator()
+    )
+    top = heapq.nlargest(get_setting('SIZE'), scored)
+
+    with transaction.atomic():
+        PostRanking.objects.all().delete()
+        PostRanking.objects.bulk_create(
+            PostRanking(post_id=id, rank=rank, score=value) for rank, (value, id) in enumerate(top, start=1)
+        )
+    response_cache.invalidate('feed')
+    return len(top)
+
+
+def run_worker(interval=None, once=False):
+    """Re-rank the feed every ``interval`` seconds."""
+    interval = interval if interval is not None else get_setting('INTERVAL')
+    total = 0
+    while True:
+        try:
+            total = rank_posts()
+        except Exception:
+            logger.exception("Ranking the feed failed")
+        if once:
+            return total
+        time.sleep(interval)
@@ -0,0 +1,148 @@
+import hashlib
+import io
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from api import media
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # name -> longest edge in pixels
+    'SIZES': {'thumbnail': 160, 'card': 480, 'full': 1280},
+    'QUALITY': 80,
+    'DIRECTORY': 'variants',
+    'BATCH_SIZE': 20,
+    'POLL_INTERVAL': 5,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'IMAGE_VARIANTS', {}).get(name, DEFAULTS[name])
+
+
+def _is_default(instance):
+    """Whether ``instance`` shows its field's shared placeholder image, which is never resized."""
+    return instance.image.name == instance._meta.get_field('image').default
+
+
+def enqueue_variants(sender, instance, **kwargs):
+    """
+    post_save receiver: queue a resize job when the image differs from the
+    one the stored variants were made from. The job replaces any queued
+    one, so a worker finishing the old job leaves the new image queued.
+    """
+    from api.models import ImageJob
+
+    source = instance.image.name if instance.image else ''
+    if source == instance.image_variants.get('source', ''):
+        return
+    if _is_default(instance) and not instance.image_variants:
+        return
+    with transaction.atomic():
+        ImageJob.objects.filter(model=sender._meta.label, object_id=instance.pk).delete()
+        ImageJob.objects.bulk_create(
+            [ImageJob(model=sender._meta.label, object_id=instance.pk)],
+            ignore_conflicts=True,
+        )
+
+
+def _encode(image, format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, quality=get_setting('QUALITY'), **options)
+    return buffer.getvalue()
+
+
+def _store(data, variant, extension):
+    """Save ``data`` under a name derived from its hash; identical output is stored once."""
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    name = f"{get_setting('DIRECTORY')}/{digest}-{variant}.{extension}"
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def build_variants(field_file):
+    """
+    Resize ``field_file`` to every configured size and encode each one as
+    WebP plus a JPEG (or PNG, for images with transparency) fallback.
+    Returns the ``image_variants`` dict to store on the instance.
+    """
+    with field_file.open('rb') as f:
+        original = Image.open(f)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+
+    transparent = original.mode in ('RGBA', 'LA') or 'transparency' in original.info
+    fallback_format, fallback_extension = ('PNG', 'png') if transparent else ('JPEG', 'jpg')
+
+    variants = {'source': field_file.name}
+    for name, edge in get_setting('SIZES').items():
+        image = original.copy()
+        image.thumbnail((edge, edge), Image.LANCZOS)
+        image = image.convert('RGBA' if transparent else 'RGB')
+        variants[name] = {
+            'width': image.width,
+            'height': image.height,
+            'webp': _store(_encode(image, 'WEBP', method=4), name, 'webp'),
+            'fallback': _store(_encode(image, fallback_format, optimize=True), name, fallback_extension),
+        }
+    return variants
+
+
+def process_job(job):
+    from api.models import ImageJob
+
+    model = apps.get_model(job.model)
+    instance = model.objects.filter(pk=job.object_id).first()
+    variants = {}
+    if instance is not None and instance.image and not _is_default(instance):
+        # Resizing happens outside any transaction.
+        try:
+            variants = build_variants(instance.image)
+        except (OSError, UnidentifiedImageError) as error:
+            logger.warning("Could not build image variants for %s %s: %s", job.model, job.object_id, error)
+            variants = {'source': instance.image.name}
+
+    with transaction.atomic():
+        # Deleted with the result, so a failed job stays queued.
+        ImageJob.objects.filter(id=job.id).delete()
+        if instance is None:
+            return
+        # Only store the result if the image wasn't replaced while we worked.
+        if model.objects.filter(pk=instance.pk, image=instance.image.name).update(image_variants=variants):
+            media.replace_references(media.variant_files(instance.image_variants), media.variant_files(variants))
+
+
+def process_pending(batch_size=None):
+    """Build variants for up to ``batch_size`` queued images; returns how many."""
+    from api.models import ImageJob
+
+    jobs = list(ImageJob.objects.order_by('id')[:batch_size or get_setting('BATCH_SIZE')])
+    for job in jobs:
+        process_job(job)
+    return len(jobs)
+
+
+def run_worker(interval=None, once=False):
+    interval = interval if interval is not None else get_setting('POLL_INTERVAL')
+    total = 0
+    while True:
+        try:
+            processed = process_pending()
+        except Exception:
+            logger.exception("Image batch failed")
+            processed = 0
+        total += processed
+        if processed:
+            continue
+        if once:
+            return total
+        time.sleep(interval)
@@ -0,0 +1,285 @@
+"""
+Per-request cost accounting: SQL query count and time, serializer time
+and total time for every request, reported as a ``Server-Timing`` header,
+one structured log line per request, a slow-request log with the SQL that
+ran, and Prometheus metrics at ``/metrics``.
+
+Query time is measured by an execute wrapper installed on every database
+connection; serializer time by timing DRF's ``Serializer.data`` and
+``JSONRenderer.render``. Both only do work while a request is being
+measured. Metrics are kept per process, so scrape every worker. Only
+local addresses, other allowed networks or holders of ``METRICS_TOKEN``
+may read them.
+"""
+import hmac
+import ipaddress
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger('api.requests')
+slow_logger = logging.getLogger('api.slow_requests')
+
+DEFAULTS = {
+    'SERVER_TIMING': True,
+    'LOG_REQUESTS': True,
+    # Requests slower than this (milliseconds) are logged with their SQL.
+    'SLOW_REQUEST_MS': 1000,
+    # Most statements kept per request for the slow-request log.
+    'SLOW_REQUEST_MAX_QUERIES': 100,
+    # Upper bounds, in seconds, of the request duration histogram.
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    # Clients allowed to scrape /metrics: addresses in these networks, or
+    # any client sending "Authorization: Bearer <METRICS_TOKEN>".
+    'METRICS_ALLOWED_NETWORKS': ('127.0.0.0/8', '::1/128'),
+    'METRICS_TOKEN': None,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'db_time', 'serialize_time', 'statements', 'depth')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.statements = []
+        self.depth = 0
+
+
+# Shared with threads running sync_to_async code for the same request.
+_current = ContextVar('api_request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.db_time += duration
+        if len(metrics.statements) < get_setting('SLOW_REQUEST_MAX_QUERIES'):
+            metrics.statements.append((duration, sql))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializing():
+    """Count the enclosed time as serialization, once however deeply nested."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics.depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.depth -= 1
+        if not metrics.depth:
+            metrics.serialize_time += time.perf_counter() - started
+
+
+_instrumented = False
+
+
+def instrument_serializers():
+    """Time DRF serialization and JSON rendering; called once from ApiConfig.ready."""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+
+    from rest_framework import renderers, serializers
+
+    def timed_property(prop):
+        def fget(self):
+            with serializing():
+                return prop.fget(self)
+        return property(fget)
+
+    def timed_method(method):
+        def wrapper(*args, **kwargs):
+            with serializing():
+                return method(*args, **kwargs)
+        return wrapper
+
+    serializers.Serializer.data = timed_property(serializers.Serializer.data)
+    serializers.ListSerializer.data = timed_property(serializers.ListSerializer.data)
+    renderers.JSONRenderer.render = timed_method(renderers.JSONRenderer.render)
+
+
+class Registry:
+    """Per-process request counters and a duration histogram, labelled by route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._series = {}
+
+    def observe(self, view, method, status, duration, metrics):
+        buckets = get_setting('BUCKETS')
+        with self._lock:
+            key = (view, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            series = self._series.get((view, method))
+            if series is None:
+                series = self._series[(view, method)] = {
+                    'buckets': [0] * len(buckets), 'count': 0, 'sum': 0.0, 'db': 0.0, 'serialize': 0.0, 'queries': 0,
+                }
+            for index, bound in enumerate(buckets):
+                if duration <= bound:
+                    series['buckets'][index] += 1
+            series['count'] += 1
+            series['sum'] += duration
+            series['db'] += metrics.db_time
+            series['serialize'] += metrics.serialize_time
+            series['queries'] += metrics.queries
+
+    def reset(self):
+        with self._lock:
+            self._requests.clear()
+            self._series.clear()
+
+    def render(self):
+        """The metrics in Prometheus text exposition format."""
+        buckets = get_setting('BUCKETS')
+        with self._lock:
+            requests = dict(self._requests)
+            series = {key: dict(value, buckets=list(value['buckets'])) for key, value in self._series.items()}
+
+        lines = [
+            "# HELP api_requests_total Requests handled, by route, method and status.",
+            "# TYPE api_requests_total counter",
+        ]
+        for (view, method, status), count in sorted(requests.items()):
+            lines.append(f"api_requests_total{_labels(view=view, method=method, status=status)} {count}")
+
+        lines += [
+            "# HELP api_request_duration_seconds Time from request to response.",
+            "# TYPE api_request_duration_seconds histogram",
+        ]
+        for (view, method), values in sorted(series.items()):
+            for bound, count in zip(buckets, values['buckets']):
+                lines.append(f"api_request_duration_seconds_bucket{_labels(view=view, method=method, le=bound)} {count}")
+            lines.append(f"api_request_duration_seconds_bucket{_labels(view=view, method=method, le='+Inf')} {values['count']}")
+            lines.append(f"api_request_duration_seconds_sum{_labels(view=view, method=method)} {values['sum']}")
+            lines.append(f"api_request_duration_seconds_count{_labels(view=view, method=method)} {values['count']}")
+
+        for name, field, help in (
+            ('api_request_db_seconds_total', 'db', "Time spent executing SQL."),
+            ('api_request_serialize_seconds_total', 'serialize', "Time spent in serializers and JSON rendering."),
+            ('api_request_queries_total', 'queries', "SQL statements executed."),
+        ):
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} counter"]
+            for (view, method), values in sorted(series.items()):
+                lines.append(f"{name}{_labels(view=view, method=method)} {values[field]}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+
+registry = Registry()
+
+
+def metrics_allowed(request):
+    token = get_setting('METRICS_TOKEN')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in get_setting('METRICS_ALLOWED_NETWORKS'))
+
+
+def metrics_view(request):
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class InstrumentationMiddleware:
+    """Measures each request; place it first so the total covers the other middleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        duration = time.perf_counter() - metrics.started
+        match = getattr(request, 'resolver_match', None)
+        view = match.route if match else 'unmatched'
+        registry.observe(view, request.method, response.status_code, duration, metrics)
+
+        if get_setting('SERVER_TIMING'):
+            response['Server-Timing'] = (
+                f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries", '
+                f'serialize;dur={metrics.serialize_time * 1000:.2f}, '
+                f'total;dur={duration * 1000:.2f}'
+            )
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'db_ms': round(metrics.db_time * 1000, 2),
+            'queries': metrics.queries,
+            'serialize_ms': round(metrics.serialize_time * 1000, 2),
+        }
+        if get_setting('LOG_REQUESTS'):
+            logger.info(json.dumps(record))
+        if duration * 1000 >= get_setting('SLOW_REQUEST_MS'):
+            record['sql'] = [{'ms': round(seconds * 1000, 2), 'sql': sql} for seconds, sql in metrics.statements]
+            slow_logger.warning(json.dumps(record))
+        return response
@@ -0,0 +1,269 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from api import author_stats, notifications, response_cache
+from api.counters import adjust_post_counters, recount_post_counters
+
+MAX_BATCH_OPERATIONS = 100
+
+# op name -> (response key, notification type, author stats field)
+TOGGLES = {
+    'like': ('liked', 'Like', 'likes'),
+    'bookmark': ('bookmarked', 'Bookmark', 'bookmarks'),
+}
+
+
+_STATE = serializers.BooleanField(required=False, allow_null=True)
+
+
+def parse_state(value):
+    """
+    A requested like/bookmark state from JSON or form data: ``True`` or
+    ``False`` for values like ``"false"`` and ``0``, ``None`` (toggle) when
+    absent or null. Raises ``ValidationError`` for anything else.
+    """
+    if value is None:
+        return None
+    return _STATE.to_internal_value(value)
+
+
+def _set_membership(queryset, create, value):
+    """
+    Make the row selected by ``queryset`` exist (``value=True``), not exist
+    (``False``) or flip (``None``), relying on the table's unique constraint
+    instead of a read-then-write. Returns ``(state, delta)`` where delta is
+    the change in the number of rows.
+    """
+    if value is not True:
+        deleted, _ = queryset.delete()
+        if deleted or value is False:
+            return False, -deleted
+
+    try:
+        with transaction.atomic():
+            create()
+    except IntegrityError:
+        # Already there, e.g. a concurrent double-click got in first.
+        return True, 0
+    return True, 1
+
+
+def _current_count(post_id, field):
+    from api.models import Post
+
+    return Post.objects.filter(id=post_id).values_list(field, flat=True).first()
+
+
+def set_like(user_id, post_id, author_id, liked=None):
+    """Like, unlike or toggle (``liked=None``); returns ``(liked, like_count)``."""
+    from api.models import Post
+
+    likes = Post.likes.through.objects
+    with transaction.atomic():
+        state, delta = _set_membership(
+            likes.filter(post_id=post_id, customuser_id=user_id),
+            lambda: likes.create(post_id=post_id, customuser_id=user_id),
+            liked,
+        )
+        if delta:
+            adjust_post_counters(post_id, like_count=delta)
+            author_stats.record_activity(author_id, likes=delta)
+        if delta > 0:
+            notifications.enqueue(author_id, post_id, 'Like')
+        return state, _current_count(post_id, 'like_count')
+
+
+def set_bookmark(user_id, post_id, author_id, bookmarked=None):
+    """Bookmark, unbookmark or toggle; returns ``(bookmarked, bookmark_count)``."""
+    from api.models import Bookmark
+
+    with transaction.atomic():
+        state, delta = _set_membership(
+            Bookmark.objects.filter(post_id=post_id, user_id=user_id),
+            lambda: Bookmark.objects.create(post_id=post_id, user_id=user_id),
+            bookmarked,
+        )
+        if delta:
+            adjust_post_counters(post_id, bookmark_count=delta)
+            author_stats.record_activity(author_id, bookmarks=delta)
+        if delta > 0:
+            notifications.enqueue(author_id, post_id, 'Bookmark')
+        return state, _current_count(post_id, 'bookmark_count')
+
+
+def _members(op, user_id, post_ids):
+    from api.models import Bookmark, Post
+
+    if op == 'like':
+        rows = Post.likes.through.objects.filter(customuser_id=user_id, post_id__in=post_ids)
+    else:
+        rows = Bookmark.objects.filter(user_id=user_id, post_id__in=post_ids)
+    return set(rows.values_list('post_id', flat=True))
+
+
+def _create(model, **fields):
+    try:
+        with transaction.atomic():
+            model.objects.create(**fields)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _write_membership(op, user_id, added, removed):
+    """
+    Insert ``added`` and delete ``removed``; returns the post ids actually
+    inserted and deleted, which differ when a concurrent request got there
+    first.
+    """
+    from api.models import Bookmark, Post
+
+    if op == 'like':
+        model, user_field = Post.likes.through, 'customuser_id'
+    else:
+        model, user_field = Bookmark, 'user_id'
+    rows = model.objects.filter(**{user_field: user_id})
+    if removed:
+        # Locked, so of two concurrent removals only one sees the row.
+        removed = set(rows.filter(post_id__in=removed).select_for_update().values_list('post_id', flat=True))
+        rows.filter(post_id__in=removed).delete()
+    if added:
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create([model(**{user_field: user_id}, post_id=post_id) for post_id in added])
+        except IntegrityError:
+            # Some rows were inserted concurrently; find out which are ours.
+            added = {post_id for post_id in added if _create(model, **{user_field: user_id}, post_id=post_id)}
+    return added, removed
+
+
+def _post_id(op):
+    """The operation's ``post_id`` if it is an integer, else None."""
+    post_id = op.get('post_id') if isinstance(op, dict) else None
+    return post_id if isinstance(post_id, int) and not isinstance(post_id, bool) else None
+
+
+def _check(op):
+    """Why ``op`` is malformed, or None if it has the shape its kind needs."""
+    from api.models import Comment
+
+    kind = op.get('op') if isinstance(op, dict) else None
+    if not isinstance(kind, str) or (kind not in TOGGLES and kind != 'comment'):
+        return 'Unknown operation'
+    if _post_id(op) is None:
+        return 'Invalid post_id'
+    if kind == 'comment':
+        for field in ('name', 'email', 'comment'):
+            value = op.get(field, '')
+            max_length = Comment._meta.get_field(field).max_length
+            if not isinstance(value, str) or (max_length and len(value) > max_length):
+                return f'Invalid {field}'
+        if not op.get('comment'):
+            return 'Empty comment'
+    return None
+
+
+def apply_batch(user_id, operations):
+    """
+    Apply a list of like, bookmark and comment operations for one user in a
+    single transaction. Likes and bookmarks are replayed in order against
+    the user's current state, and only the net change is written, with one
+    bulk INSERT and one DELETE per kind. Comments are bulk-inserted.
+
+    Each operation is ``{'op': 'like' | 'bookmark', 'post_id', 'value'}``
+    (``value`` true/false sets the state, missing toggles it) or
+    ``{'op': 'comment', 'post_id', 'name', 'email', 'comment'}``. Returns a
+    result per operation and the new counters of every post touched.
+    """
+    from api.models import Post
+
+    post_ids = {_post_id(op) for op in operations} - {None}
+    authors = dict(Post.objects.filter(id__in=post_ids).values_list('id', 'user_id'))
+
+    with transaction.atomic():
+        results, state, comments = _replay(user_id, operations, authors)
+        _write(user_id, authors, state, comments)
+
+    posts = {
+        post_id: {'like_count': likes, 'comment_count': comment_count, 'bookmark_count': bookmarks}
+        for post_id, likes, comment_count, bookmarks in Post.objects.filter(id__in=list(authors)).values_list(
+            'id', 'like_count', 'comment_count', 'bookmark_count'
+        )
+    }
+    return results, posts
+
+
+def _replay(user_id, operations, authors):
+    """Work out each operation's result and the user's final state per kind."""
+    from api.models import Comment
+
+    results = []
+    comments = []
+    state = {}
+    for kind in TOGGLES:
+        initial = _members(kind, user_id, list(authors))
+        state[kind] = (initial, set(initial))
+
+    for index, op in enumerate(operations):
+        error = _check(op)
+        if error:
+            results.append({'index': index, 'ok': False, 'error': error})
+            continue
+        kind, post_id = op['op'], op['post_id']
+        if post_id not in authors:
+            results.append({'index': index, 'ok': False, 'error': 'Post not found'})
+            continue
+
+        if kind == 'comment':
+            comments.append(Comment(post_id=post_id, name=op.get('name', ''), email=op.get('email', ''), comment=op['comment']))
+            results.append({'index': index, 'ok': True, 'op': kind, 'post_id': post_id})
+            continue
+
+        try:
+            value = parse_state(op.get('value'))
+        except serializers.ValidationError:
+            results.append({'index': index, 'ok': False, 'error': 'Invalid value'})
+            continue
+        members = state[kind][1]
+        on = (post_id not in members) if value is None else value
+        if on:
+            members.add(post_id)
+        else:
+            members.discard(post_id)
+        results.append({'index': index, 'ok': True, 'op': kind, 'post_id': post_id, TOGGLES[kind][0]: on})
+    return results, state, comments
+
+
+def _write(user_id, authors, state, comments):
+    """Write the net change of a replayed batch and everything derived from it."""
+    from api.models import Comment
+
+    events = []
+    stats = defaultdict(Counter)
+    touched = set()
+    for kind, (initial, final) in state.items():
+        _, noti_type, field = TOGGLES[kind]
+        added, removed = _write_membership(kind, user_id, final - initial, initial - final)
+        touched |= added | removed
+        for post_id in added:
+            stats[authors[post_id]][field] += 1
+            events.append((authors[post_id], post_id, noti_type))
+        for post_id in removed:
+            stats[authors[post_id]][field] -= 1
+
+    if comments:
+        Comment.objects.bulk_create(comments)
+        touched |= {comment.post_id for comment in comments}
+        events += [(authors[comment.post_id], comment.post_id, 'Comment') for comment in comments]
+        # bulk_create sends no post_save, so invalidate explicitly.
+        response_cache.invalidate(*response_cache.MODEL_TAGS['Comment'])
+
+    if touched:
+        # Recount rather than apply deltas so concurrent single toggles
+        # can't make the counters drift.
+        recount_post_counters(touched)
+    for author_id, deltas in stats.items():
+        author_stats.record_activity(author_id, **deltas)
+    notifications.enqueue_many(events)
@@ -0,0 +1,61 @@
+import asyncio
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, override_settings
+
+
+async def run(path, requests, concurrency):
+    client = AsyncClient()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} answered {response.status_code}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'rps': requests / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync DRF read endpoints with their async twins under Django's ASGI handler, "
+        "in process, with concurrent requests. Run it against a populated database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['post/list/', 'post/category/list/'], help="Paths below /api/v1/.")
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--cached', action='store_true', help="Let the response cache answer repeat requests.")
+
+    def handle(self, *args, **options):
+        response_cache = dict(getattr(settings, 'RESPONSE_CACHE', {}))
+        if not options['cached']:
+            response_cache['TIMEOUT'] = 0
+
+        # AsyncClient sends Host: testserver.
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with override_settings(RESPONSE_CACHE=response_cache, ALLOWED_HOSTS=allowed_hosts):
+            for path in options['paths']:
+                for label, prefix in (('sync', '/api/v1/'), ('async', '/api/v1/async/')):
+                    result = asyncio.run(run(prefix + path, options['requests'], options['concurrency']))
+                    self.stdout.write(
+                        f"{label:>5} {path}: {result['rps']:.0f} req/s, "
+                        f"p50 {result['p50']:.1f} ms, p95 {result['p95']:.1f} ms"
+                    )
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,91 @@
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings, setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from api import benchmark
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset into a throwaway test database, replay a weighted mix of API requests "
+        "against it and report p50/p95/p99 latency, throughput and queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(benchmark.SCALES), default='small')
+        for name in ('users', 'posts', 'likes', 'comments', 'bookmarks'):
+            parser.add_argument(f'--{name}', type=int, help=f"Override the scale's {name} (likes, comments and bookmarks are per post).")
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the dataset and the request sequence.")
+        parser.add_argument('--no-response-cache', action='store_true', help="Bypass the response cache so every read hits the database.")
+        parser.add_argument('--output', help="Write the summary as JSON to this file.")
+
+    def handle(self, *args, **options):
+        scale = dict(benchmark.SCALES[options['scale']])
+        scale.update({name: options[name] for name in scale if options[name] is not None})
+
+        overrides = {
+            # Flush view counts inline so no background thread writes
+            # while requests are being measured.
+            'VIEW_COUNTER': {**getattr(settings, 'VIEW_COUNTER', {}), 'FLUSH_INTERVAL': 0},
+            'MEDIA_ROOT': tempfile.mkdtemp(prefix='benchmark-media-'),
+        }
+        overrides['UPLOADS'] = {**getattr(settings, 'UPLOADS', {}), 'DIRECTORY': overrides['MEDIA_ROOT'] + '/uploads'}
+        if options['no_response_cache']:
+            overrides['RESPONSE_CACHE'] = {**getattr(settings, 'RESPONSE_CACHE', {}), 'TIMEOUT': 0}
+
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(**overrides):
+                data = benchmark.seed(seed=options['seed'], stdout=self.stdout, **scale)
+                workload = benchmark.Workload(data, seed=options['seed'])
+                samples, elapsed = benchmark.run(workload, options['requests'], warmup=options['warmup'])
+                summary = benchmark.summarize(samples, elapsed)
+                vendor = connection.vendor
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(overrides['MEDIA_ROOT'], ignore_errors=True)
+
+        summary['meta'] = {
+            'revision': git_revision(),
+            'scale': scale,
+            'requests': options['requests'],
+            'seed': options['seed'],
+            'response_cache': not options['no_response_cache'],
+            'database': vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+        self.print_summary(summary)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
+            self.stdout.write(f"Wrote {options['output']}")
+
+    def print_summary(self, summary):
+        self.stdout.write(f"{'endpoint':<26}{'reqs':>6}{'err':>5}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        rows = [*summary['endpoints'].items(), ('total', summary['total'])]
+        for name, stats in rows:
+            self.stdout.write(
+                f"{name:<26}{stats['requests']:>6}{stats['errors']:>5}{stats['p50_ms']:>9.2f}"
+                f"{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['queries_mean']:>9.2f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Throughput: {summary['total']['throughput_rps']} requests/s"))
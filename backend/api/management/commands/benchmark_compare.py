@@ -0,0 +1,95 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import benchmark
+
+# Migrations before this one were git-ignored until they were committed.
+FIRST_TRACKED_MIGRATION = '0004'
+
+
+class Command(BaseCommand):
+    help = (
+        "Run `manage.py benchmark` on two git revisions (each in its own worktree, with the same options) "
+        "or diff two saved results, and fail if any endpoint regressed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base', help="Base git revision, or a JSON file written by `benchmark --output`.")
+        parser.add_argument('head', nargs='?', default='HEAD', help="Revision or JSON file to compare (default HEAD).")
+        parser.add_argument('--threshold', type=float, default=20.0, help="Allowed p95 growth in percent (default 20).")
+        parser.add_argument('--min-samples', type=int, default=30, help="Requests an endpoint needs on both sides before its latency is judged.")
+        parser.add_argument('--benchmark-args', default='', help="Extra arguments for `manage.py benchmark`, e.g. \"--scale medium\".")
+
+    def handle(self, *args, **options):
+        base = self.load(options['base'], options['benchmark_args'])
+        head = self.load(options['head'], options['benchmark_args'])
+
+        self.stdout.write(f"{'endpoint':<26}{'p95 base':>10}{'p95 head':>10}{'change':>9}{'q base':>8}{'q head':>8}")
+        regressions = []
+        for name, old, new, regressed in benchmark.compare(base, head, options['threshold'], options['min_samples']):
+            if not (old and new):
+                self.stdout.write(f"{name:<26}{'only in ' + ('head' if new else 'base'):>20}")
+                continue
+            change = (new['p95_ms'] / old['p95_ms'] - 1) * 100 if old['p95_ms'] else 0
+            line = (
+                f"{name:<26}{old['p95_ms']:>10.2f}{new['p95_ms']:>10.2f}{change:>+8.1f}%"
+                f"{old['queries_mean']:>8.2f}{new['queries_mean']:>8.2f}"
+            )
+            if regressed:
+                regressions.append(name)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(f"Regressed: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("No regressions."))
+
+    def load(self, target, benchmark_args):
+        if os.path.isfile(target):
+            with open(target) as f:
+                return json.load(f)
+        return self.run_revision(target, benchmark_args)
+
+    def run_revision(self, revision, benchmark_args):
+        repo = self.git('rev-parse', '--show-toplevel', cwd=settings.BASE_DIR).strip()
+        backend = os.path.relpath(settings.BASE_DIR, repo)
+        worktree = tempfile.mkdtemp(prefix='benchmark-')
+        output = os.path.join(worktree, 'benchmark.json')
+        self.git('worktree', 'add', '--detach', worktree, revision, cwd=repo)
+        try:
+            self.copy_untracked_migrations(os.path.join(worktree, backend))
+            self.stdout.write(f"Benchmarking {revision}...")
+            command = [sys.executable, 'manage.py', 'benchmark', '--output', output, *benchmark_args.split()]
+            result = subprocess.run(command, cwd=os.path.join(worktree, backend), capture_output=True, text=True)
+            if result.returncode:
+                raise CommandError(f"Benchmark of {revision} failed:\n{result.stderr[-2000:]}")
+            with open(output) as f:
+                return json.load(f)
+        finally:
+            self.git('worktree', 'remove', '--force', worktree, cwd=repo)
+            shutil.rmtree(worktree, ignore_errors=True)
+
+    def copy_untracked_migrations(self, backend):
+        # Older revisions git-ignored the initial migrations, so their
+        # checkouts start at 0004 or have none; reuse the local copies of
+        # the ones they lack. Everything later comes from the revision.
+        source = os.path.join(settings.BASE_DIR, 'api', 'migrations')
+        target = os.path.join(backend, 'api', 'migrations')
+        present = sorted(name for name in os.listdir(target) if name[:4].isdigit() and name.endswith('.py'))
+        first = present[0] if present else FIRST_TRACKED_MIGRATION
+        for name in os.listdir(source):
+            if name[:4].isdigit() and name.endswith('.py') and name < first and name not in present:
+                shutil.copy(os.path.join(source, name), target)
+
+    def git(self, *args, cwd):
+        result = subprocess.run(['git', *args], cwd=cwd, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"git {' '.join(args)} failed: {result.stderr.strip()}")
+        return result.stdout
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api import related
+
+
+class Command(BaseCommand):
+    help = "Refresh the related and same-author posts of changed posts, or rebuild them all."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help="Recompute every post instead of the queued ones.")
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit instead of polling.")
+        parser.add_argument('--interval', type=float, default=None, help="Seconds between polls of an empty queue.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            indexed = related.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} posts."))
+            return
+        processed = related.run_worker(interval=options['interval'], once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f"Refreshed related posts around {processed} changed posts."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.media import collect, recount
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed media files that no row references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true', help="Rebuild the reference counts from the database first.")
+        parser.add_argument('--grace-period', type=int, help="Seconds an unreferenced file is kept (default MEDIA_STORAGE['GRACE_PERIOD']).")
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            recount()
+        files, freed = collect(options['grace_period'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {files} unreferenced files ({freed} bytes)."))
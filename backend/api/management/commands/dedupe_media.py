@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.media import dedupe
+
+
+class Command(BaseCommand):
+    help = "Move existing media files into the content-addressed store and rewrite the rows that use them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be reclaimed without changing anything.")
+
+    def handle(self, *args, **options):
+        files, saved = dedupe(dry_run=options['dry_run'])
+        verb = "Would move" if options['dry_run'] else "Moved"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {files} files, reclaiming {saved} bytes."))
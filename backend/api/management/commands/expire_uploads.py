@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.uploads import expire
+
+
+class Command(BaseCommand):
+    help = "Delete chunked upload sessions that have been idle longer than UPLOADS['EXPIRY']."
+
+    def handle(self, *args, **options):
+        expired = expire()
+        self.stdout.write(self.style.SUCCESS(f"Removed {expired} stale uploads."))
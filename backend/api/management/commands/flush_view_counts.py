@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.view_counter import drain_spool
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply post view counts spooled to VIEW_COUNTER['SPOOL_DIR'] after failed flushes. "
+        "Counts still buffered in the memory of running workers are flushed by those workers."
+    )
+
+    def handle(self, *args, **options):
+        drained = drain_spool()
+        self.stdout.write(self.style.SUCCESS(f"Applied {drained} spooled views."))
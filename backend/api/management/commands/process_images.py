@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.images import run_worker
+
+
+class Command(BaseCommand):
+    help = "Build resized WebP/JPEG variants for newly uploaded post, category and profile images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue and exit instead of polling.")
+        parser.add_argument('--interval', type=float, default=None, help="Seconds between polls of an empty queue.")
+
+    def handle(self, *args, **options):
+        processed = run_worker(interval=options['interval'], once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} images."))
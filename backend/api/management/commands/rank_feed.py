@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.feed import run_worker
+
+
+class Command(BaseCommand):
+    help = "Score active posts and rewrite the ranked feed served at post/feed/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Rank once and exit instead of repeating.")
+        parser.add_argument('--interval', type=float, default=None, help="Seconds between rankings.")
+
+    def handle(self, *args, **options):
+        ranked = run_worker(interval=options['interval'], once=options['once'])
+        self.stdout.write(self.style.SUCCESS(f"Ranked {ranked} posts."))
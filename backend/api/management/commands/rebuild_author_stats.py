@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import author_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the author dashboard totals and daily buckets from posts and bookmarks."
+
+    def handle(self, *args, **options):
+        authors = author_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {authors} authors."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.search import get_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over posts."
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if backend is None:
+            raise CommandError("Full-text search needs SQLite or PostgreSQL.")
+        indexed = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} posts."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.counters import recount_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized like, comment, bookmark, post and tag counters."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            posts, categories, tags = recount_counters()
+        self.stdout.write(self.style.SUCCESS(f"Recounted {posts} posts, {categories} categories and {tags} tags."))
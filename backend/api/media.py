@@ -0,0 +1,270 @@
+import hashlib
+import os
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.files import File, locks
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F
+from django.views.static import serve as serve_static
+
+DEFAULTS = {
+    'DIRECTORY': 'blobs',
+    # Unreferenced blobs younger than this are kept: they may belong to a
+    # save that hasn't committed its row yet.
+    'GRACE_PERIOD': 24 * 60 * 60,
+    'MAX_AGE': 365 * 24 * 60 * 60,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'MEDIA_STORAGE', {}).get(name, DEFAULTS[name])
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(get_setting('DIRECTORY') + '/')
+
+
+def blob_name(digest, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return f"{get_setting('DIRECTORY')}/{digest[:2]}/{digest}{extension}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every file once, named after the SHA-256 of its content, so the
+    same banner uploaded twice occupies one file. The requested name only
+    contributes its extension. Blobs are never modified in place, which is
+    what makes far-future cache headers safe; see ``serve``.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        name = blob_name(digest.hexdigest(), name)
+        if not self.exists(name):
+            try:
+                # Creates the file with O_EXCL, see get_available_name.
+                return self._save(name, content)
+            except FileExistsError:
+                # The same content was saved concurrently. Its writer holds
+                # an exclusive lock until the file is complete.
+                with open(self.path(name), 'rb') as f:
+                    locks.lock(f, locks.LOCK_SH)
+                    locks.unlock(f)
+        # Refresh the mtime so garbage collection treats it as new.
+        os.utime(self.path(name))
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # _save asks for another name when the blob appeared after exists();
+        # a blob's name is its content, so there is no other name to use.
+        raise FileExistsError(name)
+
+
+def _name(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.name or ''
+
+
+def _file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+
+def variant_files(variants):
+    for variant in (variants or {}).values():
+        if isinstance(variant, dict):
+            yield from (variant.get('webp'), variant.get('fallback'))
+
+
+def adjust(changes):
+    """Apply ``{blob name: delta}`` to the reference counts."""
+    from api.models import MediaBlob
+
+    for name, delta in changes.items():
+        if not delta or not is_blob(name):
+            continue
+        if MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + delta) or delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, refcount=delta)
+        except IntegrityError:
+            MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + delta)
+
+
+def replace_references(old, new):
+    """Move one reference from each name in ``old`` to each name in ``new``."""
+    changes = Counter(name for name in new if name)
+    changes.subtract(name for name in old if name)
+    adjust(changes)
+
+
+def remember_files(sender, instance, **kwargs):
+    """post_init receiver: note the file names as loaded, to diff on save."""
+    instance._media_files = {
+        field.attname: _name(instance.__dict__.get(field.attname)) for field in _file_fields(sender)
+    }
+
+
+def track_files(sender, instance, created, **kwargs):
+    """post_save receiver: move references from replaced files to new ones."""
+    previous = getattr(instance, '_media_files', {})
+    old, new = [], []
+    for field in _file_fields(sender):
+        name = _name(instance.__dict__.get(field.attname)) or ''
+        before = '' if created else previous.get(field.attname)
+        if name == before:
+            continue
+        new.append(name)
+        # An unknown (deferred) previous value is not released: counting
+        # a blob too often only delays its cleanup.
+        if before is not None:
+            old.append(before)
+    if old or new:
+        replace_references(old, new)
+    remember_files(sender, instance)
+
+
+def release_files(sender, instance, **kwargs):
+    """post_delete receiver: drop the references held by a deleted row."""
+    names = [_name(instance.__dict__.get(field.attname)) for field in _file_fields(sender)]
+    names += variant_files(getattr(instance, 'image_variants', None))
+    replace_references(names, [])
+
+
+def _references():
+    from api.models import Category, Post, Profile
+
+    counts = Counter()
+    for model in (Post, Category, Profile):
+        for field in _file_fields(model):
+            rows = model.objects.order_by().values(field.attname).annotate(n=Count('pk')).values_list(field.attname, 'n')
+            counts.update({name: n for name, n in rows if is_blob(name)})
+        for variants in model.objects.values_list('image_variants', flat=True).iterator():
+            counts.update(name for name in variant_files(variants) if is_blob(name))
+    return counts
+
+
+def recount():
+    """Rebuild every reference count from the rows that point at blobs."""
+    from api.models import MediaBlob
+
+    counts = _references()
+    with transaction.atomic():
+        MediaBlob.objects.all().delete()
+        MediaBlob.objects.bulk_create(
+            (MediaBlob(name=name, refcount=n) for name, n in counts.items()),
+            batch_size=1000,
+        )
+    return len(counts)
+
+
+def collect(grace_period=None):
+    """
+    Delete blobs that nothing references and that haven't been written or
+    re-saved for ``grace_period`` seconds. Returns ``(files, bytes)`` freed.
+    """
+    from api.models import MediaBlob
+
+    grace_period = get_setting('GRACE_PERIOD') if grace_period is None else grace_period
+    root = default_storage.path(get_setting('DIRECTORY'))
+    cutoff = time.time() - grace_period
+
+    candidates = {}
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            if stat.st_mtime < cutoff:
+                name = os.path.relpath(path, default_storage.location).replace(os.sep, '/')
+                candidates[name] = stat.st_size
+
+    referenced = set(MediaBlob.objects.filter(name__in=list(candidates), refcount__gt=0).values_list('name', flat=True))
+    freed = 0
+    removed = 0
+    for name, size in candidates.items():
+        if name in referenced:
+            continue
+        MediaBlob.objects.filter(name=name, refcount__lte=0).delete()
+        path = default_storage.path(name)
+        # Re-check the mtime: a concurrent save of the same content touches it.
+        if os.path.exists(path) and os.stat(path).st_mtime < cutoff:
+            os.remove(path)
+            removed += 1
+            freed += size
+    return removed, freed
+
+
+def dedupe(dry_run=False):
+    """
+    Move every file referenced by a FileField that isn't a blob yet into
+    the content-addressed store, point the rows at the blob and delete the
+    original. Field defaults (e.g. the stock avatar) are left alone since
+    new rows keep using that path. Returns ``(files, bytes)`` reclaimed;
+    with ``dry_run`` nothing is written.
+    """
+    from api.models import Category, Post, Profile
+
+    storage = ContentAddressedStorage()
+    plain = FileSystemStorage()
+    fields = [(model, field) for model in (Post, Category, Profile) for field in _file_fields(model)]
+
+    moved = {}
+    blob_sizes = {}
+    for model, field in fields:
+        names = model.objects.order_by().exclude(**{field.attname: ''}).values_list(field.attname, flat=True).distinct()
+        for name in names:
+            if not name or is_blob(name) or name == field.default or name in moved or not plain.exists(name):
+                continue
+            with plain.open(name, 'rb') as f:
+                if dry_run:
+                    digest = hashlib.sha256()
+                    for chunk in f.chunks():
+                        digest.update(chunk)
+                    blob = blob_name(digest.hexdigest(), name)
+                else:
+                    blob = storage.save(name, f)
+            moved[name] = blob
+            blob_sizes[blob] = plain.size(name)
+
+    original_bytes = sum(plain.size(name) for name in moved)
+    if dry_run:
+        return len(moved), original_bytes - sum(blob_sizes.values())
+
+    with transaction.atomic():
+        for model, field in fields:
+            for old, new in moved.items():
+                rows = list(model.objects.filter(**{field.attname: old}))
+                for row in rows:
+                    setattr(row, field.attname, new)
+                    if row.image_variants.get('source') == old:
+                        # Keep the variants; only the original's path changed.
+                        row.image_variants['source'] = new
+                model.objects.bulk_update(rows, [field.attname, 'image_variants'], batch_size=500)
+        recount()
+    for old in moved:
+        plain.delete(old)
+    return len(moved), original_bytes - sum(blob_sizes.values())
+
+
+def serve(request, path, document_root=None):
+    """
+    ``django.views.static.serve`` for MEDIA_URL that marks blobs as
+    immutable: their name changes whenever their content does.
+    """
+    response = serve_static(request, path, document_root=document_root or settings.MEDIA_ROOT)
+    if is_blob(path):
+        response['Cache-Control'] = f"public, max-age={get_setting('MAX_AGE')}, immutable"
+    return response
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.5 on 2026-10-17 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_category_post_notification_comment_bookmark'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='post',
+            name='view',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='views',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.5 on 2026-10-17 17:15
+
+from django.db import migrations, models
+
+
+def remove_duplicate_bookmarks(apps, schema_editor):
+    Bookmark = apps.get_model('api', 'Bookmark')
+    keep = Bookmark.objects.values('user', 'post').annotate(keep_id=models.Min('id')).values('keep_id')
+    Bookmark.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_remove_post_view_post_views'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-date', '-id'], name='comment_post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'read', '-date', '-id'], name='notification_user_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('status', 'Active')), fields=['-date', '-id'], name='post_active_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', 'status', '-date', '-id'], name='post_category_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', '-date', '-id'], name='post_user_date_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_bookmarks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bookmark',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_bookmark_user_post'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.5 on 2026-10-17 17:16
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('api', 'Post')
+    Category = apps.get_model('api', 'Category')
+    Comment = apps.get_model('api', 'Comment')
+    Bookmark = apps.get_model('api', 'Bookmark')
+
+    def count(queryset, field):
+        counts = queryset.filter(**{field: models.OuterRef('pk')}).order_by().values(field).annotate(n=models.Count('*')).values('n')
+        return Coalesce(models.Subquery(counts, output_field=models.IntegerField()), models.Value(0))
+
+    Post.objects.update(
+        like_count=count(Post.likes.through.objects, 'post_id'),
+        comment_count=count(Comment.objects, 'post_id'),
+        bookmark_count=count(Bookmark.objects, 'post_id'),
+    )
+    Category.objects.update(post_count=count(Post.objects, 'category_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='bookmark_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.1.5 on 2026-10-17 17:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_totals(apps, schema_editor):
+    Post = apps.get_model('api', 'Post')
+    AuthorStats = apps.get_model('api', 'AuthorStats')
+
+    totals = Post.objects.order_by().values('user_id').annotate(
+        total_views=models.Sum('views'),
+        total_posts=models.Count('id'),
+        total_likes=models.Sum('like_count'),
+        total_bookmarks=models.Sum('bookmark_count'),
+    )
+    AuthorStats.objects.bulk_create(
+        AuthorStats(
+            user_id=row['user_id'],
+            views=row['total_views'],
+            posts=row['total_posts'],
+            likes=row['total_likes'],
+            bookmarks=row['total_bookmarks'],
+        )
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('views', models.IntegerField(default=0)),
+                ('posts', models.IntegerField(default=0)),
+                ('likes', models.IntegerField(default=0)),
+                ('bookmarks', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Author Stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='AuthorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.IntegerField(default=0)),
+                ('posts', models.IntegerField(default=0)),
+                ('likes', models.IntegerField(default=0)),
+                ('bookmarks', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Author Daily Stats',
+                'ordering': ['-day'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'day'), name='unique_author_daily_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE api_post_fts USING fts5(title, description, tokenize='porter unicode61')",
+    "INSERT INTO api_post_fts (rowid, title, description) SELECT id, title, COALESCE(description, '') FROM api_post",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE IF EXISTS api_post_fts",
+]
+
+POSTGRES_FORWARD = [
+    "ALTER TABLE api_post ADD COLUMN search_document tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', COALESCE(title, '')), 'A') || "
+    "setweight(to_tsvector('english', COALESCE(description, '')), 'B')) STORED",
+    "CREATE INDEX api_post_search_document_idx ON api_post USING GIN (search_document)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS api_post_search_document_idx",
+    "ALTER TABLE api_post DROP COLUMN IF EXISTS search_document",
+]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+}
+
+
+def run(direction):
+    def apply(apps, schema_editor):
+        statements = STATEMENTS.get(schema_editor.connection.vendor)
+        if statements is None:
+            return
+        for sql in statements[direction]:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_author_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(0), run(1)),
+    ]
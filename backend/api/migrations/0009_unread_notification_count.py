@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-17 17:20
+
+from django.db import migrations, models
+
+
+def backfill_unread(apps, schema_editor):
+    Notification = apps.get_model('api', 'Notification')
+    AuthorStats = apps.get_model('api', 'AuthorStats')
+
+    unread = Notification.objects.filter(read=False).order_by().values('user_id').annotate(n=models.Count('id'))
+    for row in unread:
+        AuthorStats.objects.update_or_create(user_id=row['user_id'], defaults={'unread_notifications': row['n']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='unread_notifications',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.5 on 2026-10-17 17:24
+
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    ImageJob = apps.get_model('api', 'ImageJob')
+    for label in ('api.Profile', 'api.Category', 'api.Post'):
+        model = apps.get_model(label)
+        ids = model.objects.exclude(image='').exclude(image=None).values_list('id', flat=True)
+        ImageJob.objects.bulk_create((ImageJob(model=label, object_id=pk) for pk in ids), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_unread_notification_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('date', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model', 'object_id'), name='unique_image_job')],
+            },
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+    ]
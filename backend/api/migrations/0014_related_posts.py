@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-17 17:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_post_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedPostJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_id', models.PositiveBigIntegerField(unique=True)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RelatedPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('similar', 'Related'), ('author', 'More from this author')], max_length=10)),
+                ('position', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_entries', to='api.post')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.post')),
+            ],
+            options={
+                'ordering': ['kind', 'position'],
+                'constraints': [models.UniqueConstraint(fields=('post', 'kind', 'position'), name='unique_related_post_position')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+from html import unescape
+
+from django.db import migrations
+from django.utils.html import strip_tags
+
+# Hit markers the search snippets use; they must not appear in indexed text.
+HIT_MARKERS = str.maketrans('', '', '\ue000\ue001')
+
+
+def reindex(apps, schema_editor):
+    # The FTS table used to hold descriptions as HTML; it now holds their text.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('api', 'Post')
+    rows = Post.objects.using(schema_editor.connection.alias).values_list('id', 'title', 'description')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DELETE FROM api_post_fts")
+        cursor.executemany(
+            "INSERT INTO api_post_fts (rowid, title, description) VALUES (%s, %s, %s)",
+            [
+                (id, title or '', unescape(strip_tags(description or '')).translate(HIT_MARKERS))
+                for id, title, description in rows.iterator(chunk_size=1000)
+            ],
+        )
+        cursor.execute("INSERT INTO api_post_fts (api_post_fts) VALUES ('optimize')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex, migrations.RunPython.noop),
+    ]
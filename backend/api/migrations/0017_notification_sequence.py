@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-17 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_search_index_plain_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='sequence',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['sequence', 'id'], name='notification_sequence_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-17 18:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_notification_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(allow_unicode=True, unique=True),
+        ),
+    ]
@@ -1,10 +1,13 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
 from django.utils.text import slugify
 from shortuuid.django_fields import ShortUUIDField
 import shortuuid
 
+from api import author_stats, images, media, related, response_cache, search, tags
+from api.counters import adjust_category_post_count
+
 class CustomUser(AbstractUser):
     username = models.CharField(unique=True, max_length=255)
     email = models.EmailField(unique=True)
@@ -28,6 +31,7 @@ class CustomUser(AbstractUser):
 class Profile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE)
     image = models.ImageField(upload_to='profiles/', default='profiles/default.jpg', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     full_name = models.CharField(max_length=255, null=True, blank=True)
     bio = models.CharField(max_length=255, null=True, blank=True)
     about = models.CharField(max_length=255, null=True, blank=True)
@@ -69,7 +73,9 @@ post_save.connect(save_user_profile, sender=CustomUser)
 class Category(models.Model):
     title = models.CharField(max_length=255)
     image = models.FileField(upload_to="image", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     slug = models.SlugField(unique=True, null=True, blank=True)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
@@ -82,8 +88,49 @@ class Category(models.Model):
             self.slug = slugify(self.title)
         super(Category, self).save(*args, **kwargs)
 
-    def post_count(self):
-        return Post.objects.filter(category=self).count()
+class Tag(models.Model):
+    """A post tag; ``post_count`` is maintained by api.tags."""
+    name = models.CharField(max_length=50)
+    slug = models.SlugField(max_length=50, unique=True, allow_unicode=True)
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+        indexes = [
+            models.Index(fields=['-post_count', 'name'], name='tag_cloud_idx'),
+        ]
+
+class PostQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related('user', 'profile', 'category')
+
+    def with_like_state(self, user=None):
+        """
+        Annotate whether an authenticated ``user`` liked the post (``liked``)
+        instead of loading the likes M2M.
+        """
+        if user is None or not user.is_authenticated:
+            return self
+        liked = Post.likes.through.objects.filter(post_id=models.OuterRef('pk'), customuser_id=user.id)
+        return self.annotate(liked=models.Exists(liked))
+
+    def with_tags(self):
+        return self.prefetch_related('tags')
+
+    def with_related_posts(self):
+        """Prefetch the precomputed related and same-author posts into ``related_posts``, in one query."""
+        entries = RelatedPost.objects.filter(related__status='Active').select_related('related__category')
+        return self.prefetch_related(models.Prefetch('related_entries', queryset=entries, to_attr='related_posts'))
+
+    def with_viewer_state(self, user_id):
+        """Annotate whether user ``user_id`` liked and bookmarked each post."""
+        liked = Post.likes.through.objects.filter(post_id=models.OuterRef('pk'), customuser_id=user_id)
+        bookmarked = Bookmark.objects.filter(post_id=models.OuterRef('pk'), user_id=user_id)
+        return self.annotate(liked=models.Exists(liked), bookmarked=models.Exists(bookmarked))
+
 
 class Post(models.Model):
 
@@ -100,23 +147,91 @@ class Post(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
     image = models.FileField(upload_to="image", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     status = models.CharField(choices=STATUS, max_length=255, default='Active')
     views = models.IntegerField(default=0)
     likes = models.ManyToManyField(CustomUser, blank=True, related_name="likes_user")
+    tags = models.ManyToManyField(Tag, through='PostTag', blank=True, related_name='posts')
     slug = models.SlugField(unique=True, null=True, blank=True)
     date = models.DateTimeField(auto_now_add=True)
 
+    # Maintained by the like, comment and bookmark endpoints; rebuilt by
+    # `manage.py recount_counters`.
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    bookmark_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
     def __str__(self):
         return self.title
     
     class Meta:
         ordering = ['-date']
         verbose_name_plural = 'Posts'
+        indexes = [
+            models.Index(fields=['-date', '-id'], condition=models.Q(status='Active'), name='post_active_date_idx'),
+            models.Index(fields=['category', 'status', '-date', '-id'], name='post_category_status_date_idx'),
+            models.Index(fields=['user', '-date', '-id'], name='post_user_date_idx'),
+        ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'category_id' in field_names:
+            instance._loaded_category_id = instance.category_id
+        return instance
+
     def save(self, *args, **kwatgs):
         if self.slug == "" or self.slug == None:
             self.slug = slugify(self.title) + "-" + shortuuid.uuid()[:2]
-        super(Post, self).save(*args, **kwatgs)
+
+        created = self._state.adding
+        previous_category_id = None if created else getattr(self, '_loaded_category_id', self.category_id)
+        with transaction.atomic():
+            super(Post, self).save(*args, **kwatgs)
+            if created:
+                author_stats.record_activity(self.user_id, posts=1)
+            if previous_category_id != self.category_id:
+                adjust_category_post_count(previous_category_id, -1)
+                adjust_category_post_count(self.category_id, 1)
+        self._loaded_category_id = self.category_id
+
+
+def decrement_category_post_count(sender, instance, **kwargs):
+    adjust_category_post_count(instance.category_id, -1)
+
+def remove_post_from_author_stats(sender, instance, **kwargs):
+    author_stats.discount_totals(
+        instance.user_id,
+        posts=-1,
+        views=-instance.views,
+        likes=-instance.like_count,
+        bookmarks=-instance.bookmark_count,
+    )
+
+post_delete.connect(decrement_category_post_count, sender=Post)
+post_delete.connect(remove_post_from_author_stats, sender=Post)
+post_save.connect(search.index_post, sender=Post)
+post_delete.connect(search.remove_post, sender=Post)
+post_save.connect(related.enqueue, sender=Post)
+pre_delete.connect(related.enqueue_listing, sender=Post)
+pre_delete.connect(tags.release_post_tags, sender=Post)
+
+class PostTag(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='post_tags')
+
+    def __str__(self):
+        return f"{self.post} #{self.tag}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'tag'], name='unique_post_tag'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', 'post'], name='post_tag_tag_idx'),
+        ]
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
@@ -132,6 +247,9 @@ class Comment(models.Model):
     class Meta:
         ordering = ['-date']
         verbose_name_plural = 'Comments'
+        indexes = [
+            models.Index(fields=['post', '-date', '-id'], name='comment_post_date_idx'),
+        ]
 
 
 class Bookmark(models.Model):
@@ -145,6 +263,9 @@ class Bookmark(models.Model):
     class Meta:
         ordering = ['-date']
         verbose_name_plural = 'Bookmark'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_bookmark_user_post'),
+        ]
 
 class Notification(models.Model):
     NOTI_TYPE = (
@@ -156,8 +277,12 @@ class Notification(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     type = models.CharField(choices=NOTI_TYPE, max_length=255)
+    # Number of events collapsed into this row ("3 people liked your post").
+    count = models.PositiveIntegerField(default=1)
     read = models.BooleanField(default=False)
     date = models.DateTimeField(auto_now_add=True)
+    # Stream position of the latest change, see notification_stream.next_sequence.
+    sequence = models.BigIntegerField(default=0)
 
     def __str__(self):
         if self.post:
@@ -166,4 +291,173 @@ class Notification(models.Model):
     class Meta:
         ordering = ['-date']
         verbose_name_plural = 'Notification'
-    
\ No newline at end of file
+        indexes = [
+            models.Index(fields=['user', 'read', '-date', '-id'], name='notification_user_read_idx'),
+            models.Index(fields=['sequence', 'id'], name='notification_sequence_idx'),
+        ]
+
+
+class NotificationSequence(models.Model):
+    """Single-row counter handing out notification stream positions."""
+    value = models.BigIntegerField(default=0)
+    
+
+class NotificationEvent(models.Model):
+    """
+    Outbox of notification events, written by the interaction endpoints and
+    turned into Notification rows by `manage.py process_notifications`.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    type = models.CharField(choices=Notification.NOTI_TYPE, max_length=255)
+    date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.post_id} - {self.type}"
+
+    class Meta:
+        ordering = ['id']
+
+class ImageJob(models.Model):
+    """Queue of images waiting for `manage.py process_images` to build their variants."""
+    model = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.model} {self.object_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'object_id'], name='unique_image_job'),
+        ]
+
+class UploadSession(models.Model):
+    """A resumable, chunked file upload in progress; see api.uploads."""
+    upload_id = ShortUUIDField(unique=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    @property
+    def complete(self):
+        return self.received >= self.size
+
+class MediaBlob(models.Model):
+    """How many rows point at a content-addressed media file; see api.media."""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+class PostRanking(models.Model):
+    """A post's place in the ranked feed, rewritten by api.feed.rank_posts."""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='ranking')
+    rank = models.PositiveIntegerField(unique=True)
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.rank}. {self.post}"
+
+    class Meta:
+        ordering = ['rank']
+
+class RelatedPost(models.Model):
+    """One of a post's precomputed neighbours on the detail page; see api.related."""
+    SIMILAR = 'similar'
+    AUTHOR = 'author'
+    KINDS = (
+        (SIMILAR, 'Related'),
+        (AUTHOR, 'More from this author'),
+    )
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='related_entries')
+    related = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(choices=KINDS, max_length=10)
+    position = models.PositiveSmallIntegerField()
+    score = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.post} -> {self.related}"
+
+    class Meta:
+        ordering = ['kind', 'position']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'kind', 'position'], name='unique_related_post_position'),
+        ]
+
+class RelatedPostJob(models.Model):
+    """Queue of posts whose neighbours `manage.py build_related` must refresh."""
+    post_id = models.PositiveBigIntegerField(unique=True)
+    date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Post {self.post_id}"
+
+class AuthorStats(models.Model):
+    """Running totals for an author's dashboard, maintained by api.author_stats."""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    views = models.IntegerField(default=0)
+    posts = models.IntegerField(default=0)
+    likes = models.IntegerField(default=0)
+    bookmarks = models.IntegerField(default=0)
+    unread_notifications = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} - Stats"
+
+    class Meta:
+        verbose_name_plural = 'Author Stats'
+
+class AuthorDailyStats(models.Model):
+    """Per-day activity on an author's posts, for dashboard trends."""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    day = models.DateField()
+    views = models.IntegerField(default=0)
+    posts = models.IntegerField(default=0)
+    likes = models.IntegerField(default=0)
+    bookmarks = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} - {self.day}"
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name_plural = 'Author Daily Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='unique_author_daily_stats'),
+        ]
+
+
+post_save.connect(response_cache.invalidate_model, sender=Post)
+post_delete.connect(response_cache.invalidate_model, sender=Post)
+post_save.connect(response_cache.invalidate_model, sender=Category)
+post_delete.connect(response_cache.invalidate_model, sender=Category)
+post_save.connect(response_cache.invalidate_model, sender=Comment)
+post_delete.connect(response_cache.invalidate_model, sender=Comment)
+post_save.connect(response_cache.invalidate_model, sender=Tag)
+post_delete.connect(response_cache.invalidate_model, sender=Tag)
+
+
+def discount_deleted_notification(sender, instance, **kwargs):
+    if not instance.read:
+        author_stats.discount_totals(instance.user_id, unread_notifications=-1)
+
+post_delete.connect(discount_deleted_notification, sender=Notification)
+
+post_save.connect(images.enqueue_variants, sender=Profile)
+post_save.connect(images.enqueue_variants, sender=Category)
+post_save.connect(images.enqueue_variants, sender=Post)
+
+for model in (Profile, Category, Post):
+    post_init.connect(media.remember_files, sender=model)
+    post_save.connect(media.track_files, sender=model)
+    post_delete.connect(media.release_files, sender=model)
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils.module_loading import import_string
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BROKER': 'api.notification_stream.DatabaseBroker',
+    # Seconds between comment lines that keep idle connections open.
+    'HEARTBEAT': 15,
+    # Milliseconds the browser waits before reconnecting.
+    'RETRY': 3000,
+    # Seconds between DatabaseBroker polls.
+    'POLL_INTERVAL': 1,
+    # Most notifications replayed to a reconnecting client.
+    'REPLAY_LIMIT': 100,
+    'QUEUE_SIZE': 100,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'NOTIFICATION_STREAM', {}).get(name, DEFAULTS[name])
+
+
+def next_sequence():
+    """
+    The stream position for the notifications written by the current
+    transaction. The counter row stays locked until that transaction ends,
+    so writers commit in position order and a poller that has seen a
+    position never meets a smaller one later. Call it as the last write.
+    """
+    from api.models import NotificationSequence
+
+    counter = NotificationSequence.objects.filter(id=1)
+    if not counter.update(value=F('value') + 1):
+        NotificationSequence.objects.get_or_create(id=1)
+        counter.update(value=F('value') + 1)
+    return counter.values_list('value', flat=True).get()
+
+
+def event_id(notification):
+    """Stream position of a notification: its sequence (renewed on every collapse) and id."""
+    return f"{notification.sequence}-{notification.id}"
+
+
+def after(last_event_id):
+    """Filter for notifications created or updated after ``last_event_id``, or None if malformed."""
+    try:
+        sequence, id = (int(part) for part in last_event_id.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return Q(sequence__gt=sequence) | Q(sequence=sequence, id__gt=id)
+
+
+def format_event(notification):
+    from api.serializer import NotificationStreamSerializer
+
+    data = json.dumps(NotificationStreamSerializer(notification).data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event_id(notification)}\nevent: notification\ndata: {data}\n\n"
+
+
+class LocalBroker:
+    """
+    In-process pub/sub: each connected stream owns a bounded asyncio queue,
+    and ``notify`` fans notifications out to the queues of their recipients.
+    Only sees notifications processed in this process, e.g. by a worker
+    thread started next to the ASGI app.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=get_setting('QUEUE_SIZE'))
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def subscribed_users(self):
+        with self._lock:
+            return list(self._subscribers)
+
+    def publish(self, user_id, message):
+        """Hand ``message`` to every stream of ``user_id``; safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._offer, queue, message)
+
+    def _offer(self, queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A stalled client; it catches up from Last-Event-ID on reconnect.
+            logger.warning("Dropping a notification for a slow stream")
+
+    def notify(self, notification_ids):
+        """Publish the given notifications, after they were created or updated."""
+        from api.models import Notification
+
+        users = self.subscribed_users()
+        if not users:
+            return
+        notifications = Notification.objects.filter(id__in=notification_ids, user_id__in=users).select_related('post')
+        for notification in notifications.order_by('sequence', 'id'):
+            self.publish(notification.user_id, (event_id(notification), format_event(notification)))
+
+
+class DatabaseBroker(LocalBroker):
+    """
+    Notifications are written by the `process_notifications` worker in
+    another process, so this broker polls for them instead: one query per
+    ``POLL_INTERVAL`` covering every author connected to this process,
+    rather than one list query per dashboard per poll.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._poller = None
+        self._position = None
+
+    def subscribe(self, user_id):
+        queue = super().subscribe(user_id)
+        loop = asyncio.get_running_loop()
+        if self._poller is None or self._poller.done() or self._poller.get_loop() is not loop:
+            self._poller = loop.create_task(self._poll())
+        return queue
+
+    def notify(self, notification_ids):
+        # The poller picks these up from the table.
+        pass
+
+    async def _poll(self):
+        from api.models import Notification
+
+        if self._position is None:
+            latest = await Notification.objects.order_by('-sequence', '-id').afirst()
+            self._position = event_id(latest) if latest else '0-0'
+        while self.subscribed_users():
+            await asyncio.sleep(get_setting('POLL_INTERVAL'))
+            try:
+                rows = Notification.objects.filter(after(self._position), user_id__in=self.subscribed_users())
+                async for notification in rows.select_related('post').order_by('sequence', 'id'):
+                    self._position = event_id(notification)
+                    self.publish(notification.user_id, (self._position, format_event(notification)))
+            except Exception:
+                logger.exception("Notification stream poll failed")
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(get_setting('BROKER'))()
+        return _broker
+
+
+def reset_broker():
+    """Forget the broker so the next ``get_broker()`` builds one from current settings."""
+    global _broker
+    with _broker_lock:
+        _broker = None
+
+
+async def replay(user_id, last_event_id):
+    """Unread notifications a reconnecting client missed, oldest first."""
+    from api.models import Notification
+
+    missed = after(last_event_id)
+    if missed is None:
+        return []
+    rows = Notification.objects.filter(missed, user_id=user_id, read=False).select_related('post')
+    return [
+        (event_id(notification), format_event(notification))
+        async for notification in rows.order_by('sequence', 'id')[:get_setting('REPLAY_LIMIT')]
+    ]
+
+
+async def stream(user_id, last_event_id=None):
+    """
+    The ``text/event-stream`` body for one author: missed notifications
+    first when resuming, then live ones as the broker delivers them, with
+    a heartbeat comment whenever the connection has been idle.
+    """
+    broker = get_broker()
+    # Subscribe before replaying so nothing slips in between; anything
+    # already replayed is skipped below.
+    queue = broker.subscribe(user_id)
+    try:
+        yield f"retry: {get_setting('RETRY')}\n\n"
+        sent = set()
+        if last_event_id:
+            for id, message in await replay(user_id, last_event_id):
+                sent.add(id)
+                yield message
+        while True:
+            try:
+                id, message = await asyncio.wait_for(queue.get(), timeout=get_setting('HEARTBEAT'))
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if id not in sent:
+                yield message
+    finally:
+        broker.unsubscribe(user_id, queue)
@@ -0,0 +1,132 @@
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from api import author_stats, notification_stream
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 500,
+    'POLL_INTERVAL': 2,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'NOTIFICATIONS', {}).get(name, DEFAULTS[name])
+
+
+def enqueue(user_id, post_id, type):
+    """Record that ``user_id`` should hear about a ``type`` event on a post."""
+    from api.models import NotificationEvent
+
+    NotificationEvent.objects.create(user_id=user_id, post_id=post_id, type=type)
+
+
+def enqueue_many(events):
+    """Queue several ``(user_id, post_id, type)`` events with one INSERT."""
+    from api.models import NotificationEvent
+
+    NotificationEvent.objects.bulk_create(
+        NotificationEvent(user_id=user_id, post_id=post_id, type=type) for user_id, post_id, type in events
+    )
+
+
+def process_pending(batch_size=None):
+    """
+    Turn up to ``batch_size`` queued events into notifications. Events for
+    the same recipient, post and type collapse into one row: an existing
+    unread notification has its ``count`` raised, otherwise a new row is
+    bulk-inserted. Returns the number of events processed.
+    """
+    from api.models import Notification, NotificationEvent
+
+    batch_size = batch_size or get_setting('BATCH_SIZE')
+    with transaction.atomic():
+        events = NotificationEvent.objects.order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            events = events.select_for_update(skip_locked=True)
+        events = list(events.values('id', 'user_id', 'post_id', 'type')[:batch_size])
+        if not events:
+            return 0
+
+        counts = Counter((event['user_id'], event['post_id'], event['type']) for event in events)
+
+        lookup = Q()
+        for user_id, post_id, type in counts:
+            lookup |= Q(user_id=user_id, post_id=post_id, type=type)
+        existing = {
+            (row['user_id'], row['post_id'], row['type']): row['latest_id']
+            for row in Notification.objects.filter(lookup, read=False).order_by().values('user_id', 'post_id', 'type').annotate(latest_id=Max('id'))
+        }
+
+        new = []
+        updated = []
+        unread = Counter()
+        now = timezone.now()
+        for key, count in counts.items():
+            if key in existing:
+                Notification.objects.filter(id=existing[key]).update(count=F('count') + count, date=now)
+                updated.append(existing[key])
+            else:
+                user_id, post_id, type = key
+                new.append(Notification(user_id=user_id, post_id=post_id, type=type, count=count))
+                unread[user_id] += 1
+        Notification.objects.bulk_create(new)
+        changed = updated + [notification.id for notification in new]
+        transaction.on_commit(lambda: notification_stream.get_broker().notify(changed))
+        for user_id, added in unread.items():
+            author_stats.adjust_totals(user_id, unread_notifications=added)
+
+        NotificationEvent.objects.filter(id__in=[event['id'] for event in events]).delete()
+        Notification.objects.filter(id__in=changed).update(sequence=notification_stream.next_sequence())
+    return len(events)
+
+
+def mark_read(user_id, ids=None, before=None):
+    """
+    Mark a user's unread notifications as read in one UPDATE: all of them,
+    only ``ids``, and/or only those dated at or before ``before``. Returns
+    how many changed.
+    """
+    from api.models import Notification
+
+    notifications = Notification.objects.filter(user_id=user_id, read=False)
+    if ids is not None:
+        notifications = notifications.filter(id__in=ids)
+    if before is not None:
+        notifications = notifications.filter(date__lte=before)
+
+    with transaction.atomic():
+        marked = notifications.update(read=True)
+        author_stats.adjust_totals(user_id, unread_notifications=-marked)
+    return marked
+
+
+def unread_count(user_id):
+    from api.models import AuthorStats
+
+    return AuthorStats.objects.filter(user_id=user_id).values_list('unread_notifications', flat=True).first() or 0
+
+
+def run_worker(interval=None, once=False):
+    """Process the outbox until it is empty, then poll every ``interval`` seconds."""
+    interval = interval if interval is not None else get_setting('POLL_INTERVAL')
+    total = 0
+    while True:
+        try:
+            processed = process_pending()
+        except Exception:
+            logger.exception("Notification batch failed")
+            processed = 0
+        total += processed
+        if processed:
+            continue
+        if once:
+            return total
+        time.sleep(interval)
@@ -0,0 +1,114 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+DEFAULTS = {
+    'PAGE_SIZE': 10,
+    'MAX_PAGE_SIZE': 100,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'API_PAGINATION', {}).get(name, DEFAULTS[name])
+
+
+class DateCursorPagination(CursorPagination):
+    """
+    Keyset pagination on ``(-date, -id)``. Each page is a range scan from the
+    cursor position, so its cost does not depend on how deep into the table
+    it is. Clients may ask for ``?page_size=`` up to ``MAX_PAGE_SIZE``.
+    """
+    ordering = ('-date', '-id')
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        self.page_size = get_setting('PAGE_SIZE')
+        self.max_page_size = get_setting('MAX_PAGE_SIZE')
+        return super().get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, offset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self._set_page(list(queryset[offset:offset + self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, fetching the page with the async ORM."""
+        queryset, offset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self._set_page([row async for row in queryset[offset:offset + self.page_size + 1]])
+
+    def get_paginated_data(self, data):
+        return {'next': self.get_next_link(), 'previous': self.get_previous_link(), 'results': data}
+
+    # CursorPagination.paginate_queryset, split around the one line that
+    # runs the query so the sync and async paths share everything else.
+
+    def _page_queryset(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None, 0
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            order = self.ordering[0]
+            is_reversed = order.startswith('-')
+            order_attr = order.lstrip('-')
+            if self.cursor.reverse != is_reversed:
+                queryset = queryset.filter(**{order_attr + '__lt': current_position})
+            else:
+                queryset = queryset.filter(**{order_attr + '__gt': current_position})
+        return queryset, offset
+
+    def _set_page(self, results):
+        offset, reverse, current_position = self.cursor or (0, False, None)
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class RankCursorPagination(DateCursorPagination):
+    """
+    Keyset pagination on a unique ``feed_rank`` annotation (see api.feed);
+    the rank alone is a stable position, so no tie-breaker is needed.
+    """
+    ordering = ('feed_rank',)
@@ -0,0 +1,312 @@
+"""
+Precomputed "related posts" and "more from this author" for the post
+detail page, stored in ``RelatedPost`` as the top ``COUNT`` neighbours of
+every active post.
+
+Similarity is the cosine of TF-IDF vectors over title and description,
+plus the cosine of the posts' tag sets and a bonus for sharing the
+category, computed with sparse matrix products a block of posts at a time.
+``rebuild`` recomputes every post; ``process_pending`` handles posts queued
+by the Post signals and ``tags.set_tags``: their own lists, lists that
+showed them, and lists they now outrank.
+"""
+import logging
+import re
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import strip_tags
+from scipy import sparse
+
+from api import response_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Neighbours kept per post, for each kind.
+    'COUNT': 5,
+    'TEXT_WEIGHT': 1.0,
+    'TAG_WEIGHT': 0.5,
+    'CATEGORY_WEIGHT': 0.3,
+    # Posts scoring below this are never shown as related.
+    'MIN_SCORE': 0.05,
+    # Bytes of the dense score matrix computed per block of posts; picking
+    # the best neighbours needs about as much again.
+    'BLOCK_MEMORY': 32 * 1024 * 1024,
+    'BATCH_SIZE': 500,
+    'POLL_INTERVAL': 10,
+}
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its of on or that the this to was were will with you your"
+    .split()
+)
+
+
+def get_setting(name):
+    return getattr(settings, 'RELATED_POSTS', {}).get(name, DEFAULTS[name])
+
+
+def tokenize(text):
+    return [word for word in re.findall(r'\w+', text.lower()) if len(word) > 1 and word not in STOP_WORDS]
+
+
+class Corpus:
+    """The active posts as a row-normalized TF-IDF matrix plus the columns scoring needs."""
+
+    def __init__(self):
+        from api.models import Post, PostTag
+
+        rows = list(
+            Post.objects.filter(status='Active')
+            .order_by('date', 'id')
+            .values_list('id', 'user_id', 'category_id', 'title', 'description')
+        )
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.users = np.array([row[1] for row in rows], dtype=np.int64)
+        self.categories = np.array([row[2] if row[2] is not None else -1 for row in rows], dtype=np.int64)
+        self.index = {id: position for position, id in enumerate(self.ids.tolist())}
+        # Rows are oldest first, so this breaks ties in favour of newer posts.
+        self.recency = np.arange(len(rows), dtype=np.float64) * 1e-9
+        vectors = self._vectorize([(row[3] or '') + ' ' + (row[3] or '') + ' ' + strip_tags(row[4] or '') for row in rows])
+
+        pairs = [
+            (self.index[post_id], tag_id)
+            for post_id, tag_id in PostTag.objects.filter(post__status='Active').values_list('post_id', 'tag_id')
+        ]
+        tags = self._normalize(self._incidence(pairs, len(rows)))
+        # Scaling each part by the root of its weight makes one product
+        # yield the weighted sum of the text and tag cosines.
+        self.features = sparse.csr_matrix(sparse.hstack([
+            vectors * np.sqrt(get_setting('TEXT_WEIGHT')),
+            tags * np.sqrt(get_setting('TAG_WEIGHT')),
+        ]))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _vectorize(self, documents):
+        vocabulary = {}
+        indices, indptr = [], [0]
+        for document in documents:
+            for word in tokenize(document):
+                indices.append(vocabulary.setdefault(word, len(vocabulary)))
+            indptr.append(len(indices))
+        counts = sparse.csr_matrix(
+            (np.ones(len(indices)), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(documents), len(vocabulary)),
+        )
+        counts.sum_duplicates()
+
+        document_frequency = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+        counts.data = 1 + np.log(counts.data)
+        weights = self._normalize(counts @ sparse.diags(idf))
+        # A word found in one post adds nothing to any pair's similarity but
+        # still counts towards the norm; dropping it keeps the products sparse.
+        return weights[:, np.flatnonzero(document_frequency > 1)]
+
+    def _incidence(self, pairs, rows):
+        """A 0/1 matrix with a row per post and a column per distinct value in ``pairs``."""
+        columns = {}
+        indices = [columns.setdefault(value, len(columns)) for _, value in pairs]
+        return sparse.csr_matrix(
+            (np.ones(len(pairs)), ([row for row, _ in pairs], indices)),
+            shape=(rows, len(columns)),
+        )
+
+    def _normalize(self, matrix):
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+
+    def block_size(self):
+        """Posts to score at a time so a block's scores fit in ``BLOCK_MEMORY``."""
+        return max(1, get_setting('BLOCK_MEMORY') // (8 * max(len(self), 1)))
+
+    def scores(self, positions):
+        """Similarity of the posts at ``positions`` to every post, one row each."""
+        positions = np.asarray(positions)
+        # The only dense block × posts float array; the rest updates it in place.
+        result = (self.features[positions] @ self.features.T).toarray()
+        categories = self.categories[positions][:, None]
+        same_category = (categories == self.categories[None, :]) & (categories >= 0)
+        np.add(result, get_setting('CATEGORY_WEIGHT'), out=result, where=same_category)
+        result += self.recency
+        result[np.arange(len(positions)), positions] = -np.inf
+        return result
+
+    def top(self, positions):
+        """``{post_id: [(related_id, score), ...]}`` for the posts at ``positions``, best first."""
+        count = min(get_setting('COUNT'), len(self) - 1)
+        min_score = get_setting('MIN_SCORE')
+        result = {}
+        block_size = self.block_size()
+        for start in range(0, len(positions), block_size):
+            block = positions[start:start + block_size]
+            if count <= 0:
+                result.update({int(self.ids[position]): [] for position in block})
+                continue
+            scores = self.scores(block)
+            best = np.argpartition(scores, -count, axis=1)[:, -count:]
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            order = np.argsort(-best_scores, axis=1)
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            for position, columns, values in zip(block, self.ids[best].tolist(), best_scores.tolist()):
+                result[int(self.ids[position])] = [
+                    (id, value) for id, value in zip(columns, values) if value >= min_score
+                ]
+        return result
+
+
+def _author_lists(corpus, user_ids):
+    """The ``COUNT`` newest other posts of each post's author, for the authors given."""
+    result = {}
+    for user_id in user_ids:
+        posts = corpus.ids[corpus.users == user_id][::-1].tolist()
+        for post_id in posts:
+            others = [other for other in posts if other != post_id][:get_setting('COUNT')]
+            result[post_id] = [(other, 0.0) for other in others]
+    return result
+
+
+def _store(kind, lists):
+    from api.models import RelatedPost
+
+    RelatedPost.objects.filter(post_id__in=list(lists), kind=kind).delete()
+    RelatedPost.objects.bulk_create(
+        RelatedPost(post_id=post_id, related_id=related_id, kind=kind, position=position, score=score)
+        for post_id, neighbours in lists.items()
+        for position, (related_id, score) in enumerate(neighbours)
+    )
+
+
+def rebuild():
+    """Recompute the lists of every post; returns how many posts have them."""
+    from api.models import RelatedPost, RelatedPostJob
+
+    # Jobs queued from here on may describe changes the corpus misses.
+    last_job = RelatedPostJob.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    corpus = Corpus()
+    similar = corpus.top(np.arange(len(corpus)))
+    by_author = _author_lists(corpus, set(corpus.users.tolist()))
+    with transaction.atomic():
+        RelatedPostJob.objects.filter(id__lte=last_job).delete()
+        RelatedPost.objects.all().delete()
+        _store(RelatedPost.SIMILAR, similar)
+        _store(RelatedPost.AUTHOR, by_author)
+    response_cache.invalidate('posts')
+    return len(corpus)
+
+
+def affected(corpus, post_ids):
+    """
+    Positions of the posts whose similar list may change when ``post_ids``
+    change, and the authors whose "more from" lists do.
+    """
+    from api.models import Post, RelatedPost
+
+    changed = [corpus.index[id] for id in post_ids if id in corpus.index]
+    result = set(changed)
+    # Lists that show a changed post: its score moved, or it must go.
+    listing = RelatedPost.objects.filter(kind=RelatedPost.SIMILAR, related_id__in=post_ids).values_list('post_id', flat=True)
+    result.update(corpus.index[id] for id in listing if id in corpus.index)
+
+    if changed:
+        # Lists a changed post now makes it into: it beats their weakest entry.
+        count = get_setting('COUNT')
+        weakest = np.full(len(corpus), -np.inf)
+        full = (
+            RelatedPost.objects.filter(kind=RelatedPost.SIMILAR, position=count - 1)
+            .values_list('post_id', 'score')
+        )
+        for post_id, score in full:
+            if post_id in corpus.index:
+                weakest[corpus.index[post_id]] = score
+        incoming = np.full(len(corpus), -np.inf)
+        block_size = corpus.block_size()
+        for start in range(0, len(changed), block_size):
+            incoming = np.maximum(incoming, corpus.scores(changed[start:start + block_size]).max(axis=0))
+        result.update(np.flatnonzero((incoming > weakest) & (incoming >= get_setting('MIN_SCORE'))).tolist())
+
+    authors = set(Post.objects.filter(id__in=post_ids).values_list('user_id', flat=True))
+    return sorted(result), authors
+
+
+def refresh(post_ids, job_ids=()):
+    """
+    Bring the lists up to date after ``post_ids`` were created, edited or
+    deleted, and remove the jobs ``job_ids`` that asked for it.
+    """
+    from api.models import RelatedPost, RelatedPostJob
+
+    corpus = Corpus()
+    positions, authors = affected(corpus, post_ids)
+    similar = corpus.top(np.array(positions, dtype=np.int64))
+    by_author = _author_lists(corpus, authors)
+    with transaction.atomic():
+        # Deleted with the results, so a failed refresh leaves them queued.
+        RelatedPostJob.objects.filter(id__in=job_ids).delete()
+        # Posts no longer active keep no lists.
+        RelatedPost.objects.filter(post_id__in=post_ids).exclude(post_id__in=corpus.index.keys()).delete()
+        _store(RelatedPost.SIMILAR, similar)
+        _store(RelatedPost.AUTHOR, by_author)
+    response_cache.invalidate('posts')
+    return len(positions)
+
+
+def _queue(post_ids):
+    """
+    Queue ``post_ids``, replacing their existing jobs: a job read by a
+    refresh that is still running is deleted when it finishes, and the
+    replacement makes the change it missed wait for the next one.
+    """
+    from api.models import RelatedPostJob
+
+    with transaction.atomic():
+        RelatedPostJob.objects.filter(post_id__in=post_ids).delete()
+        RelatedPostJob.objects.bulk_create([RelatedPostJob(post_id=id) for id in post_ids], ignore_conflicts=True)
+
+
+def enqueue(sender, instance, **kwargs):
+    """post_save receiver: queue the post for `manage.py build_related`."""
+    _queue([instance.pk])
+
+
+def enqueue_listing(sender, instance, **kwargs):
+    """pre_delete receiver: lists showing the post lose it, so queue their owners."""
+    from api.models import RelatedPost
+
+    owners = RelatedPost.objects.filter(related=instance).values_list('post_id', flat=True).distinct()
+    _queue(list(owners))
+
+
+def process_pending(batch_size=None):
+    """Refresh the lists around up to ``batch_size`` queued posts; returns how many."""
+    from api.models import RelatedPostJob
+
+    jobs = list(RelatedPostJob.objects.order_by('id')[:batch_size or get_setting('BATCH_SIZE')])
+    if not jobs:
+        return 0
+    refresh([job.post_id for job in jobs], [job.id for job in jobs])
+    return len(jobs)
+
+
+def run_worker(interval=None, once=False):
+    interval = interval if interval is not None else get_setting('POLL_INTERVAL')
+    total = 0
+    while True:
+        try:
+            processed = process_pending()
+        except Exception:
+            logger.exception("Related posts batch failed")
+            processed = 0
+        total += processed
+        if processed:
+            continue
+        if once:
+            return total
+        time.sleep(interval)
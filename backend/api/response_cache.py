@@ -0,0 +1,214 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+    'KEY_PREFIX': 'api-response',
+}
+
+# Which cached endpoints go stale when a model changes.
+MODEL_TAGS = {
+    'Post': ('posts', 'categories'),
+    'Category': ('categories', 'posts'),
+    'Comment': ('posts',),
+    'Tag': ('tags', 'posts'),
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'RESPONSE_CACHE', {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_setting('ALIAS')]
+
+
+def _key(*parts):
+    return ':'.join([get_setting('KEY_PREFIX'), *parts])
+
+
+def generations(tags):
+    """
+    Return ``{tag: generation}``. A generation is the time its tag was last
+    invalidated; entries are keyed by it, so invalidating a tag orphans them.
+    """
+    cache = get_cache()
+    keys = {_key('gen', tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    result = {keys[key]: value for key, value in found.items()}
+    for key, tag in keys.items():
+        if tag not in result:
+            now = time.time()
+            cache.add(key, now, timeout=None)
+            result[tag] = cache.get(key, now)
+    return result
+
+
+async def agenerations(tags):
+    cache = get_cache()
+    keys = {_key('gen', tag): tag for tag in tags}
+    found = await cache.aget_many(keys)
+    result = {keys[key]: value for key, value in found.items()}
+    for key, tag in keys.items():
+        if tag not in result:
+            now = time.time()
+            await cache.aadd(key, now, timeout=None)
+            result[tag] = await cache.aget(key, now)
+    return result
+
+
+def invalidate(*tags):
+    cache = get_cache()
+    now = time.time()
+    cache.set_many({_key('gen', tag): now for tag in tags}, timeout=None)
+
+
+def invalidate_model(sender, **kwargs):
+    invalidate(*MODEL_TAGS[sender.__name__])
+
+
+def _count(name):
+    cache = get_cache()
+    key = _key('stats', name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+async def _acount(name):
+    cache = get_cache()
+    key = _key('stats', name)
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=None):
+            await cache.aincr(key)
+
+
+def stats():
+    cache = get_cache()
+    found = cache.get_many([_key('stats', 'hits'), _key('stats', 'misses')])
+    hits = found.get(_key('stats', 'hits'), 0)
+    misses = found.get(_key('stats', 'misses'), 0)
+    return {'hits': hits, 'misses': misses, 'hit_ratio': hits / (hits + misses) if hits + misses else 0.0}
+
+
+class CachedResponseMixin:
+    """
+    Caches the serialized body of anonymous GET responses, keyed by URL
+    (path, query string and page cursor) and the generations of
+    ``cache_tags``. Saving or deleting a model bumps the generation of its
+    tags, so stale entries are simply never looked up again. Responses carry
+    an ETag and Last-Modified and answer conditional requests with 304.
+    """
+    cache_tags = ()
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+
+        gens = generations(self.cache_tags)
+        key = _body_key(request, gens)
+
+        cache = get_cache()
+        entry = cache.get(key)
+        if entry is None:
+            _count('misses')
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = _entry(response.data)
+            cache.set(key, entry, get_setting('TIMEOUT'))
+        else:
+            _count('hits')
+            self.cache_hit(request, entry['data'])
+            response = Response(entry['data'])
+
+        if not_modified(request, entry):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        return _with_validators(response, entry)
+
+    def cache_hit(self, request, data):
+        """Hook for side effects the view must still perform on a cache hit."""
+
+
+def _body_key(request, gens):
+    fingerprint = json.dumps([request.build_absolute_uri(), sorted(gens.items())])
+    return _key('body', hashlib.sha256(fingerprint.encode()).hexdigest())
+
+
+def _entry(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    return {
+        'data': data,
+        'etag': quote_etag(hashlib.md5(body.encode()).hexdigest()),
+        # The render time, not the generation: an entry re-rendered after
+        # its timeout under the same generation may carry newer counters.
+        'last_modified': int(time.time()),
+    }
+
+
+def _with_validators(response, entry):
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+def not_modified(request, entry):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return entry['etag'] in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return if_modified_since is not None and entry['last_modified'] <= if_modified_since
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    """A plain Django response rendered like DRF's JSONRenderer, for async views."""
+    return JsonResponse(
+        data,
+        status=status,
+        encoder=JSONEncoder,
+        safe=False,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+async def acached_response(request, tags, render, cache_hit=None):
+    """
+    ``CachedResponseMixin.get`` for async views. ``render()`` is awaited on
+    a miss and returns ``(status, data)``; ``cache_hit(data)`` is awaited on
+    a hit. Only anonymous requests should be passed in.
+    """
+    gens = await agenerations(tags)
+    key = _body_key(request, gens)
+
+    cache = get_cache()
+    entry = await cache.aget(key)
+    if entry is None:
+        await _acount('misses')
+        code, data = await render()
+        if code != status.HTTP_200_OK:
+            return json_response(data, status=code)
+        entry = _entry(data)
+        await cache.aset(key, entry, get_setting('TIMEOUT'))
+    else:
+        await _acount('hits')
+        if cache_hit is not None:
+            await cache_hit(entry['data'])
+
+    if not_modified(request, entry):
+        return _with_validators(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), entry)
+    return _with_validators(json_response(entry['data']), entry)
@@ -0,0 +1,167 @@
+import re
+from html import unescape
+
+from django.db import connection
+from django.utils.html import escape, strip_tags
+
+MARK_START = '<mark>'
+MARK_END = '</mark>'
+# Private-use characters the databases wrap hits in. Snippets are escaped
+# as plain text first, then these become MARK_START and MARK_END.
+HIT_START = '\ue000'
+HIT_END = '\ue001'
+
+
+def plain_text(html):
+    """The text of a CKEditor description, without markup or our hit markers."""
+    text = unescape(strip_tags(html or ''))
+    return text.replace(HIT_START, '').replace(HIT_END, '')
+
+
+def highlight(snippet):
+    """HTML for a plain-text snippet: escaped, with hits wrapped in <mark>."""
+    return escape(snippet).replace(HIT_START, MARK_START).replace(HIT_END, MARK_END)
+
+
+class SearchHit:
+    def __init__(self, post_id, rank, snippet):
+        self.post_id = post_id
+        self.rank = rank
+        self.snippet = snippet
+
+
+class SQLiteSearchBackend:
+    """
+    FTS5 table ``api_post_fts`` whose rowid is the post id and which holds
+    the descriptions as plain text. Kept current by
+    ``index_post``/``remove_post`` from the Post signals.
+    """
+    table = 'api_post_fts'
+    batch_size = 1000
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [post.id])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, description) VALUES (%s, %s, %s)",
+                [post.id, post.title or '', plain_text(post.description)],
+            )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [post_id])
+
+    def rebuild(self):
+        with connection.cursor() as cursor, connection.cursor() as posts:
+            cursor.execute(f"DELETE FROM {self.table}")
+            posts.execute("SELECT id, title, description FROM api_post")
+            while rows := posts.fetchmany(self.batch_size):
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (rowid, title, description) VALUES (%s, %s, %s)",
+                    [(id, title or '', plain_text(description)) for id, title, description in rows],
+                )
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+            cursor.execute(f"SELECT count(*) FROM {self.table}")
+            return cursor.fetchone()[0]
+
+    def match_expression(self, query):
+        # Quote every word so user input can't inject FTS5 syntax; the last
+        # word is a prefix so results follow the user as they type.
+        words = re.findall(r'\w+', query)
+        if not words:
+            return None
+        terms = ['"%s"' % word for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, query, filters, limit, offset):
+        match = self.match_expression(query)
+        if match is None:
+            return []
+
+        where, params = _filter_sql(filters)
+        sql = (
+            f"SELECT {self.table}.rowid, bm25({self.table}, 10.0, 1.0) AS rank, "
+            f"snippet({self.table}, 1, %s, %s, '…', 24) "
+            f"FROM {self.table} JOIN api_post ON api_post.id = {self.table}.rowid "
+            f"WHERE {self.table} MATCH %s{where} "
+            f"ORDER BY rank LIMIT %s OFFSET %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [HIT_START, HIT_END, match, *params, limit, offset])
+            # bm25() is lower-is-better; flip it so every backend ranks high-is-better.
+            return [SearchHit(row[0], -row[1], highlight(row[2])) for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend:
+    """
+    Stored generated ``tsvector`` column ``api_post.search_document`` with a
+    GIN index. Postgres recomputes it on every write, so there is nothing to
+    do on save or delete.
+    """
+
+    def index_post(self, post):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("REINDEX INDEX api_post_search_document_idx")
+            cursor.execute("SELECT count(*) FROM api_post")
+            return cursor.fetchone()[0]
+
+    def search(self, query, filters, limit, offset):
+        if not query.strip():
+            return []
+
+        where, params = _filter_sql(filters)
+        headline_options = f"StartSel={HIT_START}, StopSel={HIT_END}, MaxWords=35, MinWords=15"
+        sql = (
+            "WITH hits AS ("
+            "  SELECT api_post.id, api_post.description, ts_rank_cd(search_document, q) AS rank, q "
+            "  FROM api_post, websearch_to_tsquery('english', %s) q "
+            f"  WHERE search_document @@ q{where} "
+            "  ORDER BY rank DESC LIMIT %s OFFSET %s"
+            ") "
+            "SELECT id, rank, ts_headline('english', "
+            "  translate(regexp_replace(COALESCE(description, ''), '<[^>]*>', ' ', 'g'), %s, ''), q, %s"
+            ") FROM hits ORDER BY rank DESC"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [query, *params, limit, offset, HIT_START + HIT_END, headline_options])
+            # Tags are stripped in SQL; entities are decoded here before escaping.
+            return [SearchHit(id, rank, highlight(unescape(snippet))) for id, rank, snippet in cursor.fetchall()]
+
+
+def _filter_sql(filters):
+    where, params = [], []
+    for column, value in filters.items():
+        where.append(f"api_post.{column} = %s")
+        params.append(value)
+    return ''.join(f" AND {clause}" for clause in where), params
+
+
+BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    """The search backend for the default database, or None if it has none."""
+    backend = BACKENDS.get(connection.vendor)
+    return backend() if backend else None
+
+
+def index_post(sender, instance, **kwargs):
+    backend = get_backend()
+    if backend:
+        backend.index_post(instance)
+
+
+def remove_post(sender, instance, **kwargs):
+    backend = get_backend()
+    if backend:
+        backend.remove_post(instance.id)
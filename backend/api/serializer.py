@@ -1,9 +1,29 @@
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework import serializers
+from django.core.files.storage import default_storage
 
 from api import models as api_models
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Absolute URLs of the resized copies of an instance's image, e.g.
+    ``{'card': {'webp': url, 'fallback': url, 'width': 480, 'height': 320}}``.
+    Empty until `manage.py process_images` has handled the upload.
+    """
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        result = {}
+        for name, variant in variants.items():
+            if name == 'source':
+                continue
+            result[name] = dict(variant)
+            for format in ('webp', 'fallback'):
+                url = default_storage.url(variant[format])
+                result[name][format] = request.build_absolute_uri(url) if request else url
+        return result
+
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
@@ -53,12 +73,11 @@ class ProfileSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 class CategorySerializer(serializers.ModelSerializer):
-    def get_post_count(self, category):
-        return category.post_set.count()
-    
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = api_models.Category
-        fields = ['id', 'title', 'slug', 'image', 'post_count']
+        fields = ['id', 'title', 'slug', 'image', 'image_variants', 'post_count']
 
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
@@ -86,6 +105,91 @@ class PostSerializer(serializers.ModelSerializer):
         else:
             self.Meta.depth = 1
 
+class PostAuthorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = api_models.CustomUser
+        fields = ['id', 'username', 'full_name']
+
+class PostProfileSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = api_models.Profile
+        fields = ['id', 'full_name', 'image', 'image_variants', 'bio', 'slug']
+
+class PostCategorySerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = api_models.Category
+        fields = ['id', 'title', 'slug', 'image', 'image_variants']
+
+class TagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = api_models.Tag
+        fields = ['id', 'name', 'slug', 'post_count']
+
+class PostListSerializer(serializers.ModelSerializer):
+    """
+    Read-only post card. Expects a queryset from
+    ``Post.objects.with_related().with_like_state(user)`` so that a page of
+    posts costs a fixed number of queries; counts come from the
+    denormalized counter columns.
+    """
+    user = PostAuthorSerializer(read_only=True)
+    profile = PostProfileSerializer(read_only=True)
+    category = PostCategorySerializer(read_only=True)
+    image_variants = ImageVariantsField()
+    liked = serializers.SerializerMethodField()
+
+    class Meta:
+        model = api_models.Post
+        fields = ['id', 'user', 'profile', 'category', 'title', 'image', 'image_variants', 'status', 'views', 'like_count', 'comment_count', 'bookmark_count', 'liked', 'slug', 'date']
+
+    def get_liked(self, post):
+        return getattr(post, 'liked', False)
+
+class RelatedPostSerializer(serializers.ModelSerializer):
+    category = PostCategorySerializer(read_only=True)
+    image_variants = ImageVariantsField()
+
+    class Meta:
+        model = api_models.Post
+        fields = ['id', 'title', 'slug', 'image', 'image_variants', 'category', 'date']
+
+class PostDetailSerializer(PostListSerializer):
+    """
+    Adds the tags and the precomputed ``related`` and ``more_from_author``
+    posts; expects ``Post.objects.with_tags().with_related_posts()`` to
+    have loaded them.
+    """
+    tags = TagSerializer(many=True, read_only=True)
+    related = serializers.SerializerMethodField()
+    more_from_author = serializers.SerializerMethodField()
+
+    class Meta(PostListSerializer.Meta):
+        fields = PostListSerializer.Meta.fields + ['description', 'tags', 'related', 'more_from_author']
+
+    def get_related(self, post):
+        return self.related_posts(post, api_models.RelatedPost.SIMILAR)
+
+    def get_more_from_author(self, post):
+        return self.related_posts(post, api_models.RelatedPost.AUTHOR)
+
+    def related_posts(self, post, kind):
+        entries = getattr(post, 'related_posts', None)
+        if entries is None:
+            entries = post.related_entries.filter(related__status='Active').select_related('related__category')
+        posts = [entry.related for entry in entries if entry.kind == kind]
+        return RelatedPostSerializer(posts, many=True, context=self.context).data
+
+class PostSearchSerializer(PostListSerializer):
+    rank = serializers.FloatField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta(PostListSerializer.Meta):
+        fields = PostListSerializer.Meta.fields + ['rank', 'snippet']
+
 class BookmarkSerializer(serializers.ModelSerializer):
     class Meta:
         model = api_models.Bookmark
@@ -112,6 +216,43 @@ class NotificationSerializer(serializers.ModelSerializer):
         else:
             self.Meta.depth = 1
 
+class NotificationPostSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = api_models.Post
+        fields = ['id', 'title', 'slug']
+
+class DashboardCommentSerializer(serializers.ModelSerializer):
+    """A comment in the author dashboard; expects ``select_related('post')``."""
+    post = NotificationPostSerializer(read_only=True)
+
+    class Meta:
+        model = api_models.Comment
+        fields = ['id', 'post', 'name', 'email', 'comment', 'reply', 'date']
+
+class DashboardNotificationSerializer(serializers.ModelSerializer):
+    """A notification in the author dashboard; expects ``select_related('user', 'post')``."""
+    user = PostAuthorSerializer(read_only=True)
+    post = NotificationPostSerializer(read_only=True)
+
+    class Meta:
+        model = api_models.Notification
+        fields = ['id', 'user', 'post', 'type', 'count', 'read', 'date']
+
+class MarkNotificationsSeenSerializer(serializers.Serializer):
+    """Request body of the mark-seen endpoint."""
+    user_id = serializers.IntegerField()
+    noti_id = serializers.IntegerField(required=False)
+    noti_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+    before = serializers.DateTimeField(required=False)
+
+class NotificationStreamSerializer(serializers.ModelSerializer):
+    """Payload of a notification pushed over the event stream."""
+    post = NotificationPostSerializer(read_only=True)
+
+    class Meta:
+        model = api_models.Notification
+        fields = ['id', 'type', 'count', 'read', 'date', 'post']
+
 class AuthorSerializer(serializers.ModelSerializer):
     views = serializers.IntegerField(default=0)
     post = serializers.IntegerField(default=0)
@@ -0,0 +1,90 @@
+"""
+Post tags. Authors send free text ("django, Performance, #sql" or a list),
+which ``set_tags`` normalizes into ``Tag`` rows keyed by a unique slug,
+creating any missing ones in bulk, and links through ``PostTag``.
+``Tag.post_count`` counts the posts using each tag, whatever their status,
+the way ``Category.post_count`` does.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.text import slugify
+
+from api import related, response_cache
+
+DEFAULTS = {
+    'MAX_PER_POST': 10,
+    # Tags returned by the tag cloud endpoint.
+    'CLOUD_SIZE': 50,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'TAGS', {}).get(name, DEFAULTS[name])
+
+
+def parse(value):
+    """``{slug: name}`` for a comma-separated string or a list of names, in order, without duplicates."""
+    if value is None:
+        return {}
+    if isinstance(value, str):
+        value = value.split(',')
+    names = {}
+    for name in value:
+        name = re.sub(r'\s+', ' ', str(name)).strip().lstrip('#').strip()[:50]
+        # Keep letters outside ASCII, or a name like "日本語" has no slug at all.
+        slug = slugify(name, allow_unicode=True)[:50]
+        if slug and slug not in names:
+            names[slug] = name
+    return dict(list(names.items())[:get_setting('MAX_PER_POST')])
+
+
+def get_or_create(names):
+    """The tags for ``{slug: name}``, creating the missing ones with one INSERT."""
+    from api.models import Tag
+
+    existing = {tag.slug: tag for tag in Tag.objects.filter(slug__in=names)}
+    missing = [Tag(slug=slug, name=name) for slug, name in names.items() if slug not in existing]
+    if missing:
+        # Another request may create the same tag concurrently; the slug is unique.
+        Tag.objects.bulk_create(missing, ignore_conflicts=True)
+        existing.update({tag.slug: tag for tag in Tag.objects.filter(slug__in=[tag.slug for tag in missing])})
+    return [existing[slug] for slug in names]
+
+
+def adjust_counts(tag_ids, delta):
+    from api.models import Tag
+
+    if tag_ids:
+        Tag.objects.filter(id__in=tag_ids).update(post_count=F('post_count') + delta)
+
+
+def set_tags(post, value):
+    """Replace the tags of a saved ``post`` with those in ``value``; returns them."""
+    from api.models import PostTag
+
+    with transaction.atomic():
+        tags = get_or_create(parse(value))
+        wanted = {tag.id for tag in tags}
+        current = set(PostTag.objects.filter(post=post).values_list('tag_id', flat=True))
+        added, removed = wanted - current, current - wanted
+        if not added and not removed:
+            return tags
+
+        PostTag.objects.filter(post=post, tag_id__in=removed).delete()
+        PostTag.objects.bulk_create([PostTag(post=post, tag_id=tag_id) for tag_id in added], ignore_conflicts=True)
+        adjust_counts(added, 1)
+        adjust_counts(removed, -1)
+    response_cache.invalidate('posts', 'tags')
+    related.enqueue(post.__class__, post)
+    return tags
+
+
+def release_post_tags(sender, instance, **kwargs):
+    """pre_delete receiver: the post's PostTag rows are about to be cascaded away."""
+    from api.models import PostTag
+
+    adjust_counts(list(PostTag.objects.filter(post=instance).values_list('tag_id', flat=True)), -1)
+    response_cache.invalidate('tags')
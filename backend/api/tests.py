@@ -1,3 +1,1578 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import FileSystemStorage
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, router
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api import models as api_models
+from api import benchmark, db_router, feed, images, instrumentation, interactions, media, notification_stream, notifications, related, response_cache, tags, uploads
+from api.async_views import NotificationStreamView
+from api.backends.sqlite3.base import DatabaseWrapper as TunedDatabaseWrapper
+from api.counters import adjust_post_counters, recount_counters, recount_post_counters
+from api.notifications import process_pending
+from api.view_counter import ViewCounter, apply_counts, drain_spool, spool_counts
+from backend import database
+
+
+def create_post(user=None, **kwargs):
+    if user is None:
+        user = api_models.CustomUser.objects.create(email=f"author{api_models.CustomUser.objects.count()}@example.com")
+    # Distinct titles: slugs of equal titles differ only by a 2-character suffix.
+    kwargs.setdefault('title', f"Post {api_models.Post.objects.count()}")
+    return api_models.Post.objects.create(user=user, profile=user.profile, **kwargs)
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 60, 'MAX_PENDING': 100, 'SPOOL_DIR': None})
+class ViewCounterTests(TestCase):
+    def setUp(self):
+        self.counter = ViewCounter()
+        self.post = create_post()
+
+    def tearDown(self):
+        self.counter._stopped.set()
+
+    def test_increments_are_buffered_until_flush(self):
+        for _ in range(5):
+            self.counter.increment(self.post.id)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+        self.assertEqual(self.counter.pending(), {self.post.id: 5})
+
+        self.assertEqual(self.counter.flush(), 5)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 5)
+        self.assertEqual(self.counter.pending(), {})
+
+    def test_spooled_counts_are_drained(self):
+        with tempfile.TemporaryDirectory() as spool_dir:
+            with self.settings(VIEW_COUNTER={'SPOOL_DIR': spool_dir}):
+                self.assertTrue(spool_counts({self.post.id: 3}))
+                self.assertEqual(drain_spool(), 3)
+                self.assertEqual(drain_spool(), 0)
+
+    def test_concurrent_drains_apply_each_batch_once(self):
+        drained = []
+
+        def apply_and_drain_again(counts):
+            # A second drain, e.g. the management command, runs meanwhile.
+            if not drained:
+                drained.append(None)
+                drained.append(drain_spool())
+            apply_counts(counts)
+
+        with tempfile.TemporaryDirectory() as spool_dir:
+            with self.settings(VIEW_COUNTER={'SPOOL_DIR': spool_dir}):
+                spool_counts({self.post.id: 3})
+                spool_counts({self.post.id: 4})
+                with mock.patch('api.view_counter.apply_counts', side_effect=apply_and_drain_again):
+                    total = drain_spool()
+                self.assertEqual(total + drained[1], 7)
+                self.assertEqual(os.listdir(spool_dir), [])
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 7)
+
+    def test_failed_drain_keeps_the_batch(self):
+        with tempfile.TemporaryDirectory() as spool_dir:
+            with self.settings(VIEW_COUNTER={'SPOOL_DIR': spool_dir}):
+                spool_counts({self.post.id: 3})
+                with mock.patch('api.view_counter.apply_counts', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+                    drain_spool()
+                self.assertEqual(drain_spool(), 3)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 3)
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0})
+class PostDetailViewCountTests(TestCase):
+    def test_detail_does_not_rewrite_the_post_row(self):
+        post = create_post(description="body")
+        api_models.Post.objects.filter(id=post.id).update(description="edited elsewhere")
+
+        self.client.get(f"/api/v1/post/detail/{post.slug}/")
+
+        post.refresh_from_db()
+        self.assertEqual(post.views, 1)
+        self.assertEqual(post.description, "edited elsewhere")
+
+
+class QueryCountTestMixin:
+    """
+    Asserts that an endpoint costs the same number of queries whatever the
+    number of rows it returns.
+    """
+
+    def assertConstantQueries(self, url, seed, sizes=(1, 10)):
+        counts = []
+        for size in sizes:
+            seed(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, f"Query count grew with page size for {url}: {counts}")
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0})
+class PostListQueryCountTests(QueryCountTestMixin, TestCase):
+    def setUp(self):
+        self.author = api_models.CustomUser.objects.create(email="author@example.com")
+        self.category = api_models.Category.objects.create(title="News")
+        self.readers = [api_models.CustomUser.objects.create(email=f"reader{i}@example.com") for i in range(3)]
+
+    def seed(self, size):
+        while api_models.Post.objects.count() < size:
+            post = create_post(self.author, category=self.category)
+            post.likes.add(*self.readers)
+            adjust_post_counters(post.id, like_count=len(self.readers))
+
+    def test_post_list(self):
+        self.assertConstantQueries("/api/v1/post/list/", self.seed)
+
+    def test_category_posts(self):
+        self.assertConstantQueries(f"/api/v1/post/category/posts/{self.category.slug}/", self.seed)
+
+    def test_list_reports_like_count_instead_of_likers(self):
+        self.seed(1)
+        response = self.client.get("/api/v1/post/list/")
+        post = response.json()['results'][0]
+        self.assertEqual(post['like_count'], 3)
+        self.assertFalse(post['liked'])
+        self.assertNotIn('likes', post)
+        self.assertEqual(post['category']['slug'], self.category.slug)
+
+    def test_like_state_for_viewer(self):
+        self.seed(1)
+        post = api_models.Post.objects.with_like_state(self.readers[0]).get()
+        self.assertTrue(post.liked)
+        post = api_models.Post.objects.with_like_state(self.author).get()
+        self.assertFalse(post.liked)
+
+
+class DashboardListQueryCountTests(QueryCountTestMixin, TestCase):
+    def setUp(self):
+        self.author = api_models.CustomUser.objects.create(email="author@example.com", password="secret-hash")
+        self.readers = [api_models.CustomUser.objects.create(email=f"reader{i}@example.com") for i in range(3)]
+
+    def seed(self, size):
+        while api_models.Post.objects.count() < size:
+            post = create_post(self.author)
+            post.likes.add(*self.readers)
+            tags.set_tags(post, "python, web")
+            api_models.Comment.objects.create(post=post, name="Reader", email="reader@example.com", comment="Nice")
+            api_models.Notification.objects.create(user=self.author, post=post, type='Like')
+
+    def test_comment_list(self):
+        self.assertConstantQueries(f"/api/v1/author/dashboard/comment-list/{self.author.id}/", self.seed)
+
+    def test_notification_list(self):
+        self.assertConstantQueries(f"/api/v1/author/dashboard/notification-list/{self.author.id}/", self.seed)
+
+    def test_lists_expose_only_named_fields(self):
+        self.seed(1)
+        comment = self.client.get(f"/api/v1/author/dashboard/comment-list/{self.author.id}/").json()['results'][0]
+        notification = self.client.get(f"/api/v1/author/dashboard/notification-list/{self.author.id}/").json()['results'][0]
+
+        self.assertEqual(set(comment['post']), {'id', 'title', 'slug'})
+        self.assertEqual(set(notification['post']), {'id', 'title', 'slug'})
+        self.assertEqual(set(notification['user']), {'id', 'username', 'full_name'})
+        self.assertNotIn("secret-hash", json.dumps(notification))
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.author = api_models.CustomUser.objects.create(email="author@example.com")
+        self.posts = [create_post(self.author, title=f"Post {i}") for i in range(5)]
+
+    def test_pages_walk_every_post_once(self):
+        seen = []
+        url = "/api/v1/post/list/?page_size=2"
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 2)
+            seen += [post['id'] for post in data['results']]
+            url = data['next']
+
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    def test_cursor_is_stable_across_inserts(self):
+        first = self.client.get("/api/v1/post/list/?page_size=2").json()
+        create_post(self.author, title="Newer")
+        second = self.client.get(first['next']).json()
+
+        self.assertEqual([post['id'] for post in second['results']], [self.posts[2].id, self.posts[1].id])
+
+    @override_settings(API_PAGINATION={'PAGE_SIZE': 2, 'MAX_PAGE_SIZE': 3})
+    def test_page_size_is_capped(self):
+        self.assertEqual(len(self.client.get("/api/v1/post/list/").json()['results']), 2)
+        self.assertEqual(len(self.client.get("/api/v1/post/list/?page_size=50").json()['results']), 3)
+
+
+@skipUnless(connection.vendor == 'sqlite', "Query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+class ListQueryPlanTests(TestCase):
+    """
+    Fails when a list endpoint has to scan a whole api table instead of
+    walking an index.
+    """
+
+    def setUp(self):
+        self.author = api_models.CustomUser.objects.create(email="author@example.com")
+        self.category = api_models.Category.objects.create(title="News")
+        post = create_post(self.author, category=self.category)
+        api_models.Comment.objects.create(post=post, name="Reader", email="reader@example.com", comment="Hi")
+        api_models.Notification.objects.create(user=self.author, post=post, type='Comment')
+
+    def assertNoFullScans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    self.assertNotRegex(detail, r'^SCAN api_\w+$', f"{url} scans a table:\n{query['sql']}")
+
+    def test_list_endpoints_use_indexes(self):
+        for url in [
+            "/api/v1/post/list/",
+            f"/api/v1/post/category/posts/{self.category.slug}/",
+            f"/api/v1/author/dashboard/post-list/{self.author.id}/",
+            f"/api/v1/author/dashboard/comment-list/{self.author.id}/",
+            f"/api/v1/author/dashboard/notification-list/{self.author.id}/",
+        ]:
+            with self.subTest(url=url):
+                self.assertNoFullScans(url)
+
+
+class BookmarkConstraintTests(TestCase):
+    def test_bookmark_is_unique_per_user_and_post(self):
+        post = create_post()
+        api_models.Bookmark.objects.create(user=post.user, post=post)
+        with self.assertRaises(IntegrityError):
+            api_models.Bookmark.objects.create(user=post.user, post=post)
+
+
+class DenormalizedCounterTests(TestCase):
+    def setUp(self):
+        self.category = api_models.Category.objects.create(title="News")
+        self.post = create_post(category=self.category)
+        self.reader = api_models.CustomUser.objects.create(email="reader@example.com")
+
+    def test_interaction_endpoints_maintain_post_counters(self):
+        payload = {'user_id': self.reader.id, 'post_id': self.post.id}
+        self.client.post("/api/v1/post/like/", payload)
+        self.client.post("/api/v1/post/bookmark/", payload)
+        self.client.post("/api/v1/post/comment/", {'post_id': self.post.id, 'name': "R", 'email': "r@example.com", 'comment': "Hi"})
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.bookmark_count, self.post.comment_count), (1, 1, 1))
+
+        self.client.post("/api/v1/post/like/", payload)
+        self.client.post("/api/v1/post/bookmark/", payload)
+
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.bookmark_count), (0, 0))
+
+    def test_category_post_count_follows_posts(self):
+        other = api_models.Category.objects.create(title="Sport")
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.post_count, 1)
+
+        post = api_models.Post.objects.get(id=self.post.id)
+        post.category = other
+        post.save()
+        self.category.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.category.post_count, other.post_count), (0, 1))
+
+        post.delete()
+        other.refresh_from_db()
+        self.assertEqual(other.post_count, 0)
+
+    def test_recount_repairs_drift(self):
+        self.post.likes.add(self.reader)
+        api_models.Bookmark.objects.create(user=self.reader, post=self.post)
+        api_models.Category.objects.filter(id=self.category.id).update(post_count=7)
+
+        call_command('recount_counters', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.category.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.bookmark_count, self.post.comment_count), (1, 1, 0))
+        self.assertEqual(self.category.post_count, 1)
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0})
+class AuthorStatsTests(TestCase):
+    def setUp(self):
+        self.author = api_models.CustomUser.objects.create(email="author@example.com")
+        self.reader = api_models.CustomUser.objects.create(email="reader@example.com")
+        self.post = create_post(self.author)
+
+    def stats(self, query=""):
+        return self.client.get(f"/api/v1/author/dashboard/stats/{self.author.id}/{query}").json()
+
+    def test_events_roll_up_incrementally(self):
+        payload = {'user_id': self.reader.id, 'post_id': self.post.id}
+        self.client.post("/api/v1/post/like/", payload)
+        self.client.post("/api/v1/post/bookmark/", payload)
+        self.client.get(f"/api/v1/post/detail/{self.post.slug}/")
+        self.client.get(f"/api/v1/post/detail/{self.post.slug}/")
+
+        with self.assertNumQueries(1):
+            data = self.stats()
+        self.assertEqual(data, {'views': 2, 'posts': 1, 'likes': 1, 'bookmarks': 1})
+
+        daily = self.stats("?days=7")['daily']
+        self.assertEqual(len(daily), 1)
+        self.assertEqual((daily[0]['views'], daily[0]['likes']), (2, 1))
+
+        self.client.post("/api/v1/post/like/", payload)
+        self.assertEqual(self.stats()['likes'], 0)
+
+    def test_deleting_a_post_removes_it_from_totals(self):
+        apply_counts({self.post.id: 5})
+        self.assertEqual(self.stats()['views'], 5)
+        api_models.Post.objects.get(id=self.post.id).delete()
+
+        self.assertEqual(self.stats(), {'views': 0, 'posts': 0, 'likes': 0, 'bookmarks': 0})
+
+    def test_days_is_validated(self):
+        self.assertEqual(self.client.get(f"/api/v1/author/dashboard/stats/{self.author.id}/?days=abc").status_code, 400)
+        self.assertEqual(len(self.stats("?days=-5")['daily']), 1)
+        self.assertEqual(self.stats("?days=100000")['views'], 0)
+
+    def test_rebuild_matches_source_tables(self):
+        api_models.AuthorStats.objects.all().delete()
+        api_models.Bookmark.objects.create(user=self.reader, post=self.post)
+        recount_counters()
+
+        call_command('rebuild_author_stats', stdout=StringIO())
+
+        self.assertEqual(self.stats(), {'views': 0, 'posts': 1, 'likes': 0, 'bookmarks': 1})
+        self.assertEqual(api_models.AuthorDailyStats.objects.get(user=self.author).bookmarks, 1)
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0})
+class AuthorDeletionTests(TransactionTestCase):
+    # Foreign keys are checked at commit, which TestCase never reaches.
+
+    def test_deleting_an_author_with_activity(self):
+        author = api_models.CustomUser.objects.create(email="leaving@example.com")
+        reader = api_models.CustomUser.objects.create(email="staying@example.com")
+        post = create_post(author)
+        interactions.set_like(reader.id, post.id, author.id, True)
+        interactions.set_bookmark(reader.id, post.id, author.id, True)
+        read_post = create_post(reader)
+        interactions.set_like(author.id, read_post.id, reader.id, True)
+        process_pending()
+        self.assertEqual(api_models.AuthorStats.objects.get(user=author).unread_notifications, 2)
+
+        author.delete()
+
+        self.assertFalse(api_models.AuthorStats.objects.filter(user_id=author.id).exists())
+        self.assertEqual(api_models.AuthorStats.objects.get(user=reader).posts, 1)
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0})
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.post = create_post(title="Cached")
+
+    def test_repeat_requests_are_served_from_cache(self):
+        self.client.get("/api/v1/post/list/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/v1/post/list/")
+        self.assertEqual(response.json()['results'][0]['title'], "Cached")
+        self.assertEqual(response_cache.stats()['hits'], 1)
+        self.assertEqual(response_cache.stats()['misses'], 1)
+
+    def test_saving_a_post_invalidates_lists(self):
+        self.client.get("/api/v1/post/list/")
+        self.post.title = "Renamed"
+        self.post.save()
+
+        response = self.client.get("/api/v1/post/list/")
+        self.assertEqual(response.json()['results'][0]['title'], "Renamed")
+
+    def test_comment_invalidates_detail(self):
+        self.client.get(f"/api/v1/post/detail/{self.post.slug}/")
+        self.client.post("/api/v1/post/comment/", {'post_id': self.post.id, 'name': "R", 'email': "r@example.com", 'comment': "Hi"})
+
+        response = self.client.get(f"/api/v1/post/detail/{self.post.slug}/")
+        self.assertEqual(response.json()['comment_count'], 1)
+
+    def test_cache_hits_still_count_views(self):
+        for _ in range(3):
+            self.client.get(f"/api/v1/post/detail/{self.post.slug}/")
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 3)
+
+    def test_conditional_requests(self):
+        response = self.client.get("/api/v1/post/list/")
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        self.assertEqual(self.client.get("/api/v1/post/list/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get("/api/v1/post/list/", HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.post.title = "Renamed"
+        self.post.save()
+        self.assertEqual(self.client.get("/api/v1/post/list/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_body_rendered_again_after_timeout_is_newer(self):
+        with mock.patch('api.response_cache.time.time', return_value=1_000_000):
+            last_modified = self.client.get("/api/v1/post/list/")['Last-Modified']
+
+        # The entry expires while no save bumps the generation, and a counter moves.
+        api_models.Post.objects.filter(id=self.post.id).update(views=50)
+        gens = response_cache.generations(('posts',))
+        response_cache.get_cache().delete(response_cache._body_key(RequestFactory().get("/api/v1/post/list/"), gens))
+        with mock.patch('api.response_cache.time.time', return_value=1_000_120):
+            response = self.client.get("/api/v1/post/list/", HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['views'], 50)
+
+
+@skipUnless(connection.vendor == 'sqlite', "Exercises the SQLite FTS5 backend")
+class PostSearchTests(TestCase):
+    def setUp(self):
+        self.author = api_models.CustomUser.objects.create(email="author@example.com")
+        self.travel = api_models.Category.objects.create(title="Travel")
+        self.food = api_models.Category.objects.create(title="Food")
+        self.guide = create_post(self.author, title="Travelling to Japan", description="A guide to trains and temples.", category=self.travel)
+        self.ramen = create_post(self.author, title="Ramen", description="Where to eat in Japan on a budget.", category=self.food)
+        self.draft = create_post(self.author, title="Japan draft", status='Draft', category=self.travel)
+
+    def search(self, query):
+        return self.client.get(f"/api/v1/post/search/{query}").json()['results']
+
+    def test_title_matches_rank_first(self):
+        results = self.search("?q=japan")
+        self.assertEqual([post['id'] for post in results], [self.guide.id, self.ramen.id])
+        self.assertIn("<mark>Japan</mark>", results[1]['snippet'])
+
+    def test_filters_and_prefix_match(self):
+        results = self.search(f"?q=jap&category={self.food.slug}")
+        self.assertEqual([post['id'] for post in results], [self.ramen.id])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.ramen.title = "Noodles"
+        self.ramen.description = "Soba in Kyoto."
+        self.ramen.save()
+        self.assertEqual([post['id'] for post in self.search("?q=japan")], [self.guide.id])
+
+        self.guide.delete()
+        self.assertEqual(self.search("?q=japan"), [])
+        self.assertEqual([post['id'] for post in self.search("?q=kyoto")], [self.ramen.id])
+
+    def test_syntax_in_queries_is_ignored(self):
+        self.assertEqual(len(self.search('?q="japan*(')), 2)
+
+    @override_settings(API_PAGINATION={'PAGE_SIZE': 1, 'MAX_PAGE_SIZE': 1})
+    def test_limit_and_offset_are_validated(self):
+        for limit in ('-1', '0', '5'):
+            data = self.client.get(f"/api/v1/post/search/?q=japan&limit={limit}").json()
+            self.assertEqual((len(data['results']), data['next']), (1, 1))
+        self.assertEqual(self.client.get("/api/v1/post/search/?q=japan&limit=abc").status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/post/search/?q=japan&offset=abc").status_code, 400)
+
+    def test_snippets_are_escaped_text(self):
+        create_post(self.author, title="Markup", description='<p>Tokyo &amp; <b>Osaka</b> <script>alert("x")</script> a&lt;b</p>')
+        snippet = self.search("?q=osaka")[0]['snippet']
+        self.assertEqual(snippet, 'Tokyo &amp; <mark>Osaka</mark> alert(&quot;x&quot;) a&lt;b')
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM api_post_fts")
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search("?q=japan")), 2)
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.post = create_post()
+        self.readers = [api_models.CustomUser.objects.create(email=f"reader{i}@example.com") for i in range(3)]
+
+    def like(self, reader):
+        self.client.post("/api/v1/post/like/", {'user_id': reader.id, 'post_id': self.post.id})
+
+    def test_endpoints_only_enqueue(self):
+        self.like(self.readers[0])
+        self.assertEqual(api_models.Notification.objects.count(), 0)
+        self.assertEqual(api_models.NotificationEvent.objects.count(), 1)
+
+    def test_repeated_events_collapse_into_one_row(self):
+        for reader in self.readers:
+            self.like(reader)
+        self.client.post("/api/v1/post/comment/", {'post_id': self.post.id, 'name': "R", 'email': "r@example.com", 'comment': "Hi"})
+
+        self.assertEqual(process_pending(), 4)
+
+        like = api_models.Notification.objects.get(type='Like')
+        self.assertEqual((like.user, like.count), (self.post.user, 3))
+        self.assertEqual(api_models.Notification.objects.get(type='Comment').count, 1)
+        self.assertFalse(api_models.NotificationEvent.objects.exists())
+
+    def test_events_fold_into_unread_rows_only(self):
+        self.like(self.readers[0])
+        process_pending()
+        self.like(self.readers[1])
+        process_pending()
+        self.assertEqual(api_models.Notification.objects.get().count, 2)
+
+        api_models.Notification.objects.update(read=True)
+        self.like(self.readers[2])
+        call_command('process_notifications', '--once', stdout=StringIO())
+        self.assertEqual(api_models.Notification.objects.filter(read=False).get().count, 1)
+
+
+class NotificationReadStateTests(TestCase):
+    def setUp(self):
+        self.author = api_models.CustomUser.objects.create(email="author@example.com")
+        self.posts = [create_post(self.author, title=f"Post {i}") for i in range(3)]
+        for post in self.posts:
+            notifications.enqueue(self.author.id, post.id, 'Like')
+        process_pending()
+        self.notifications = list(api_models.Notification.objects.order_by('id'))
+
+    def mark(self, **data):
+        return self.client.post("/api/v1/author/dashboard/notification-mark-seen/", {'user_id': self.author.id, **data}, content_type='application/json').json()
+
+    def unread(self):
+        return self.client.get(f"/api/v1/author/dashboard/notification-unread-count/{self.author.id}/").json()['unread']
+
+    def test_unread_count_is_a_single_lookup(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(notifications.unread_count(self.author.id), 3)
+
+    def test_mark_one_and_several(self):
+        self.assertEqual(self.mark(noti_id=self.notifications[0].id)['unread'], 2)
+
+        # One UPDATE each for the notifications and the counter, plus the count lookup.
+        with self.assertNumQueries(5):
+            data = self.mark(noti_ids=[n.id for n in self.notifications])
+        self.assertEqual((data['marked'], data['unread']), (2, 0))
+        self.assertEqual(self.unread(), 0)
+
+    def test_mark_before_timestamp(self):
+        cutoff = timezone.now()
+        api_models.Notification.objects.filter(id=self.notifications[2].id).update(date=cutoff + timedelta(minutes=1))
+
+        data = self.mark(before=cutoff.isoformat())
+        self.assertEqual((data['marked'], data['unread']), (2, 1))
+
+    def test_mark_all_and_deletes_keep_count(self):
+        self.posts[0].delete()
+        self.assertEqual(self.unread(), 2)
+        self.assertEqual(self.mark()['unread'], 0)
+        self.assertFalse(api_models.Notification.objects.filter(read=False).exists())
+
+    def test_user_id_is_required(self):
+        response = self.client.post("/api/v1/author/dashboard/notification-mark-seen/", {'noti_id': self.notifications[0].id}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.unread(), 3)
+
+    def test_malformed_input_is_rejected(self):
+        url = "/api/v1/author/dashboard/notification-mark-seen/"
+        for data in ({'noti_ids': 5}, {'noti_ids': ["x"]}, {'noti_ids': [[1]]}, {'noti_id': {}}, {'before': 5}, {'before': "yesterday"}, {'user_id': "me"}):
+            response = self.client.post(url, {'user_id': self.author.id, **data}, content_type='application/json')
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(self.unread(), 3)
+
+
+class InteractionToggleTests(TestCase):
+    def setUp(self):
+        self.post = create_post()
+        self.reader = api_models.CustomUser.objects.create(email="reader@example.com")
+
+    def post_json(self, url, **data):
+        return self.client.post(url, {'user_id': self.reader.id, 'post_id': self.post.id, **data}, content_type='application/json').json()
+
+    def test_like_toggle_returns_state_and_count(self):
+        data = self.post_json("/api/v1/post/like/")
+        self.assertEqual((data['liked'], data['like_count']), (True, 1))
+        data = self.post_json("/api/v1/post/like/")
+        self.assertEqual((data['liked'], data['like_count']), (False, 0))
+
+    def test_set_mode_is_idempotent(self):
+        for _ in range(3):
+            data = self.post_json("/api/v1/post/like/", liked=True)
+            self.assertEqual((data['liked'], data['like_count']), (True, 1))
+        self.assertEqual(api_models.NotificationEvent.objects.count(), 1)
+
+        for _ in range(2):
+            data = self.post_json("/api/v1/post/bookmark/", bookmarked=True)
+        self.assertEqual((data['bookmarked'], data['bookmark_count']), (True, 1))
+        data = self.post_json("/api/v1/post/bookmark/", bookmarked=False)
+        data = self.post_json("/api/v1/post/bookmark/", bookmarked=False)
+        self.assertEqual((data['bookmarked'], data['bookmark_count']), (False, 0))
+
+    def test_set_mode_accepts_form_and_string_booleans(self):
+        payload = {'user_id': self.reader.id, 'post_id': self.post.id}
+        data = self.client.post("/api/v1/post/like/", {**payload, 'liked': 'false'}).json()
+        self.assertEqual((data['liked'], data['like_count']), (False, 0))
+        for _ in range(2):
+            data = self.client.post("/api/v1/post/like/", {**payload, 'liked': 'true'}).json()
+            self.assertEqual((data['liked'], data['like_count']), (True, 1))
+
+        data = self.post_json("/api/v1/post/bookmark/", bookmarked="true")
+        data = self.post_json("/api/v1/post/bookmark/", bookmarked="false")
+        self.assertEqual((data['bookmarked'], data['bookmark_count']), (False, 0))
+        response = self.client.post("/api/v1/post/bookmark/", {**payload, 'bookmarked': 'maybe'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_like_does_not_load_likers(self):
+        others = [api_models.CustomUser.objects.create(email=f"other{i}@example.com") for i in range(5)]
+        self.post.likes.add(*others)
+        with CaptureQueriesContext(connection) as queries:
+            self.post_json("/api/v1/post/like/")
+        self.assertFalse(any('INNER JOIN "api_post_likes"' in query['sql'] for query in queries))
+
+    def test_lost_insert_race_keeps_counts(self):
+        self.post.likes.add(self.reader)
+        state, count = interactions.set_like(self.reader.id, self.post.id, self.post.user_id, liked=True)
+        self.assertEqual((state, count), (True, 0))
+
+    def test_unknown_post(self):
+        response = self.client.post("/api/v1/post/like/", {'user_id': self.reader.id, 'post_id': 999}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+class BatchInteractionTests(TestCase):
+    def setUp(self):
+        self.author = api_models.CustomUser.objects.create(email="author@example.com")
+        self.posts = [create_post(self.author, title=f"Post {i}") for i in range(3)]
+        self.reader = api_models.CustomUser.objects.create(email="reader@example.com")
+
+    def batch(self, operations):
+        return self.client.post("/api/v1/post/interactions/batch/", {'user_id': self.reader.id, 'operations': operations}, content_type='application/json')
+
+    def test_operations_apply_in_order_with_net_writes(self):
+        first, second, third = self.posts
+        self.posts[2].likes.add(self.reader)
+        recount_post_counters()
+
+        data = self.batch([
+            {'op': 'like', 'post_id': first.id},
+            {'op': 'like', 'post_id': first.id},
+            {'op': 'like', 'post_id': first.id, 'value': True},
+            {'op': 'like', 'post_id': third.id},
+            {'op': 'bookmark', 'post_id': second.id},
+            {'op': 'comment', 'post_id': second.id, 'name': "R", 'email': "r@example.com", 'comment': "Nice"},
+            {'op': 'comment', 'post_id': second.id, 'name': "R", 'email': "r@example.com", 'comment': "Again"},
+        ]).json()
+
+        self.assertEqual([r.get('liked', r.get('bookmarked')) for r in data['results']], [True, False, True, False, True, None, None])
+        self.assertEqual(data['posts'][str(first.id)]['like_count'], 1)
+        self.assertEqual(data['posts'][str(third.id)]['like_count'], 0)
+        self.assertEqual(data['posts'][str(second.id)], {'like_count': 0, 'comment_count': 2, 'bookmark_count': 1})
+        self.assertEqual(api_models.NotificationEvent.objects.count(), 4)
+        self.assertEqual(api_models.AuthorStats.objects.get(user=self.author).likes, 0)
+
+    def test_bad_operations_are_reported_individually(self):
+        data = self.batch([
+            {'op': 'share', 'post_id': self.posts[0].id},
+            {'op': 'like', 'post_id': 999},
+            {'op': 'like', 'post_id': self.posts[0].id},
+        ]).json()
+        self.assertEqual([r['ok'] for r in data['results']], [False, False, True])
+        self.assertTrue(self.posts[0].likes.filter(id=self.reader.id).exists())
+
+    def test_malformed_operations_are_reported_individually(self):
+        post_id = self.posts[0].id
+        data = self.batch([
+            {'op': ['like'], 'post_id': post_id},
+            {'op': {'like': 1}, 'post_id': post_id},
+            {'op': 'like', 'post_id': [post_id]},
+            {'op': 'like', 'post_id': {}},
+            {'op': 'like', 'post_id': str(post_id)},
+            {'op': 'like', 'post_id': True},
+            {'op': 'comment', 'post_id': post_id, 'name': None, 'comment': "Hi"},
+            {'op': 'comment', 'post_id': post_id, 'email': ["r@example.com"], 'comment': "Hi"},
+            {'op': 'comment', 'post_id': post_id, 'comment': {'text': "Hi"}},
+            {'op': 'comment', 'post_id': post_id, 'name': "R" * 256, 'comment': "Hi"},
+            "like",
+            {'op': 'comment', 'post_id': post_id, 'name': "R", 'comment': "Hi"},
+        ]).json()
+
+        self.assertEqual([r['ok'] for r in data['results']], [False] * 11 + [True])
+        self.assertEqual(data['results'][2]['error'], 'Invalid post_id')
+        self.assertEqual(data['results'][6]['error'], 'Invalid name')
+        self.assertEqual(api_models.Comment.objects.count(), 1)
+
+        response = self.client.post("/api/v1/post/interactions/batch/", {'operations': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_size_is_capped(self):
+        operations = [{'op': 'like', 'post_id': self.posts[0].id}] * (interactions.MAX_BATCH_OPERATIONS + 1)
+        self.assertEqual(self.batch(operations).status_code, 400)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def run(count):
+            api_models.Bookmark.objects.all().delete()
+            operations = [{'op': 'comment', 'post_id': self.posts[0].id, 'comment': "Hi"}] * count
+            with CaptureQueriesContext(connection) as queries:
+                self.batch(operations + [{'op': 'bookmark', 'post_id': post.id} for post in self.posts])
+            return len(queries)
+
+        # Both runs add three bookmarks.
+        self.assertEqual(run(1), run(20))
+
+    def test_rows_written_concurrently_are_not_counted(self):
+        first, second = self.posts[:2]
+        first.likes.add(self.reader)
+        recount_post_counters()
+        api_models.AuthorStats.objects.filter(user=self.author).update(likes=1)
+
+        # The batch read its state before another request liked `first` and
+        # removed the like on `second`.
+        with mock.patch.object(interactions, '_members', side_effect=[{second.id}, set()]):
+            data = self.batch([
+                {'op': 'like', 'post_id': first.id, 'value': 'true'},
+                {'op': 'like', 'post_id': second.id, 'value': 'false'},
+            ]).json()
+
+        self.assertEqual(data['posts'][str(first.id)]['like_count'], 1)
+        self.assertEqual(data['posts'][str(second.id)]['like_count'], 0)
+        self.assertEqual(api_models.AuthorStats.objects.get(user=self.author).likes, 1)
+        self.assertFalse(api_models.NotificationEvent.objects.exists())
+
+    def test_string_values_set_state(self):
+        data = self.batch([
+            {'op': 'like', 'post_id': self.posts[0].id, 'value': 'false'},
+            {'op': 'bookmark', 'post_id': self.posts[0].id, 'value': 'maybe'},
+        ]).json()
+        self.assertEqual([(r['ok'], r.get('liked')) for r in data['results']], [(True, False), (False, None)])
+        self.assertFalse(self.posts[0].likes.exists())
+
+
+class PostViewerStateTests(TestCase):
+    def setUp(self):
+        self.posts = [create_post(title=f"Post {i}") for i in range(3)]
+        self.reader = api_models.CustomUser.objects.create(email="reader@example.com")
+        interactions.set_like(self.reader.id, self.posts[0].id, self.posts[0].user_id, True)
+        interactions.set_bookmark(self.reader.id, self.posts[1].id, self.posts[1].user_id, True)
+
+    def state(self, query):
+        return self.client.get(f"/api/v1/post/viewer-state/{query}").json()
+
+    def test_state_for_viewer_in_one_query(self):
+        ids = ",".join(str(post.id) for post in self.posts)
+        with self.assertNumQueries(1):
+            data = self.state(f"?ids={ids}&user_id={self.reader.id}")
+
+        first, second, third = (data[str(post.id)] for post in self.posts)
+        self.assertEqual(first, {'like_count': 1, 'comment_count': 0, 'bookmark_count': 0, 'liked': True, 'bookmarked': False})
+        self.assertEqual((second['liked'], second['bookmarked'], second['bookmark_count']), (False, True, 1))
+        self.assertEqual((third['liked'], third['bookmarked']), (False, False))
+
+    def test_anonymous_and_limits(self):
+        data = self.state(f"?ids={self.posts[0].id},999")
+        self.assertEqual(list(data), [str(self.posts[0].id)])
+        self.assertFalse(data[str(self.posts[0].id)]['liked'])
+
+        ids = ",".join(str(i) for i in range(101))
+        self.assertEqual(self.client.get(f"/api/v1/post/viewer-state/?ids={ids}").status_code, 400)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+
+    def upload(self, size=(2000, 1000), mode='RGB'):
+        buffer = BytesIO()
+        Image.new(mode, size, 'red').save(buffer, format='PNG')
+        return SimpleUploadedFile("banner.png", buffer.getvalue(), content_type='image/png')
+
+    def test_upload_is_queued_and_resized(self):
+        post = create_post(image=self.upload())
+        self.assertTrue(api_models.ImageJob.objects.filter(model='api.Post', object_id=post.id).exists())
+
+        call_command('process_images', '--once', stdout=StringIO())
+
+        post.refresh_from_db()
+        card = post.image_variants['card']
+        self.assertEqual((card['width'], card['height']), (480, 240))
+        self.assertTrue(card['webp'].endswith('.webp'))
+        self.assertTrue(card['fallback'].endswith('.jpg'))
+        with Image.open(os.path.join(self.media.name, card['webp'])) as image:
+            self.assertEqual(image.format, 'WEBP')
+
+    def test_unchanged_image_is_not_requeued(self):
+        post = create_post(image=self.upload())
+        images.process_pending()
+        post.refresh_from_db()
+        post.title = "Edited"
+        post.save()
+        self.assertFalse(api_models.ImageJob.objects.filter(model='api.Post').exists())
+
+    def test_identical_output_is_stored_once(self):
+        first = create_post(image=self.upload())
+        second = create_post(image=self.upload())
+        images.process_pending()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image_variants['thumbnail']['webp'], second.image_variants['thumbnail']['webp'])
+
+    def test_transparent_images_fall_back_to_png(self):
+        post = create_post(image=self.upload(mode='RGBA'))
+        images.process_pending()
+        post.refresh_from_db()
+        self.assertTrue(post.image_variants['card']['fallback'].endswith('.png'))
+
+    def test_default_avatar_is_not_queued(self):
+        user = api_models.CustomUser.objects.create(email="avatar@example.com")
+        self.assertEqual(user.profile.image.name, 'profiles/default.jpg')
+        self.assertFalse(api_models.ImageJob.objects.filter(model='api.Profile').exists())
+
+    def test_job_survives_a_failed_worker(self):
+        user = api_models.CustomUser.objects.create(email="author@example.com")
+        images.process_pending()
+        post = create_post(user, image=self.upload())
+        with mock.patch('api.images.build_variants', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            images.process_pending()
+        self.assertTrue(api_models.ImageJob.objects.filter(model='api.Post', object_id=post.id).exists())
+
+    def test_image_replaced_while_processing_stays_queued(self):
+        post = create_post(image=self.upload())
+        build_variants = images.build_variants
+
+        def replace_image(field_file):
+            variants = build_variants(field_file)
+            replacement = api_models.Post.objects.get(id=post.id)
+            replacement.image = self.upload(size=(300, 300))
+            replacement.save()
+            return variants
+
+        with mock.patch('api.images.build_variants', side_effect=replace_image):
+            images.process_pending()
+        self.assertTrue(api_models.ImageJob.objects.filter(model='api.Post', object_id=post.id).exists())
+
+        images.process_pending()
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants['source'], post.image.name)
+        self.assertEqual(post.image_variants['card']['width'], 300)
+
+    @override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0})
+    def test_serializer_exposes_variant_urls(self):
+        post = create_post(image=self.upload())
+        images.process_pending()
+
+        data = self.client.get(f"/api/v1/post/detail/{post.slug}/").json()
+        self.assertTrue(data['image_variants']['card']['webp'].startswith("http://testserver/media/blobs/"))
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(
+            MEDIA_ROOT=self.media.name,
+            UPLOADS={'DIRECTORY': os.path.join(self.media.name, 'parts'), 'MAX_CHUNK_SIZE': 4096},
+        ))
+        self.addCleanup(self.media.cleanup)
+        self.user = api_models.CustomUser.objects.create(email="uploader@example.com")
+        buffer = BytesIO()
+        Image.new('RGB', (200, 100), 'blue').save(buffer, format='BMP')
+        self.data = buffer.getvalue()
+
+    def start(self, data=None):
+        data = self.data if data is None else data
+        response = self.client.post("/api/v1/author/dashboard/upload/", {
+            'user_id': self.user.id, 'filename': "cover.bmp", 'size': len(data),
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload_id']
+
+    def send(self, upload_id, first, last, data=None):
+        data = self.data if data is None else data
+        return self.client.put(
+            f"/api/v1/author/dashboard/upload/{upload_id}/",
+            data[first:last + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f"bytes {first}-{last}/{len(data)}",
+        )
+
+    def upload(self, data=None):
+        data = self.data if data is None else data
+        upload_id = self.start(data)
+        for first in range(0, len(data), 4096):
+            response = self.send(upload_id, first, min(first + 4095, len(data) - 1), data)
+        return upload_id, response
+
+    def test_chunks_are_assembled_in_order(self):
+        upload_id, response = self.upload()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['complete'])
+        with open(os.path.join(self.media.name, 'parts', f"{upload_id}.part"), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_out_of_order_chunk_is_rejected_and_resumable(self):
+        upload_id = self.start()
+        self.assertEqual(self.send(upload_id, 0, 4095).status_code, 200)
+
+        response = self.send(upload_id, 8192, 12287)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['received'], 4096)
+
+        received = self.client.get(f"/api/v1/author/dashboard/upload/{upload_id}/").json()['received']
+        self.assertEqual(self.send(upload_id, received, received + 4095).status_code, 200)
+
+    def test_oversized_chunk_is_rejected(self):
+        upload_id = self.start()
+        self.assertEqual(self.send(upload_id, 0, 8191).status_code, 413)
+
+    def test_start_validates_input(self):
+        url = "/api/v1/author/dashboard/upload/"
+        self.assertEqual(self.client.post(url, {'user_id': self.user.id, 'filename': "a.bmp"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'user_id': self.user.id, 'size': "big"}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'size': 10}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'user_id': 999, 'size': 10}).status_code, 404)
+        self.assertFalse(api_models.UploadSession.objects.exists())
+
+    def test_invalid_image_is_discarded(self):
+        upload_id, response = self.upload(b"not an image" * 10)
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(api_models.UploadSession.objects.filter(upload_id=upload_id).exists())
+
+    def test_create_post_from_upload(self):
+        upload_id, _ = self.upload()
+        category = api_models.Category.objects.create(title="News")
+
+        response = self.client.post("/api/v1/author/dashboard/create-post/", {
+            'user_id': self.user.id, 'title': "Uploaded", 'content': "Body",
+            'category': category.id, 'upload_id': upload_id,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        post = api_models.Post.objects.get(title="Uploaded")
+        self.assertEqual(post.description, "Body")
+        with post.image.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertFalse(api_models.UploadSession.objects.exists())
+
+    def test_expire_removes_abandoned_uploads(self):
+        upload_id = self.start()
+        later = timezone.now() + timedelta(days=2)
+        self.assertEqual(uploads.expire(now=later), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.media.name, 'parts', f"{upload_id}.part")))
+
+
+class ContentAddressedMediaTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(MEDIA_ROOT=self.media.name))
+        self.addCleanup(self.media.cleanup)
+
+    def upload(self, color='red'):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), color).save(buffer, format='PNG')
+        return SimpleUploadedFile("banner.png", buffer.getvalue(), content_type='image/png')
+
+    def refcount(self, name):
+        return api_models.MediaBlob.objects.filter(name=name).values_list('refcount', flat=True).first()
+
+    def test_identical_uploads_share_one_blob(self):
+        first = create_post(image=self.upload())
+        second = create_post(image=self.upload())
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith("blobs/"))
+        self.assertEqual(self.refcount(first.image.name), 2)
+        blob_dir = os.path.dirname(os.path.join(self.media.name, first.image.name))
+        self.assertEqual(len(os.listdir(blob_dir)), 1)
+
+    def test_blob_created_after_the_exists_check_is_reused(self):
+        storage = media.ContentAddressedStorage()
+        name = storage.save("banner.png", self.upload())
+        # As if another request wrote the blob between exists() and _save().
+        with mock.patch.object(media.ContentAddressedStorage, 'exists', return_value=False):
+            self.assertEqual(storage.save("copy.png", self.upload()), name)
+        self.assertEqual(os.listdir(os.path.dirname(storage.path(name))), [os.path.basename(name)])
+
+    def test_references_follow_replacements_and_deletes(self):
+        post = create_post(image=self.upload())
+        old = post.image.name
+
+        post = api_models.Post.objects.get(id=post.id)
+        post.image = self.upload('blue')
+        post.save()
+        self.assertEqual(self.refcount(old), 0)
+        self.assertEqual(self.refcount(post.image.name), 1)
+
+        new = post.image.name
+        post.delete()
+        self.assertEqual(self.refcount(new), 0)
+
+    def test_collect_deletes_only_unreferenced_blobs(self):
+        kept = create_post(image=self.upload())
+        dropped = create_post(image=self.upload('blue'))
+        dropped_name = dropped.image.name
+        dropped.delete()
+
+        dropped_size = os.path.getsize(os.path.join(self.media.name, dropped_name))
+
+        self.assertEqual(media.collect(grace_period=0), (1, dropped_size))
+        self.assertTrue(os.path.exists(kept.image.path))
+        self.assertFalse(os.path.exists(os.path.join(self.media.name, dropped_name)))
+
+    def test_dedupe_moves_existing_files(self):
+        plain = FileSystemStorage()
+        names = [plain.save("image/banner.png", self.upload()) for _ in range(2)]
+        posts = [create_post() for _ in names]
+        for post, name in zip(posts, names):
+            api_models.Post.objects.filter(id=post.id).update(image=name, image_variants={'source': name})
+
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+
+        blobs = set(api_models.Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(blobs), 1)
+        blob = blobs.pop()
+        self.assertTrue(blob.startswith("blobs/"))
+        self.assertEqual(self.refcount(blob), 2)
+        self.assertEqual(api_models.Post.objects.get(id=posts[0].id).image_variants['source'], blob)
+        self.assertFalse(any(plain.exists(name) for name in names))
+        self.assertIn("Moved 2 files", out.getvalue())
+
+    def test_blobs_are_served_as_immutable(self):
+        post = create_post(image=self.upload())
+        request = RequestFactory().get(f"/media/{post.image.name}")
+
+        response = media.serve(request, post.image.name)
+
+        self.assertIn("immutable", response['Cache-Control'])
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0}, API_PAGINATION={'PAGE_SIZE': 2})
+class AsyncReadViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = api_models.Category.objects.create(title="News")
+        cls.posts = [create_post(title=f"Post {i}", category=cls.category, status='Active') for i in range(3)]
+
+    async def compare(self, path):
+        sync = await self.async_client.get(f"/api/v1/{path}")
+        response_cache.invalidate('posts', 'categories')
+        asynchronous = await self.async_client.get(f"/api/v1/async/{path}")
+        self.assertEqual(asynchronous.status_code, 200)
+        # Cursor links point back at whichever path served the page.
+        self.assertEqual(asynchronous.content.decode().replace("/api/v1/async/", "/api/v1/"), sync.content.decode())
+        return asynchronous
+
+    async def test_matches_sync_views(self):
+        await self.compare("post/category/list/")
+        await self.compare(f"post/category/posts/{self.category.slug}/")
+        page = await self.compare("post/list/")
+        await self.compare(page.json()['next'].split('/api/v1/async/')[1])
+
+    async def test_detail_counts_views(self):
+        post = self.posts[0]
+        response = await self.async_client.get(f"/api/v1/async/post/detail/{post.slug}/")
+        self.assertEqual(response.json()['views'], 1)
+        await self.async_client.get(f"/api/v1/async/post/detail/{post.slug}/")
+        await post.arefresh_from_db()
+        self.assertEqual(post.views, 2)
+
+    async def test_conditional_requests_and_missing_rows(self):
+        first = await self.async_client.get("/api/v1/async/post/list/")
+        second = await self.async_client.get("/api/v1/async/post/list/", headers={'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 304)
+
+        missing = await self.async_client.get("/api/v1/async/post/detail/missing/")
+        self.assertEqual(missing.status_code, 404)
+
+
+@override_settings(NOTIFICATION_STREAM={'BROKER': 'api.notification_stream.LocalBroker', 'HEARTBEAT': 5, 'POLL_INTERVAL': 0.01})
+class NotificationStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = create_post()
+        cls.author = cls.post.user
+
+    def setUp(self):
+        notification_stream.reset_broker()
+        self.addCleanup(notification_stream.reset_broker)
+
+    async def open(self, **headers):
+        request = AsyncRequestFactory().get(f"/api/v1/author/dashboard/notification-stream/{self.author.id}/", headers=headers)
+        response = await NotificationStreamView.as_view()(request, user_id=self.author.id)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = aiter(response.streaming_content)
+        self.assertEqual(await anext(body), b"retry: 3000\n\n")
+        return body
+
+    async def next_chunk(self, body):
+        return (await asyncio.wait_for(anext(body), timeout=2)).decode()
+
+    async def test_reconnect_replays_missed_notifications(self):
+        first = await api_models.Notification.objects.acreate(user=self.author, post=self.post, type='Like')
+        second = await api_models.Notification.objects.acreate(user=self.author, post=self.post, type='Comment')
+
+        body = await self.open(**{'Last-Event-ID': notification_stream.event_id(first)})
+
+        chunk = await self.next_chunk(body)
+        self.assertIn(f"id: {notification_stream.event_id(second)}\n", chunk)
+        self.assertIn('"type":"Comment"', chunk)
+
+    async def test_processed_notifications_are_pushed(self):
+        body = await self.open()
+
+        def process():
+            notifications.enqueue(self.author.id, self.post.id, 'Like')
+            with self.captureOnCommitCallbacks(execute=True):
+                notifications.process_pending()
+
+        await sync_to_async(process)()
+        chunk = await self.next_chunk(body)
+        self.assertIn("event: notification\n", chunk)
+        self.assertIn('"type":"Like"', chunk)
+
+    @override_settings(NOTIFICATION_STREAM={'HEARTBEAT': 0.01})
+    async def test_idle_stream_sends_heartbeats(self):
+        body = await self.open()
+        self.assertEqual(await self.next_chunk(body), ": heartbeat\n\n")
+
+    @override_settings(NOTIFICATION_STREAM={'BROKER': 'api.notification_stream.DatabaseBroker', 'POLL_INTERVAL': 0.01})
+    async def test_database_broker_polls_for_new_rows(self):
+        body = await self.open()
+        chunk = asyncio.ensure_future(self.next_chunk(body))
+        await asyncio.sleep(0.05)
+
+        await api_models.Notification.objects.acreate(user=self.author, post=self.post, type='Bookmark')
+
+        self.assertIn('"type":"Bookmark"', await chunk)
+
+    @override_settings(NOTIFICATION_STREAM={'BROKER': 'api.notification_stream.DatabaseBroker', 'POLL_INTERVAL': 0.01})
+    async def test_late_commit_with_earlier_date_is_delivered(self):
+        def process(type, now=None):
+            notifications.enqueue(self.author.id, self.post.id, type)
+            with mock.patch('django.utils.timezone.now', return_value=now or timezone.now()):
+                notifications.process_pending()
+
+        await sync_to_async(process)('Like')
+        body = await self.open()
+        chunk = asyncio.ensure_future(self.next_chunk(body))
+        await asyncio.sleep(0.05)
+        await sync_to_async(process)('Comment')
+        self.assertIn('"type":"Comment"', await chunk)
+
+        # A worker that read the clock before the previous batch but
+        # committed after it.
+        await sync_to_async(process)('Bookmark', timezone.now() - timedelta(minutes=5))
+        self.assertIn('"type":"Bookmark"', await self.next_chunk(body))
+
+    def test_wsgi_requests_are_refused(self):
+        response = self.client.get(f"/api/v1/author/dashboard/notification-stream/{self.author.id}/")
+        self.assertEqual(response.status_code, 501)
+
+
+class BenchmarkWorkloadTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.enterContext(override_settings(
+            MEDIA_ROOT=self.media.name,
+            UPLOADS={'DIRECTORY': os.path.join(self.media.name, 'parts')},
+            VIEW_COUNTER={'FLUSH_INTERVAL': 0},
+        ))
+        self.addCleanup(self.media.cleanup)
+
+    def test_every_operation_succeeds(self):
+        data = benchmark.seed(users=5, posts=20, likes=2, comments=1, bookmarks=1)
+        workload = benchmark.Workload(data)
+
+        for name in benchmark.Workload.MIX:
+            response = getattr(workload, 'op_' + name)()
+            self.assertLess(response.status_code, 400, name)
+
+    def test_summary_percentiles(self):
+        samples = [{'name': 'a', 'latency': i / 1000, 'queries': 2, 'status': 200} for i in range(1, 101)]
+        summary = benchmark.summarize(samples, elapsed=2)
+        self.assertEqual(summary['total']['p50_ms'], 50)
+        self.assertEqual(summary['total']['p99_ms'], 99)
+        self.assertEqual(summary['total']['throughput_rps'], 50)
+
+        slower = benchmark.summarize([dict(sample, queries=3) for sample in samples], elapsed=2)
+        self.assertTrue(all(regressed for _, _, _, regressed in benchmark.compare(summary, slower, threshold=20)))
+
+        noisy = benchmark.summarize([dict(sample, latency=sample['latency'] * 2) for sample in samples[:10]], elapsed=1)
+        quiet = benchmark.summarize(samples[:10], elapsed=1)
+        self.assertFalse(any(regressed for _, _, _, regressed in benchmark.compare(quiet, noisy, threshold=20)))
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 60, 'MAX_PENDING': 100, 'SPOOL_DIR': None})
+class InstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = api_models.Category.objects.create(title="News")
+        create_post(title="Instrumented", category=cls.category, status='Active')
+
+    def setUp(self):
+        instrumentation.registry.reset()
+        response_cache.invalidate('posts', 'categories')
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/post/list/")
+
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertRegex(timing, r'serialize;dur=\d+\.\d\d, total;dur=\d+\.\d\d$')
+
+    async def test_async_views_count_queries(self):
+        response = await self.async_client.get("/api/v1/async/post/list/")
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+    def test_metrics_endpoint(self):
+        self.client.get("/api/v1/post/list/")
+        self.client.get("/api/v1/post/list/")
+
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('api_requests_total{view="api/v1/post/list/",method="GET",status="200"} 2', body)
+        self.assertIn('api_request_duration_seconds_count{view="api/v1/post/list/",method="GET"} 2', body)
+        self.assertIn('api_request_duration_seconds_bucket{view="api/v1/post/list/",method="GET",le="+Inf"} 2', body)
+
+    def test_metrics_require_an_allowed_client(self):
+        remote = {'REMOTE_ADDR': "203.0.113.9"}
+        self.assertEqual(self.client.get("/metrics", **remote).status_code, 403)
+        with self.settings(INSTRUMENTATION={'METRICS_TOKEN': "s3cret"}):
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong", **remote).status_code, 403)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret", **remote).status_code, 200)
+        with self.settings(INSTRUMENTATION={'METRICS_ALLOWED_NETWORKS': ('203.0.113.0/24',)}):
+            self.assertEqual(self.client.get("/metrics", **remote).status_code, 200)
+
+    def test_slow_requests_log_sql(self):
+        with self.settings(INSTRUMENTATION={'SLOW_REQUEST_MS': 0}), self.assertLogs('api.slow_requests', 'WARNING') as logs:
+            self.client.get("/api/v1/post/list/")
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], "api/v1/post/list/")
+        self.assertEqual(len(record['sql']), record['queries'])
+        self.assertTrue(any('api_post' in statement['sql'] for statement in record['sql']))
+
+
+@override_settings(DATABASE_ROUTING={'REPLICAS': ['replica1'], 'STICKY_SECONDS': 60})
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        caches['default'].clear()
+
+    def handle(self, request, replica_reads=True, write=False):
+        """Run a view behind the routing middleware; return where its reads went."""
+        reads = []
+
+        def view(request):
+            reads.append(router.db_for_read(api_models.Post))
+            if write:
+                router.db_for_write(api_models.Post)
+                reads.append(router.db_for_read(api_models.Post))
+            return HttpResponse()
+        view.view_class = type('View', (), {'replica_reads': replica_reads})
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+        middleware = db_router.ReplicaRoutingMiddleware(get_response)
+        middleware(request)
+        return reads
+
+    def test_public_reads_use_replicas(self):
+        self.assertEqual(self.handle(self.factory.get("/")), ['replica1'])
+        self.assertEqual(self.handle(self.factory.get("/"), replica_reads=False), ['default'])
+        self.assertEqual(self.handle(self.factory.post("/")), ['default'])
+        self.assertEqual(router.db_for_read(api_models.Post), 'default')
+        self.assertEqual(router.db_for_write(api_models.Post), 'default')
+
+    def test_reads_follow_writes_to_the_primary(self):
+        self.assertEqual(self.handle(self.factory.get("/"), write=True), ['replica1', 'default'])
+        self.assertEqual(self.handle(self.factory.get("/")), ['default'])
+        self.assertEqual(self.handle(self.factory.get("/", REMOTE_ADDR='10.0.0.2')), ['replica1'])
+
+    def test_pins_follow_the_token_user(self):
+        user = api_models.CustomUser.objects.create(email="reader@example.com")
+        token = f"Bearer {AccessToken.for_user(user)}"
+
+        self.handle(self.factory.post("/", HTTP_AUTHORIZATION=token, REMOTE_ADDR='10.0.0.3'), write=True)
+        self.assertEqual(self.handle(self.factory.get("/", HTTP_AUTHORIZATION=token, REMOTE_ADDR='10.0.0.4')), ['default'])
+        self.assertEqual(self.handle(self.factory.get("/", REMOTE_ADDR='10.0.0.3')), ['replica1'])
+
+    def test_database_urls(self):
+        configured = database.databases({
+            'DATABASE_URL': "postgres://blog:p%40ss@db:5432/blog?sslmode=require",
+            'DATABASE_REPLICA_URLS': "postgres://blog@replica/blog,sqlite:///replica.sqlite3",
+            'DATABASE_POOL': "2:10",
+        }, Path('/srv'))
+
+        self.assertEqual(configured['default']['PASSWORD'], "p@ss")
+        self.assertEqual(configured['default']['OPTIONS'], {'sslmode': 'require', 'pool': {'min_size': 2, 'max_size': 10}})
+        self.assertEqual(configured['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(configured['replica1']['HOST'], "replica")
+        self.assertEqual(configured['replica2']['NAME'], Path('/srv/replica.sqlite3'))
+        self.assertEqual(configured['replica2']['TEST'], {'MIRROR': 'default'})
+
+
+class TunedSQLiteTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tuned.sqlite3')
+
+    def connect(self):
+        settings_dict = {**connection.settings_dict, 'ENGINE': 'api.backends.sqlite3', 'NAME': self.path, 'TEST': {}}
+        wrapper = TunedDatabaseWrapper(settings_dict, alias='tuned')
+        wrapper.ensure_connection()
+        return wrapper
+
+    def test_pragmas(self):
+        tuned = self.connect()
+        self.addCleanup(tuned.close)
+        with tuned.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size')
+            }
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000, 'cache_size': -64000})
+
+    def test_writers_queue_behind_an_open_transaction(self):
+        first = self.connect()
+        self.addCleanup(first.close)
+        first.cursor().execute("CREATE TABLE entry (value INTEGER)")
+        first._start_transaction_under_autocommit()
+        first.cursor().execute("INSERT INTO entry VALUES (1)")
+
+        finished = threading.Event()
+
+        def write():
+            second = self.connect()
+            second.cursor().execute("INSERT INTO entry VALUES (2)")
+            second.close()
+            finished.set()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        self.assertFalse(finished.wait(0.2))
+        first.commit()
+        self.assertTrue(finished.wait(5))
+        writer.join()
+
+        with first.cursor() as cursor:
+            self.assertEqual(cursor.execute("SELECT value FROM entry ORDER BY rowid").fetchall(), [(1,), (2,)])
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 60, 'MAX_PENDING': 100, 'SPOOL_DIR': None})
+class RankedFeedTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.old_popular = create_post(title="Old popular", status='Active', views=2000, like_count=40)
+        self.fresh = create_post(title="Fresh", status='Active', views=5)
+        self.quiet = create_post(title="Quiet", status='Active')
+        self.draft = create_post(title="Draft", status='Draft', views=1000)
+        api_models.Post.objects.filter(id=self.old_popular.id).update(date=now - timedelta(days=2))
+        api_models.Post.objects.filter(id=self.quiet.id).update(date=now - timedelta(days=1))
+        response_cache.invalidate('posts', 'feed')
+
+    def titles(self, response):
+        return [post['title'] for post in response.json()['results']]
+
+    def test_feed_follows_the_ranking(self):
+        self.assertEqual(feed.rank_posts(), 3)
+        self.assertEqual(
+            list(api_models.PostRanking.objects.values_list('post__title', flat=True)),
+            ["Old popular", "Fresh", "Quiet"],
+        )
+
+        response = self.client.get("/api/v1/post/feed/")
+        self.assertEqual(self.titles(response), ["Old popular", "Fresh", "Quiet"])
+
+        api_models.Post.objects.filter(id=self.fresh.id).update(like_count=5000)
+        feed.rank_posts()
+        self.assertEqual(self.titles(self.client.get("/api/v1/post/feed/"))[0], "Fresh")
+
+    def test_pages_are_rank_range_scans(self):
+        feed.rank_posts()
+        first = self.client.get("/api/v1/post/feed/", {'page_size': 2}).json()
+        self.assertEqual([post['title'] for post in first['results']], ["Old popular", "Fresh"])
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first['next']).json()
+        self.assertEqual([post['title'] for post in second['results']], ["Quiet"])
+        feed_query = next(query['sql'] for query in queries if 'api_postranking' in query['sql'])
+        self.assertIn('"api_postranking"."rank" > 2', feed_query)
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0})
+class RelatedPostsTests(TestCase):
+    def setUp(self):
+        self.author = api_models.CustomUser.objects.create(email="writer@example.com")
+        self.other = api_models.CustomUser.objects.create(email="other@example.com")
+        self.python = api_models.Category.objects.create(title="Python")
+        self.django = create_post(self.author, title="Django query optimization", description="Indexes and select_related for Django querysets.", category=self.python)
+        self.orm = create_post(self.other, title="Django ORM querysets", description="How Django querysets build SQL.", category=self.python)
+        self.garden = create_post(self.other, title="Growing tomatoes", description="Soil, sun and watering.")
+        self.recipe = create_post(self.author, title="Tomato soup", description="A recipe for tomatoes.")
+        related.rebuild()
+        response_cache.invalidate('posts')
+
+    def related(self, post, kind=api_models.RelatedPost.SIMILAR):
+        return list(api_models.RelatedPost.objects.filter(post=post, kind=kind).values_list('related__title', flat=True))
+
+    def test_neighbours_by_text_and_category(self):
+        self.assertEqual(self.related(self.django)[0], "Django ORM querysets")
+        self.assertEqual(self.related(self.garden), ["Tomato soup"])
+        self.assertEqual(self.related(self.django, api_models.RelatedPost.AUTHOR), ["Tomato soup"])
+
+    def test_detail_embeds_related_posts_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(f"/api/v1/post/detail/{self.django.slug}/").json()
+
+        self.assertEqual([post['title'] for post in data['related']][0], "Django ORM querysets")
+        self.assertEqual([post['title'] for post in data['more_from_author']], ["Tomato soup"])
+        self.assertEqual(len([query for query in queries if 'api_relatedpost' in query['sql']]), 1)
+
+    def test_changes_refresh_affected_lists(self):
+        newer = create_post(self.other, title="Django querysets and indexes", description="Querysets, indexes, select_related.", category=self.python)
+        self.assertEqual(related.process_pending(), 1)
+        self.assertIn("Django querysets and indexes", self.related(self.django))
+        self.assertIn("Django query optimization", self.related(newer))
+
+        self.orm.status = 'Draft'
+        self.orm.save()
+        related.process_pending()
+        self.assertNotIn("Django ORM querysets", self.related(self.django))
+        self.assertEqual(self.related(self.orm), [])
+
+        self.recipe.delete()
+        related.process_pending()
+        self.assertEqual(self.related(self.django, api_models.RelatedPost.AUTHOR), [])
+
+    def test_failed_refresh_keeps_jobs_queued(self):
+        self.orm.title = "Django ORM internals"
+        self.orm.save()
+        with mock.patch.object(related, 'affected', side_effect=RuntimeError), self.assertLogs('api.related', 'ERROR'):
+            self.assertEqual(related.run_worker(once=True), 0)
+        self.assertTrue(api_models.RelatedPostJob.objects.filter(post_id=self.orm.id).exists())
+
+        self.assertEqual(related.process_pending(), 1)
+        self.assertFalse(api_models.RelatedPostJob.objects.exists())
+
+    def test_changes_during_a_refresh_stay_queued(self):
+        self.orm.save()
+        original = related.affected
+
+        def edit_meanwhile(corpus, post_ids):
+            self.orm.save()
+            return original(corpus, post_ids)
+
+        with mock.patch.object(related, 'affected', side_effect=edit_meanwhile):
+            related.process_pending()
+        self.assertEqual(list(api_models.RelatedPostJob.objects.values_list('post_id', flat=True)), [self.orm.id])
+
+    def test_small_blocks_give_the_same_lists(self):
+        corpus = related.Corpus()
+        expected = corpus.top(np.arange(len(corpus)))
+        with self.settings(RELATED_POSTS={'BLOCK_MEMORY': 1}):
+            self.assertEqual(corpus.block_size(), 1)
+            self.assertEqual(corpus.top(np.arange(len(corpus))), expected)
+
+
+@override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0, 'MAX_PENDING': 100, 'SPOOL_DIR': None})
+class TagTests(TestCase):
+    def setUp(self):
+        self.user = api_models.CustomUser.objects.create(email="tagger@example.com")
+        self.category = api_models.Category.objects.create(title="Web")
+
+    def counts(self):
+        return dict(api_models.Tag.objects.values_list('slug', 'post_count'))
+
+    def test_parse_normalizes_and_deduplicates(self):
+        self.assertEqual(tags.parse("Django, #sql,  django ,, Query  Plans"), {'django': "Django", 'sql': "sql", 'query-plans': "Query Plans"})
+        self.assertEqual(tags.parse(["a", "b", "a"]), {'a': "a", 'b': "b"})
+        with override_settings(TAGS={'MAX_PER_POST': 2}):
+            self.assertEqual(list(tags.parse("one, two, three")), ['one', 'two'])
+
+    def test_parse_keeps_non_ascii_names(self):
+        self.assertEqual(tags.parse("Café, 日本語, ***"), {'café': "Café", '日本語': "日本語"})
+        post = create_post(self.user, title="Unicode")
+        tags.set_tags(post, "日本語")
+        response = self.client.get("/api/v1/post/tag/日本語/")
+        self.assertEqual([item['id'] for item in response.json()['results']], [post.id])
+
+    def test_create_and_update_maintain_links_and_counts(self):
+        self.client.post("/api/v1/author/dashboard/create-post/", {
+            'user_id': self.user.id, 'title': "Tagged", 'content': "Body", 'category': self.category.id,
+            'tags': "Django, SQL",
+        })
+        post = api_models.Post.objects.get(title="Tagged")
+        self.assertEqual(sorted(post.tags.values_list('slug', flat=True)), ['django', 'sql'])
+        self.assertEqual(self.counts(), {'django': 1, 'sql': 1})
+
+        create_post(self.user, title="Other")
+        tags.set_tags(api_models.Post.objects.get(title="Other"), "sql")
+        self.client.patch(f"/api/v1/author/dashboard/update-post/{self.user.id}/{post.id}/", {
+            'title': "Tagged", 'content': "Body", 'category': self.category.id, 'image': "undefined",
+            'tags': "sql, caching",
+        }, content_type='application/json')
+        self.assertEqual(sorted(post.tags.values_list('slug', flat=True)), ['caching', 'sql'])
+        self.assertEqual(self.counts(), {'django': 0, 'sql': 2, 'caching': 1})
+
+        post.delete()
+        self.assertEqual(self.counts(), {'django': 0, 'sql': 1, 'caching': 0})
+        recount_counters()
+        self.assertEqual(self.counts(), {'django': 0, 'sql': 1, 'caching': 0})
+
+    def test_get_or_create_inserts_missing_tags_at_once(self):
+        api_models.Tag.objects.create(name="Django", slug='django')
+        with CaptureQueriesContext(connection) as queries:
+            created = tags.get_or_create(tags.parse("django, orm, sql"))
+
+        self.assertEqual([tag.slug for tag in created], ['django', 'orm', 'sql'])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 1)
+
+    def test_tag_posts_and_cloud(self):
+        first = create_post(self.user, title="First")
+        second = create_post(self.user, title="Second")
+        draft = create_post(self.user, title="Draft", status='Draft')
+        tags.set_tags(first, "python, web")
+        tags.set_tags(second, "python")
+        tags.set_tags(draft, "python")
+
+        data = self.client.get("/api/v1/post/tag/python/").json()
+        self.assertEqual([post['title'] for post in data['results']], ["Second", "First"])
+        self.assertEqual(self.client.get("/api/v1/post/tag/missing/").status_code, 404)
+
+        cloud = self.client.get("/api/v1/post/tag-cloud/").json()
+        self.assertEqual([(tag['slug'], tag['post_count']) for tag in cloud], [('python', 3), ('web', 1)])
+
+        detail = self.client.get(f"/api/v1/post/detail/{first.slug}/").json()
+        self.assertEqual([tag['name'] for tag in detail['tags']], ["python", "web"])
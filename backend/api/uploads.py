@@ -0,0 +1,149 @@
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+DEFAULTS = {
+    'DIRECTORY': None,
+    'CHUNK_SIZE': 1024 * 1024,
+    'MAX_CHUNK_SIZE': 8 * 1024 * 1024,
+    'MAX_SIZE': 50 * 1024 * 1024,
+    'EXPIRY': 24 * 60 * 60,
+}
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def get_setting(name):
+    return getattr(settings, 'UPLOADS', {}).get(name, DEFAULTS[name])
+
+
+def upload_directory():
+    return str(get_setting('DIRECTORY') or os.path.join(settings.MEDIA_ROOT, 'uploads'))
+
+
+def upload_path(session):
+    return os.path.join(upload_directory(), f"{session.upload_id}.part")
+
+
+def start(user_id, filename, size, content_type=''):
+    """Open an upload session for a file of ``size`` bytes."""
+    from api.models import UploadSession
+
+    if size <= 0 or size > get_setting('MAX_SIZE'):
+        raise UploadError(f"Uploads must be between 1 and {get_setting('MAX_SIZE')} bytes", 413)
+
+    session = UploadSession.objects.create(
+        user_id=user_id,
+        filename=os.path.basename(filename)[:255] or 'upload',
+        content_type=content_type[:100],
+        size=size,
+    )
+    os.makedirs(upload_directory(), exist_ok=True)
+    open(upload_path(session), 'wb').close()
+    return session
+
+
+def write_chunk(session, content_range, stream):
+    """
+    Append the byte range described by a ``Content-Range`` header, reading
+    it from ``stream`` straight onto disk. The range must start where the
+    previous chunk ended; a client that lost track asks for ``received``
+    and resumes from there. Returns the updated session.
+    """
+    from api.models import UploadSession
+
+    match = CONTENT_RANGE.match(content_range or '')
+    if not match:
+        raise UploadError("Send a 'Content-Range: bytes start-end/total' header", 400)
+    first, last, total = (int(value) for value in match.groups())
+    length = last - first + 1
+    if total != session.size or last >= session.size or length <= 0:
+        raise UploadError("Content-Range does not fit this upload", 416)
+    if length > get_setting('MAX_CHUNK_SIZE'):
+        raise UploadError(f"Chunks may be at most {get_setting('MAX_CHUNK_SIZE')} bytes", 413)
+    if session.complete:
+        raise UploadError("Upload is already complete", 409)
+    if first != session.received:
+        raise UploadError(f"Expected a chunk starting at byte {session.received}", 409)
+
+    written = 0
+    with open(upload_path(session), 'r+b') as f:
+        f.seek(first)
+        while written < length:
+            data = stream.read(min(READ_SIZE, length - written))
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+    if written != length:
+        raise UploadError("Request body is shorter than its Content-Range", 400)
+
+    # Only advance if no other request moved the offset meanwhile.
+    updated = UploadSession.objects.filter(pk=session.pk, received=first).update(
+        received=F('received') + length,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        raise UploadError("Another chunk was written concurrently; ask for the current offset", 409)
+    session.refresh_from_db()
+    if session.complete:
+        _check_image(session)
+    return session
+
+
+def _check_image(session):
+    try:
+        with Image.open(upload_path(session)) as image:
+            image.verify()
+    except (OSError, UnidentifiedImageError):
+        discard(session)
+        raise UploadError("Upload is not a valid image", 415)
+
+
+def attach(instance, field_name, upload_id, user_id):
+    """
+    Move a finished upload into ``instance.<field_name>`` (without saving the
+    instance) and close the session.
+    """
+    from api.models import UploadSession
+
+    session = UploadSession.objects.filter(upload_id=upload_id, user_id=user_id).first()
+    if session is None or not session.complete:
+        raise UploadError("No finished upload with that id", 400)
+
+    path = upload_path(session)
+    with open(path, 'rb') as f:
+        getattr(instance, field_name).save(session.filename, File(f), save=False)
+    discard(session)
+
+
+def discard(session):
+    try:
+        os.remove(upload_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def expire(now=None):
+    """Remove sessions untouched for ``EXPIRY`` seconds; returns how many."""
+    from api.models import UploadSession
+
+    cutoff = (now or timezone.now()) - timedelta(seconds=get_setting('EXPIRY'))
+    sessions = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    for session in sessions:
+        discard(session)
+    return len(sessions)
@@ -1,7 +1,19 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
+from api import async_views
 from api import views as api_views
 
+# Async twins of the public reads. They are always reachable under async/
+# (to compare against the sync views on one server) and replace the sync
+# views on the canonical paths when ASYNC_READ_VIEWS is set.
+async_reads = [
+    path('post/category/list/', async_views.CategoryListView.as_view()),
+    path('post/category/posts/<category_slug>/', async_views.PostCategoryListView.as_view()),
+    path('post/list/', async_views.PostListView.as_view()),
+    path('post/detail/<slug>/', async_views.PostDetailView.as_view()),
+]
+
 urlpatterns = [
     path('user/token/', api_views.MyTokenObtainPairView.as_view()),
     path('user/token/refresh/', TokenRefreshView.as_view()),
@@ -13,18 +25,34 @@ urlpatterns = [
     path('post/category/posts/<category_slug>/', api_views.PostCategoryListAPIView.as_view()),
     path('post/list/', api_views.PostListAPIView.as_view()),
     path('post/detail/<slug>/', api_views.PostDetailAPIView.as_view()),
+    path('post/feed/', api_views.PostFeedAPIView.as_view()),
+    path('post/tag-cloud/', api_views.TagCloudAPIView.as_view()),
+    path('post/tag/<tag_slug>/', api_views.PostTagListAPIView.as_view()),
+    path('post/search/', api_views.PostSearchAPIView.as_view()),
     path('post/like/', api_views.LikePostAPIView.as_view()),
     path('post/comment/', api_views.PostCommentAPIView.as_view()),
     path('post/bookmark/', api_views.BookmarkPostAPIView.as_view()),
+    path('post/interactions/batch/', api_views.BatchInteractionAPIView.as_view()),
+    path('post/viewer-state/', api_views.PostViewerStateAPIView.as_view()),
+    path('post/cache/stats/', api_views.ResponseCacheStatsAPIView.as_view()),
 
     # Dashboard Endpoints
     path('author/dashboard/stats/<user_id>/', api_views.DashboardStats.as_view()),
+    path('author/dashboard/post-list/<user_id>/', api_views.DashboardPostLists.as_view()),
     path('author/dashboard/comment-list/<user_id>/', api_views.DashboardCommentLists.as_view()),
     path('author/dashboard/notification-list/<user_id>/', api_views.DashboardNotificationLists.as_view()),
     path('author/dashboard/notification-mark-seen/', api_views.DashboardMarkNotificationAsSeen.as_view()),
+    path('author/dashboard/notification-unread-count/<user_id>/', api_views.DashboardUnreadNotificationCount.as_view()),
+    path('author/dashboard/notification-stream/<int:user_id>/', async_views.NotificationStreamView.as_view()),
     path('author/dashboard/reply-comment/', api_views.DashboardReplyCommentAPIView.as_view()),
 
     # Dashboard Post Endpoints
+    path('author/dashboard/upload/', api_views.DashboardUploadStartAPIView.as_view()),
+    path('author/dashboard/upload/<upload_id>/', api_views.DashboardUploadAPIView.as_view()),
     path('author/dashboard/create-post/', api_views.DashboardPostCreateAPIView.as_view()),
     path('author/dashboard/update-post/<user_id>/<post_id>/', api_views.DashboardPostUpdateAPIView.as_view()),
 ]
+
+urlpatterns += [path('async/' + str(pattern.pattern), pattern.callback) for pattern in async_reads]
+if getattr(settings, 'ASYNC_READ_VIEWS', False):
+    urlpatterns = async_reads + urlpatterns
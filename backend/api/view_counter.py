@@ -0,0 +1,186 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import F
+
+from api import author_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'FLUSH_INTERVAL': 10,
+    'MAX_PENDING': 1000,
+    'SPOOL_DIR': None,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'VIEW_COUNTER', {}).get(name, DEFAULTS[name])
+
+
+class ViewCounter:
+    """
+    Collects post view increments in process memory and writes them back in
+    batches of ``UPDATE ... SET views = views + n``.
+
+    Pending counts are flushed every ``FLUSH_INTERVAL`` seconds by a daemon
+    thread, whenever ``MAX_PENDING`` distinct posts are waiting, and at
+    interpreter shutdown. If the database rejects a flush the counts are
+    spooled to ``SPOOL_DIR`` so that ``manage.py flush_view_counts`` can
+    apply them later. A ``FLUSH_INTERVAL`` of 0 writes every view through.
+    """
+
+    def __init__(self):
+        self._pending = defaultdict(int)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def increment(self, post_id, amount=1):
+        if get_setting('FLUSH_INTERVAL') <= 0:
+            apply_counts({post_id: amount})
+            return
+        if self._add(post_id, amount):
+            self.flush()
+
+    async def aincrement(self, post_id, amount=1):
+        """``increment`` for async views; only a database write leaves the event loop."""
+        if get_setting('FLUSH_INTERVAL') <= 0:
+            await sync_to_async(apply_counts)({post_id: amount})
+            return
+        if self._add(post_id, amount):
+            await sync_to_async(self.flush)()
+
+    def _add(self, post_id, amount):
+        """Buffer a count; returns whether the buffer is full and should be flushed."""
+        with self._lock:
+            self._pending[post_id] += amount
+            full = len(self._pending) >= get_setting('MAX_PENDING')
+        self._ensure_thread()
+        return full
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        with self._lock:
+            counts, self._pending = self._pending, defaultdict(int)
+
+        if not counts:
+            return 0
+
+        try:
+            apply_counts(counts)
+        except DatabaseError:
+            logger.exception("Could not flush %d post view counts", len(counts))
+            if not spool_counts(counts):
+                self._merge(counts)
+            return 0
+        return sum(counts.values())
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def _merge(self, counts):
+        with self._lock:
+            for post_id, amount in counts.items():
+                self._pending[post_id] += amount
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='view-counter-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(get_setting('FLUSH_INTERVAL')):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("View counter flush failed")
+
+
+def apply_counts(counts):
+    """Write ``{post_id: n}`` to the database, one UPDATE per distinct n."""
+    from api.models import Post
+
+    by_amount = defaultdict(list)
+    for post_id, amount in counts.items():
+        if amount:
+            by_amount[amount].append(post_id)
+
+    with transaction.atomic():
+        for amount, post_ids in by_amount.items():
+            Post.objects.filter(id__in=post_ids).update(views=F('views') + amount)
+        author_stats.record_views(counts)
+
+
+def spool_counts(counts):
+    spool_dir = get_setting('SPOOL_DIR')
+    if not spool_dir:
+        return False
+
+    try:
+        os.makedirs(spool_dir, exist_ok=True)
+        path = os.path.join(spool_dir, f"{os.getpid()}-{time.time_ns()}.json")
+        with open(path + '.tmp', 'w') as f:
+            json.dump({str(k): v for k, v in counts.items()}, f)
+        os.replace(path + '.tmp', path)
+    except OSError:
+        logger.exception("Could not spool post view counts")
+        return False
+    return True
+
+
+def drain_spool():
+    """
+    Apply every spooled batch in ``SPOOL_DIR``; returns the views applied.
+
+    Each file is claimed by renaming it first, so concurrent drains never
+    apply the same batch twice. A batch that fails to apply is put back; a
+    drain killed in between leaves it as ``*.json.draining-<pid>``.
+    """
+    spool_dir = get_setting('SPOOL_DIR')
+    if not spool_dir or not os.path.isdir(spool_dir):
+        return 0
+
+    total = 0
+    for name in sorted(os.listdir(spool_dir)):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(spool_dir, name)
+        claimed = f"{path}.draining-{os.getpid()}"
+        try:
+            os.rename(path, claimed)
+        except FileNotFoundError:
+            # Another drain got there first.
+            continue
+        try:
+            with open(claimed) as f:
+                counts = {int(k): v for k, v in json.load(f).items()}
+            apply_counts(counts)
+        except BaseException:
+            os.rename(claimed, path)
+            raise
+        os.remove(claimed)
+        total += sum(counts.values())
+    return total
+
+
+view_counter = ViewCounter()
+atexit.register(view_counter.stop)
@@ -1,4 +1,4 @@
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, render
 from django.http import JsonResponse
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
@@ -6,7 +6,9 @@ from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 
 # Rest Framework
 from rest_framework import status
@@ -20,15 +22,24 @@ from rest_framework_simplejwt.tokens import RefreshToken
 
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from datetime import datetime
+from datetime import datetime, timedelta
 
 # other
 import json
 import random
 
 # Custom Imports
+from api import author_stats
 from api import models as api_models
 from api import serializer as api_serializers
+from api.counters import adjust_post_counters
+from api import interactions, notifications, pagination, response_cache, search, tags, uploads
+from api.pagination import DateCursorPagination, RankCursorPagination
+from api.response_cache import CachedResponseMixin
+from api.view_counter import view_counter
+
+def get_post_author_id(post_id):
+    return api_models.Post.objects.filter(id=post_id).values_list('user_id', flat=True).first()
 
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = api_serializers.MyTokenObtainPairSerializer
@@ -50,40 +61,152 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         return profile
 
 # Post APIs Endpoints
-class CategoryListAPIView(generics.ListAPIView):
+class CategoryListAPIView(CachedResponseMixin, generics.ListAPIView):
     serializer_class = api_serializers.CategorySerializer
     permission_classes = [AllowAny]
+    cache_tags = ('categories',)
+    replica_reads = True
 
     def get_queryset(self):
         return api_models.Category.objects.all()
     
-class PostCategoryListAPIView(generics.ListAPIView):
-    serializer_class = api_serializers.PostSerializer
+class PostCategoryListAPIView(CachedResponseMixin, generics.ListAPIView):
+    serializer_class = api_serializers.PostListSerializer
     permission_classes = [AllowAny]
+    pagination_class = DateCursorPagination
+    cache_tags = ('posts', 'categories')
+    replica_reads = True
 
     def get_queryset(self):
         category_slug = self.kwargs['category_slug']
         category = api_models.Category.objects.get(slug=category_slug)
-        return api_models.Post.objects.filter(category=category, status='Active')
+        posts = api_models.Post.objects.filter(category=category, status='Active')
+        return posts.with_related().with_like_state(self.request.user)
     
-class PostListAPIView(generics.ListAPIView):
-    serializer_class = api_serializers.PostSerializer
+class PostListAPIView(CachedResponseMixin, generics.ListAPIView):
+    serializer_class = api_serializers.PostListSerializer
     permission_classes = [AllowAny]
+    pagination_class = DateCursorPagination
+    cache_tags = ('posts',)
+    replica_reads = True
 
-    def get(self, *args, **kwargs):
-        return api_models.Post.objects.filter(status='Active')
+    def get_queryset(self):
+        posts = api_models.Post.objects.filter(status='Active')
+        return posts.with_related().with_like_state(self.request.user)
     
-class PostDetailAPIView(generics.RetrieveAPIView):
-    serializer_class = api_serializers.PostSerializer
+class PostDetailAPIView(CachedResponseMixin, generics.RetrieveAPIView):
+    serializer_class = api_serializers.PostDetailSerializer
     permission_classes = [AllowAny]
+    cache_tags = ('posts',)
+    replica_reads = True
+
+    def cache_hit(self, request, data):
+        view_counter.increment(data['id'])
 
     def get_object(self):
         slug = self.kwargs['slug']
-        post = api_models.Post.objects.get(slug=slug, status='Active')
+        posts = api_models.Post.objects.with_related().with_tags().with_related_posts().with_like_state(self.request.user)
+        post = posts.get(slug=slug, status='Active')
+        view_counter.increment(post.id)
         post.views += 1
-        post.save()
         return post
 
+class PostTagListAPIView(CachedResponseMixin, generics.ListAPIView):
+    serializer_class = api_serializers.PostListSerializer
+    permission_classes = [AllowAny]
+    pagination_class = DateCursorPagination
+    cache_tags = ('posts', 'tags')
+    replica_reads = True
+
+    def get_queryset(self):
+        tag = get_object_or_404(api_models.Tag, slug=self.kwargs['tag_slug'])
+        posts = api_models.Post.objects.filter(post_tags__tag=tag, status='Active')
+        return posts.with_related().with_like_state(self.request.user)
+
+class TagCloudAPIView(CachedResponseMixin, generics.ListAPIView):
+    """The most used tags, most used first."""
+    serializer_class = api_serializers.TagSerializer
+    permission_classes = [AllowAny]
+    cache_tags = ('tags',)
+    replica_reads = True
+
+    def get_queryset(self):
+        used = api_models.Tag.objects.filter(post_count__gt=0).order_by('-post_count', 'name')
+        return used[:tags.get_setting('CLOUD_SIZE')]
+
+class PostFeedAPIView(CachedResponseMixin, generics.ListAPIView):
+    """Active posts in ranked order, as last computed by `manage.py rank_feed`."""
+    serializer_class = api_serializers.PostListSerializer
+    permission_classes = [AllowAny]
+    pagination_class = RankCursorPagination
+    cache_tags = ('feed', 'posts')
+    replica_reads = True
+
+    def get_queryset(self):
+        posts = api_models.Post.objects.filter(status='Active', ranking__isnull=False).annotate(feed_rank=F('ranking__rank'))
+        return posts.with_related().with_like_state(self.request.user)
+
+class PostSearchAPIView(APIView):
+    permission_classes = [AllowAny]
+    replica_reads = True
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('category', openapi.IN_QUERY, description="Category slug", type=openapi.TYPE_STRING),
+            openapi.Parameter('status', openapi.IN_QUERY, description="Non-active statuses only match your own posts", type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('offset', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request):
+        backend = search.get_backend()
+        if backend is None:
+            return Response({'message': 'Search is not available on this database'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        query = request.query_params.get('q', '')
+        post_status = request.query_params.get('status', 'Active')
+        category_slug = request.query_params.get('category')
+        try:
+            limit = int(request.query_params.get('limit', pagination.get_setting('PAGE_SIZE')))
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({'message': 'limit and offset must be whole numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), pagination.get_setting('MAX_PAGE_SIZE'))
+        offset = max(offset, 0)
+
+        filters = {'status': post_status}
+        if post_status != 'Active':
+            if not request.user.is_authenticated:
+                return Response({'results': [], 'next': None})
+            filters['user_id'] = request.user.id
+        if category_slug:
+            category = api_models.Category.objects.filter(slug=category_slug).first()
+            if category is None:
+                return Response({'results': [], 'next': None})
+            filters['category_id'] = category.id
+
+        hits = backend.search(query, filters, limit, offset)
+        posts = api_models.Post.objects.with_related().with_like_state(request.user).in_bulk([hit.post_id for hit in hits])
+        results = []
+        for hit in hits:
+            post = posts[hit.post_id]
+            post.rank = hit.rank
+            post.snippet = hit.snippet
+            results.append(post)
+
+        data = api_serializers.PostSearchSerializer(results, many=True, context={'request': request}).data
+        return Response({
+            'results': data,
+            'next': offset + limit if len(hits) == limit else None,
+        })
+
+class ResponseCacheStatsAPIView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        return Response(response_cache.stats())
+
 class LikePostAPIView(APIView):
     @swagger_auto_schema(
         request_body=openapi.Schema(
@@ -91,28 +214,25 @@ class LikePostAPIView(APIView):
             properties={
                 'user_id': openapi.Schema(type=openapi.TYPE_INTEGER),
                 'post_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'liked': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Set the state instead of toggling it"),
             }
         )
     )
     def post(self, request):
         user_id = request.data['user_id']
         post_id = request.data['post_id']
+        liked = interactions.parse_state(request.data.get('liked'))
 
-        user = api_models.CustomUser.objects.get(id=user_id)
-        post = api_models.Post.objects.get(id=post_id)
+        author_id = get_post_author_id(post_id)
+        if author_id is None or not api_models.CustomUser.objects.filter(id=user_id).exists():
+            return Response({'message': 'Post or user not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        if user in post.likes.all():
-            post.likes.remove(user)
-            return Response({'message': 'Post Unliked'}, status=status.HTTP_200_OK)
-        else:
-            post.likes.add(user)
-            
-            api_models.Notification.objects.create(
-                user=post.user,
-                post=post,
-                type='Like',
-            )
-            return Response({'message': 'Post Liked'}, status=status.HTTP_200_OK)
+        liked, like_count = interactions.set_like(user_id, post_id, author_id, liked)
+        return Response({
+            'message': 'Post Liked' if liked else 'Post Unliked',
+            'liked': liked,
+            'like_count': like_count,
+        }, status=status.HTTP_200_OK)
 
 class PostCommentAPIView(APIView):
     @swagger_auto_schema(
@@ -134,18 +254,16 @@ class PostCommentAPIView(APIView):
 
         post = api_models.Post.objects.get(id=post_id)
 
-        api_models.Comment.objects.create(
-            post = post,
-            name = name,
-            email = email,
-            comment = comment,
-        )
+        with transaction.atomic():
+            api_models.Comment.objects.create(
+                post = post,
+                name = name,
+                email = email,
+                comment = comment,
+            )
+            adjust_post_counters(post.id, comment_count=1)
 
-        api_models.Notification.objects.create(
-            user = post.user,
-            post = post,
-            type = 'Comment',
-        )
+        notifications.enqueue(post.user_id, post.id, 'Comment')
 
         return Response({'message': 'Comment Sent'}, status=status.HTTP_200_OK)
     
@@ -156,29 +274,96 @@ class BookmarkPostAPIView(APIView):
             properties={
                 'user_id': openapi.Schema(type=openapi.TYPE_INTEGER),
                 'post_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'bookmarked': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Set the state instead of toggling it"),
             }
         )
     )
     def post(self, request):
         user_id = request.data['user_id']
         post_id = request.data['post_id']
+        bookmarked = interactions.parse_state(request.data.get('bookmarked'))
 
-        user = api_models.CustomUser.objects.get(id=user_id)
-        post = api_models.Post.objects.get(id=post_id)
+        author_id = get_post_author_id(post_id)
+        if author_id is None or not api_models.CustomUser.objects.filter(id=user_id).exists():
+            return Response({'message': 'Post or user not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        bookmark = api_models.Bookmark.objects.filter(user=user, post=post).first()
-        if bookmark:
-            bookmark.delete()
-            return Response({'message': 'Post Unbookmarked'}, status=status.HTTP_200_OK)
-        else:
-            api_models.Bookmark.objects.create(user=user, post=post)
+        bookmarked, bookmark_count = interactions.set_bookmark(user_id, post_id, author_id, bookmarked)
+        return Response({
+            'message': 'Post Bookmarked' if bookmarked else 'Post Unbookmarked',
+            'bookmarked': bookmarked,
+            'bookmark_count': bookmark_count,
+        }, status=status.HTTP_200_OK)
 
-            api_models.Notification.objects.create(
-                user = post.user,
-                post = post,
-                type = 'Bookmark',
-            )
-            return Response({'message': 'Post Bookmarked'}, status=status.HTTP_200_OK)
+class BatchInteractionAPIView(APIView):
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'user_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'operations': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'op': openapi.Schema(type=openapi.TYPE_STRING, enum=['like', 'bookmark', 'comment']),
+                            'post_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'value': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Set a like/bookmark instead of toggling it"),
+                            'name': openapi.Schema(type=openapi.TYPE_STRING),
+                            'email': openapi.Schema(type=openapi.TYPE_STRING),
+                            'comment': openapi.Schema(type=openapi.TYPE_STRING),
+                        }
+                    ),
+                ),
+            }
+        )
+    )
+    def post(self, request):
+        user_id = request.data.get('user_id')
+        operations = request.data.get('operations')
+
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return Response({'message': 'user_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(operations, list) or len(operations) > interactions.MAX_BATCH_OPERATIONS:
+            return Response({'message': f'Send a list of at most {interactions.MAX_BATCH_OPERATIONS} operations'}, status=status.HTTP_400_BAD_REQUEST)
+        if not api_models.CustomUser.objects.filter(id=user_id).exists():
+            return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        results, posts = interactions.apply_batch(user_id, operations)
+        return Response({'results': results, 'posts': posts}, status=status.HTTP_200_OK)
+
+class PostViewerStateAPIView(APIView):
+    permission_classes = [AllowAny]
+    max_ids = 100
+
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('ids', openapi.IN_QUERY, description="Comma-separated post ids", type=openapi.TYPE_STRING),
+            openapi.Parameter('user_id', openapi.IN_QUERY, description="Viewer; omit for anonymous", type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request):
+        try:
+            ids = [int(post_id) for post_id in request.query_params.get('ids', '').split(',') if post_id]
+            user_id = int(request.query_params.get('user_id') or 0) or None
+        except ValueError:
+            return Response({'message': 'ids and user_id must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > self.max_ids:
+            return Response({'message': f'Ask for at most {self.max_ids} posts'}, status=status.HTTP_400_BAD_REQUEST)
+
+        posts = api_models.Post.objects.filter(id__in=ids).order_by()
+        fields = ['id', 'like_count', 'comment_count', 'bookmark_count']
+        if user_id is not None:
+            posts = posts.with_viewer_state(user_id)
+            fields += ['liked', 'bookmarked']
+
+        data = {}
+        for row in posts.values(*fields):
+            row.setdefault('liked', False)
+            row.setdefault('bookmarked', False)
+            data[row.pop('id')] = row
+        return Response(data)
 
 class DashboardStats(generics.ListAPIView):
     serializer_class = api_serializers.AuthorSerializer
@@ -190,67 +375,94 @@ class DashboardStats(generics.ListAPIView):
         return user
 
     def list(self, *args, **kwargs):
-        queryset = self.get_queryset()
-        user = queryset.first()
-        
-        views = api_models.Post.objects.filter(user=user).aggregate(Sum('views'))['views__sum']
-        posts = api_models.Post.objects.filter(user=user).count()
-        likes = api_models.Post.objects.filter(user=user).aggregate(Sum('likes'))['likes__sum']
-        bookmarks = api_models.Bookmark.objects.filter(post__user=user).count()
-
-        data = {
-            'views': views,
-            'posts': posts,
-            'likes': likes,
-            'bookmarks': bookmarks,
-        }
+        user_id = self.kwargs['user_id']
+        fields = author_stats.FIELDS
+
+        data = api_models.AuthorStats.objects.filter(user_id=user_id).values(*fields).first()
+        if data is None:
+            data = dict.fromkeys(fields, 0)
+
+        days = self.request.query_params.get('days')
+        if days:
+            try:
+                days = min(max(int(days), 1), author_stats.MAX_DAYS)
+            except ValueError:
+                return Response({'message': 'days must be a whole number'}, status=status.HTTP_400_BAD_REQUEST)
+            since = timezone.localdate() - timedelta(days=days - 1)
+            data['daily'] = list(
+                api_models.AuthorDailyStats.objects.filter(user_id=user_id, day__gte=since).order_by('day').values('day', *fields)
+            )
         
         return Response(data)
     
 class DashboardPostLists(generics.ListAPIView):
-    serializer_class = api_serializers.PostSerializer
+    serializer_class = api_serializers.PostListSerializer
     permission_classes = [AllowAny]
+    pagination_class = DateCursorPagination
 
     def get_queryset(self):
         user_id = self.kwargs['user_id']
         user = api_models.CustomUser.objects.get(id=user_id)
-        return api_models.Post.objects.filter(user=user).order_by('-id')
+        posts = api_models.Post.objects.filter(user=user)
+        return posts.with_related().with_like_state(self.request.user)
     
 class DashboardCommentLists(generics.ListAPIView):
-    serializer_class = api_serializers.CommentSerializer
+    serializer_class = api_serializers.DashboardCommentSerializer
     permission_classes = [AllowAny]
+    pagination_class = DateCursorPagination
 
     def get_queryset(self):
         user_id = self.kwargs['user_id']
         user = api_models.CustomUser.objects.get(id=user_id)
-        return api_models.Comment.objects.filter(post__user=user).order_by('-id')
+        return api_models.Comment.objects.filter(post__user=user).select_related('post')
     
 class DashboardNotificationLists(generics.ListAPIView):
-    serializer_class = api_serializers.NotificationSerializer
+    serializer_class = api_serializers.DashboardNotificationSerializer
     permission_classes = [AllowAny]
+    pagination_class = DateCursorPagination
 
     def get_queryset(self):
         user_id = self.kwargs['user_id']
         user = api_models.CustomUser.objects.get(id=user_id)
-        return api_models.Comment.objects.all(seen=False, user=user)
+        return api_models.Notification.objects.filter(user=user, read=False).select_related('user', 'post')
     
 class DashboardMarkNotificationAsSeen(APIView):
     @swagger_auto_schema(
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
-                'noti_id': openapi.Schema(type=openapi.TYPE_INTEGER),
-            }
+                'user_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'noti_id': openapi.Schema(type=openapi.TYPE_INTEGER, description="Mark one notification"),
+                'noti_ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER), description="Mark several notifications"),
+                'before': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME, description="Mark everything up to this time"),
+            },
+            required=['user_id'],
         )
     )
     def post(self, request):
-        noti_id = request.data['noti_id']
-        user = api_models.CustomUser.objects.get(id=noti_id)
-        notifications = api_models.Notification.objects.filter(user=user, seen=False)
-        for notification in notifications:
-            notification.seen = True
-            notification.save()
-        return Response({'message': 'Notifications Marked as Seen'}, status=status.HTTP_200_OK)
+        serializer = api_serializers.MarkNotificationsSeenSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'message': 'Invalid request', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        user_id = serializer.validated_data['user_id']
+        noti_id = serializer.validated_data.get('noti_id')
+        before = serializer.validated_data.get('before')
+
+        ids = serializer.validated_data.get('noti_ids')
+        if noti_id is not None:
+            ids = [noti_id]
+
+        marked = notifications.mark_read(user_id, ids=ids, before=before)
+        return Response({
+            'message': 'Notifications Marked as Seen',
+            'marked': marked,
+            'unread': notifications.unread_count(user_id),
+        }, status=status.HTTP_200_OK)
+
+class DashboardUnreadNotificationCount(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, user_id):
+        return Response({'unread': notifications.unread_count(user_id)})
     
 class DashboardReplyCommentAPIView(APIView):
     @swagger_auto_schema(
@@ -273,33 +485,116 @@ class DashboardReplyCommentAPIView(APIView):
 
         return Response({'message': 'Comment Replied'}, status=status.HTTP_200_OK)
     
+class DashboardUploadStartAPIView(APIView):
+    permission_classes = [AllowAny]
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'user_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                'filename': openapi.Schema(type=openapi.TYPE_STRING),
+                'size': openapi.Schema(type=openapi.TYPE_INTEGER, description="Total bytes"),
+                'content_type': openapi.Schema(type=openapi.TYPE_STRING),
+            }
+        )
+    )
+    def post(self, request):
+        try:
+            user_id = int(request.data['user_id'])
+            size = int(request.data['size'])
+        except (KeyError, TypeError, ValueError):
+            return Response({'message': 'user_id and size must be whole numbers'}, status=status.HTTP_400_BAD_REQUEST)
+        if not api_models.CustomUser.objects.filter(id=user_id).exists():
+            return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            session = uploads.start(
+                user_id,
+                str(request.data.get('filename', '')),
+                size,
+                str(request.data.get('content_type', '')),
+            )
+        except uploads.UploadError as error:
+            return Response({'message': str(error)}, status=error.status)
+
+        return Response({
+            'upload_id': session.upload_id,
+            'chunk_size': uploads.get_setting('CHUNK_SIZE'),
+            'max_chunk_size': uploads.get_setting('MAX_CHUNK_SIZE'),
+        }, status=status.HTTP_201_CREATED)
+
+class DashboardUploadAPIView(APIView):
+    """
+    GET reports how many bytes have arrived, PUT appends a chunk sent as the
+    raw request body with a Content-Range header, DELETE abandons the upload.
+    """
+    permission_classes = [AllowAny]
+
+    def get_session(self):
+        return api_models.UploadSession.objects.filter(upload_id=self.kwargs['upload_id']).first()
+
+    def describe(self, session):
+        return {'upload_id': session.upload_id, 'size': session.size, 'received': session.received, 'complete': session.complete}
+
+    def get(self, request, upload_id):
+        session = self.get_session()
+        if session is None:
+            return Response({'message': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.describe(session))
+
+    def put(self, request, upload_id):
+        session = self.get_session()
+        if session is None:
+            return Response({'message': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        # Read the raw body stream; request.data would buffer it first.
+        try:
+            session = uploads.write_chunk(session, request.headers.get('Content-Range'), request.stream)
+        except uploads.UploadError as error:
+            return Response({'message': str(error), 'received': session.received}, status=error.status)
+        return Response(self.describe(session))
+
+    def delete(self, request, upload_id):
+        session = self.get_session()
+        if session is not None:
+            uploads.discard(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class DashboardPostCreateAPIView(generics.CreateAPIView):
     serializer_class = api_serializers.PostSerializer
     permission_classes = [AllowAny]
 
     def create(self, request, *args, **kwargs):
-        print(request.data)
-
         user_id = request.data.get('user_id')
         title = request.data.get('title')
         image = request.data.get('image')
+        upload_id = request.data.get('upload_id')
         content = request.data.get('content')
-        tags = request.data.get('tags')
+        post_tags = request.data.get('tags')
         category_id = request.data.get('category')
         post_status = request.data.get('post_status', 'Active')
 
         user = api_models.CustomUser.objects.get(id=user_id)
         category = api_models.Category.objects.get(id=category_id)
 
-        api_models.Post.objects.create(
+        post = api_models.Post(
             user=user,
+            profile=user.profile,
             category=category,
             title=title,
             image=image,
-            content=content,
-            tags=tags,
+            description=content,
             status=post_status,
         )
+        if upload_id:
+            try:
+                uploads.attach(post, 'image', upload_id, user.id)
+            except uploads.UploadError as error:
+                return Response({'message': str(error)}, status=error.status)
+        with transaction.atomic():
+            post.save()
+            tags.set_tags(post, post_tags)
 
         return Response({'message': 'Post Created Successfully'}, status=status.HTTP_200_OK)
     
@@ -318,21 +613,29 @@ class DashboardPostUpdateAPIView(generics.UpdateAPIView):
 
         title = request.data.get('title')
         image = request.data.get('image')
+        upload_id = request.data.get('upload_id')
         content = request.data.get('content')
-        tags = request.data.get('tags')
+        post_tags = request.data.get('tags')
         category_id = request.data.get('category')
         post_status = request.data.get('post_status', 'Active')
 
         category = api_models.Category.objects.get(id=category_id)
 
         post_instance.title = title
-        if image != "undefined":
+        if upload_id:
+            try:
+                uploads.attach(post_instance, 'image', upload_id, post_instance.user_id)
+            except uploads.UploadError as error:
+                return Response({'message': str(error)}, status=error.status)
+        elif image != "undefined":
             post_instance.image = image
-        post_instance.content = content
-        post_instance.tags = tags
+        post_instance.description = content
         post_instance.category = category
         post_instance.status = post_status
-        post_instance.save()
+        with transaction.atomic():
+            post_instance.save()
+            if post_tags is not None:
+                tags.set_tags(post_instance, post_tags)
 
         return Response({'message': 'Post Updated Successfully'}, status=status.HTTP_200_OK)
 
@@ -14,6 +14,8 @@ from pathlib import Path
 from datetime import timedelta
 import os
 
+from backend import database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,6 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.instrumentation.InstrumentationMiddleware',
+    'api.db_router.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -86,11 +90,33 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# Configured from DATABASE_URL, DATABASE_REPLICA_URLS, DATABASE_CONN_MAX_AGE
+# and DATABASE_POOL; see backend/database.py. Defaults to db.sqlite3.
+# postgres:// URLs and DATABASE_POOL use psycopg 3 with its pool extra
+# (psycopg, psycopg-binary and psycopg-pool in requirements.txt).
+DATABASES = database.databases(os.environ, BASE_DIR)
+
+DATABASE_ROUTERS = ['api.db_router.PrimaryReplicaRouter']
+
+# Public read endpoints read from REPLICAS; a client that wrote is pinned
+# to the primary for STICKY_SECONDS. Pins are stored in CACHE_ALIAS, which
+# must be shared between workers when there are several.
+DATABASE_ROUTING = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': 5,
+    'CACHE_ALIAS': 'default',
+}
+
+# Connection settings of the api.backends.sqlite3 engine, used for SQLite
+# databases when DATABASE_SQLITE_TUNING=1. SERIALIZE_WRITES queues writers
+# from every thread and worker process behind one lock file.
+SQLITE_TUNING = {
+    'JOURNAL_MODE': 'WAL',
+    'SYNCHRONOUS': 'NORMAL',
+    'MMAP_SIZE': 256 * 1024 * 1024,
+    'CACHE_SIZE': -64000,
+    'BUSY_TIMEOUT': 5000,
+    'SERIALIZE_WRITES': True,
 }
 
 
@@ -133,6 +159,12 @@ STATIC_URL = 'static/'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    # Uploads are stored once per distinct content; see api.media.
+    'default': {'BACKEND': 'api.media.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -181,6 +213,147 @@ SIMPLE_JWT = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Caches. Point 'default' at django.core.cache.backends.filebased.FileBasedCache
+# or django.core.cache.backends.redis.RedisCache to share entries between workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Anonymous responses of the public read endpoints are cached for TIMEOUT
+# seconds and invalidated when posts, categories or comments change.
+RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
+# Post view counter: increments are buffered per process and written in
+# batches every FLUSH_INTERVAL seconds (0 writes every view straight through).
+VIEW_COUNTER = {
+    'FLUSH_INTERVAL': 10,
+    'MAX_PENDING': 1000,
+    'SPOOL_DIR': BASE_DIR / 'var' / 'view_counts',
+}
+
+# Cursor pagination for the list endpoints (?page_size= is capped at MAX_PAGE_SIZE).
+API_PAGINATION = {
+    'PAGE_SIZE': 10,
+    'MAX_PAGE_SIZE': 100,
+}
+
+# Ranked home feed at post/feed/, rewritten every INTERVAL seconds by
+# `manage.py rank_feed`. A post scores (views * VIEW_WEIGHT + likes *
+# LIKE_WEIGHT + comments * COMMENT_WEIGHT + 1) / (age in hours + 2) ** GRAVITY.
+FEED = {
+    'SIZE': 1000,
+    'VIEW_WEIGHT': 1,
+    'LIKE_WEIGHT': 4,
+    'COMMENT_WEIGHT': 8,
+    'GRAVITY': 1.5,
+    'INTERVAL': 300,
+}
+
+# Post tags: at most MAX_PER_POST per post; post/tag-cloud/ lists the
+# CLOUD_SIZE most used.
+TAGS = {
+    'MAX_PER_POST': 10,
+    'CLOUD_SIZE': 50,
+}
+
+# "Related" and "more from this author" posts on the detail page, built by
+# `manage.py build_related`: TF-IDF similarity of title and description,
+# similarity of tag sets and CATEGORY_WEIGHT for a shared category, COUNT
+# posts of each kind.
+RELATED_POSTS = {
+    'COUNT': 5,
+    'TEXT_WEIGHT': 1.0,
+    'TAG_WEIGHT': 0.5,
+    'CATEGORY_WEIGHT': 0.3,
+    'MIN_SCORE': 0.05,
+    'BLOCK_MEMORY': 32 * 1024 * 1024,
+    'BATCH_SIZE': 500,
+    'POLL_INTERVAL': 10,
+}
+
+# Notification outbox worker (`manage.py process_notifications`).
+NOTIFICATIONS = {
+    'BATCH_SIZE': 500,
+    'POLL_INTERVAL': 2,
+}
+
+# Resized copies of uploaded images, built by `manage.py process_images`.
+# SIZES maps each variant name to its longest edge in pixels.
+IMAGE_VARIANTS = {
+    'SIZES': {'thumbnail': 160, 'card': 480, 'full': 1280},
+    'QUALITY': 80,
+}
+
+# Resumable chunked uploads (author/dashboard/upload/). Parts are written
+# straight to DIRECTORY; `manage.py expire_uploads` removes abandoned ones.
+UPLOADS = {
+    'DIRECTORY': BASE_DIR / 'var' / 'uploads',
+    'CHUNK_SIZE': 1024 * 1024,
+    'MAX_CHUNK_SIZE': 8 * 1024 * 1024,
+    'MAX_SIZE': 50 * 1024 * 1024,
+    'EXPIRY': 24 * 60 * 60,
+}
+
+# Content-addressed media (api.media). Blobs live under MEDIA_ROOT/DIRECTORY
+# and never change, so they are served with a MAX_AGE immutable cache header.
+# `manage.py collect_media` deletes blobs unreferenced for GRACE_PERIOD seconds.
+MEDIA_STORAGE = {
+    'DIRECTORY': 'blobs',
+    'GRACE_PERIOD': 24 * 60 * 60,
+    'MAX_AGE': 365 * 24 * 60 * 60,
+}
+
+# Server-Sent Events for author/dashboard/notification-stream/<user_id>/.
+# Only served under ASGI (backend.asgi:application behind uvicorn, daphne
+# or similar); the WSGI app answers 501. DatabaseBroker polls the
+# notification table once per POLL_INTERVAL for all streams in the process;
+# LocalBroker only sees notifications processed in the same process as the
+# ASGI app.
+NOTIFICATION_STREAM = {
+    'BROKER': 'api.notification_stream.DatabaseBroker',
+    'HEARTBEAT': 15,
+    'RETRY': 3000,
+    'POLL_INTERVAL': 1,
+}
+
+# Serve the public read endpoints (post list/detail, categories) from the
+# async views in api.async_views. Worth enabling when running under ASGI.
+ASYNC_READ_VIEWS = False
+
+# Per-request query count, DB time, serializer time and total time, sent
+# as a Server-Timing header, logged as JSON lines on "api.requests" and
+# exported at /metrics. Requests slower than SLOW_REQUEST_MS are logged on
+# "api.slow_requests" with the SQL they ran. /metrics answers 403 except to
+# METRICS_ALLOWED_NETWORKS or a "Bearer <METRICS_TOKEN>" Authorization
+# header. Behind a reverse proxy every client appears as the proxy's
+# address, so set a token or block /metrics at the proxy.
+INSTRUMENTATION = {
+    'SERVER_TIMING': True,
+    'LOG_REQUESTS': True,
+    'SLOW_REQUEST_MS': 1000,
+    'SLOW_REQUEST_MAX_QUERIES': 100,
+    'METRICS_ALLOWED_NETWORKS': ('127.0.0.0/8', '::1/128'),
+    'METRICS_TOKEN': os.environ.get('METRICS_TOKEN') or None,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Per-request lines are only shown outside DEBUG; slow requests always.
+        'api.requests': {'handlers': ['console'], 'level': 'WARNING' if DEBUG else 'INFO', 'propagate': False},
+        'api.slow_requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 # Custom User Model
 AUTH_USER_MODEL = 'api.CustomUser'
 
@@ -0,0 +1,38 @@
+import { useCallback, useEffect, useState } from "react";
+import apiInstance from "../utils/axios";
+
+// Load a cursor-paginated list endpoint (e.g. "post/list/") one page at a time.
+// The API answers { next, previous, results }; `next` is an absolute URL that
+// already carries the cursor, so each call to loadMore() costs one page.
+function useCursorList(endpoint, pageSize) {
+    const [items, setItems] = useState([]);
+    const [next, setNext] = useState(null);
+    const [loading, setLoading] = useState(false);
+
+    const fetchPage = useCallback(async (url, params, append) => {
+        setLoading(true);
+        try {
+            const response = await apiInstance.get(url, { params });
+            setItems((current) => (append ? [...current, ...response.data.results] : response.data.results));
+            setNext(response.data.next);
+        } finally {
+            setLoading(false);
+        }
+    }, []);
+
+    useEffect(() => {
+        if (endpoint) {
+            fetchPage(endpoint, pageSize ? { page_size: pageSize } : undefined, false);
+        }
+    }, [endpoint, pageSize, fetchPage]);
+
+    const loadMore = useCallback(() => {
+        if (next && !loading) {
+            fetchPage(next, undefined, true);
+        }
+    }, [next, loading, fetchPage]);
+
+    return { items, loading, hasMore: Boolean(next), loadMore };
+}
+
+export default useCursorList;